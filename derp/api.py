@@ -0,0 +1,69 @@
+"""Check deprecations from python, e.g., in a pre-commit hook or an editor integration.
+
+``derp.scan`` runs the same scan as the command line, in the calling process, and yields each
+invalid deprecation as a Finding rather than printing it.
+
+.. code-block:: python
+
+    import derp
+
+    for finding in derp.scan(["src/my_app"], "src/my_app/__version__.py"):
+        print(finding.path, finding.line, finding.qualname, finding.reason)
+"""
+
+import os
+from typing import Iterable, Iterator, Union
+
+from derp.application import Application
+from derp.finding import Finding
+
+"""Application options that only affect the output of the command line."""
+UNSUPPORTED_OPTIONS = ("profile", "profile_top", "output_format", "verbose")
+
+
+def scan(
+        paths: Union[str, os.PathLike, Iterable[Union[str, os.PathLike]]],
+        version: str,
+        **kwargs
+) -> Iterator[Finding]:
+    """Find every invalid deprecation in some files and directories.
+
+    Findings are yielded as soon as each file has been checked, in the order in which the
+    files are found, or in the order of the schedule if the scan may stop early (see
+    derp.schedule). A file that is found under more than one of the paths is only checked
+    once.
+
+    Parameters
+    ----------
+    paths: Union[str, os.PathLike, Iterable[Union[str, os.PathLike]]]
+        a file or directory to scan, or several of them
+    version: str
+        current version of the software, either as a string or a path to a file that contains
+        the version number
+    **kwargs
+        passed on to derp.application.Application, e.g., ``jobs``, ``cache_dir``,
+        ``exclude``, ``engine``, ``shard`` or ``fail_fast``. Options that only affect what
+        the command line prints, such as ``profile``, are not accepted.
+
+    Returns
+    -------
+    Iterator[Finding]
+        every invalid deprecation
+
+    Raises
+    ------
+    ValueError
+        If the version cannot be parsed, or a path does not exist or has no python modules
+    TypeError
+        If an option is not supported by the API
+
+    """
+    for name in UNSUPPORTED_OPTIONS:
+        if name in kwargs:
+            raise TypeError(f"scan() does not support the {name} option")
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    app = Application([os.fspath(path) for path in paths], version, **kwargs)
+    app._initialize_version_number()
+    for _, invalid in app._iter_invalid():
+        yield from invalid
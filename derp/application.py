@@ -1,8 +1,28 @@
 import os
 import re
-from typing import Optional, List, Dict
+import sys
+import time
+from collections import deque
+from functools import partial
+from typing import Optional, Deque, Iterable, Iterator, List, Dict, Set, Tuple, \
+    Union
+from derp import DEPRECATION_TYPE_LIST
+from derp.archive import archive_version, is_archive, iter_archive_modules
+from derp.cache import ResultCache, open_cache
+from derp.discovery import FileDiscovery
+from derp.deprecation import WrappedDeprecation
+from derp.executor import map_files, resolve_jobs
+from derp.finding import UNPARSEABLE, Finding, reason_message
+from derp.git import changed_files
+from derp.prefetch import DEFAULT_DEPTH, Prefetcher, apply_prefetched
+from derp.prefilter import compile_prefilter
+from derp.profiling import Profile, profile_scan_file
+from derp.report import Invalid, Reporter, make_reporter
+from derp.schedule import EXIT_INCOMPLETE, schedule
+from derp.shard import select_shard
 from derp.version_number import VersionNumber
-from derp.walker import collect_deprecation_errors
+from derp.walker import Usage, scan_file, scan_file_with_uses, find_invalid_deprecations, \
+    is_unparseable
 
 
 class Application:
@@ -13,40 +33,226 @@ class Application:
 
     Parameters
     ----------
-    target: str
-        path to the file or directory to scan for deprecations
-    version: str
-        version number, either as a string or a path to a file that contains the version number
+    target: Union[str, List[str]]
+        path to the file or directory to scan for deprecations, or a list of them. A wheel,
+        sdist or zip archive is scanned in place, see ``derp.archive``.
+    version: Optional[str]
+        version number, either as a string or a path to a file that contains the version
+        number. If None, and the target is a single archive, it is read from the archive.
+    jobs: Union[int, str, None]
+        number of worker processes to scan files with, or "auto" to use one per cpu.
+        By default files are scanned serially in the current process.
+    cache_dir: Optional[str]
+        directory in which to cache the deprecations found in each module between runs.
+        By default nothing is cached, except in memory by ``derp serve``, see
+        ``derp.cache.open_cache``.
+    verbose: bool
+        whether to print a summary of the scan to stderr
+    output_format: str
+        format in which to report invalid deprecations, one of the keys of
+        ``derp.report.REPORTERS``
+    record_failures: bool
+        whether to keep every finding in ``failures`` after it has been reported.
+        Turning this off keeps memory flat on large scans; only the number of failed files
+        is kept, in ``failed_files``.
+    since: Optional[str]
+        a git ref. If given, only python modules that differ from it (including untracked
+        modules) are scanned, unless the version file itself has changed, in which case
+        every module is.
+    exclude: Optional[List[str]]
+        glob patterns of files and directories to skip, see ``derp.discovery``
+    default_excludes: bool
+        whether to skip version control metadata, virtual environments, build output and
+        caches, see ``derp.discovery.DEFAULT_EXCLUDES``
+    gitignore: bool
+        whether to skip files and directories ignored by .gitignore files
+    profile: Optional[str]
+        if given, time each stage of the scan and write a profile to stderr in this format,
+        one of ``derp.profiling.PROFILE_FORMATS``
+    profile_top: int
+        number of slowest files to list in the profile
+    engine: str
+        how to find the deprecations in each module, one of ``derp.walker.ENGINES``
+    readers: int
+        number of threads that read modules ahead of parsing, see ``derp.prefetch``. By
+        default each module is read just before it is parsed.
+    prefetch_depth: int
+        maximum number of modules that have been read ahead but not yet parsed
+    sources: Optional[Dict[str, bytes]]
+        contents to check in place of the files at some paths, e.g., source code piped on
+        stdin. These paths are checked in addition to the targets, need not exist, and are
+        never cached.
+    shard: Optional[Tuple[int, int]]
+        if given as (K, N), only check the files of the K-th of N shards, see ``derp.shard``
+    fail_fast: bool
+        whether to stop at the first file with invalid deprecations, cancelling the work on
+        the files after it
+    time_budget: Optional[float]
+        if given, stop once this many seconds have passed since the start of the run, and
+        report the files that were not scanned. With either this or ``fail_fast``, files are
+        scanned in order of how likely they are to have findings, see ``derp.schedule``.
+    max_file_size: Optional[int]
+        if given, modules larger than this many bytes are not parsed, and are reported as
+        unparseable, see ``derp.walker.scan_file``
+    no_cache: bool
+        whether to parse every module, without even the in-memory cache of ``derp serve``
     """
 
-    def __init__(self, target: str, version: str):
+    def __init__(self, target: Union[str, List[str]], version: str,
+                 jobs: Union[int, str, None] = None,
+                 cache_dir: Optional[str] = None, verbose: bool = False,
+                 output_format: str = "text", record_failures: bool = True,
+                 since: Optional[str] = None, exclude: Optional[List[str]] = None,
+                 default_excludes: bool = True, gitignore: bool = False,
+                 profile: Optional[str] = None, profile_top: int = 10, engine: str = "ast",
+                 readers: int = 0, prefetch_depth: int = DEFAULT_DEPTH,
+                 sources: Optional[Dict[str, bytes]] = None,
+                 shard: Optional[Tuple[int, int]] = None, fail_fast: bool = False,
+                 time_budget: Optional[float] = None, max_file_size: Optional[int] = None,
+                 no_cache: bool = False):
         self.target = target
+        if target is None:
+            self.targets = []
+        else:
+            self.targets = [target] if isinstance(target, str) else list(target)
+        self.sources = {os.path.abspath(path): source
+                        for path, source in (sources or dict()).items()}
+        # The contents of the modules found in archives, until they are scanned
+        self.archive_sources: Dict[str, bytes] = dict()
+        self.shard = shard
+        # The position of each file of the shard among all of the files
+        self.shard_positions: Dict[str, int] = dict()
+        self.fail_fast = fail_fast
+        self.time_budget = time_budget
+        # Why the scan stopped before scanning every file, if it did
+        self.stopped_early: Optional[str] = None
+        self.unscanned: List[str] = []
+        self._scanned = 0
         self.version = version
+        self.jobs = jobs
+        self.cache_dir = cache_dir
+        self.no_cache = no_cache
+        self.verbose = verbose
+        self.cache: Optional[ResultCache] = None
+        self.prefilter_skipped = 0
+        self.parsed_files = 0
         self.current_version: Optional[VersionNumber] = None
         self.file_paths: Optional[List[str]] = None
-        self.failures: Dict[str, List[str]] = None
+        self.output_format = output_format
+        self.record_failures = record_failures
+        self.since = since
+        self.exclude = exclude if exclude is not None else []
+        self.default_excludes = default_excludes
+        self.gitignore = gitignore
+        self.engine = engine
+        self.readers = readers
+        self.prefetch_depth = prefetch_depth
+        self.max_file_size = max_file_size
+        self.prefetcher: Optional[Prefetcher] = None
+        self.profile_format = profile
+        self.profile: Optional[Profile] = Profile(profile_top) if profile is not None else None
+        self._start_time: Optional[float] = None
+        self.reporter: Optional[Reporter] = None
+        self.failures: Dict[str, List[Finding]] = None
+        self.failed_files = 0
         self.catastrophic_failure = False
+        # Modules that could not be checked, with the reason, for commands that report
+        # deprecations rather than findings, see _parseable
+        self.unparseable: Dict[str, str] = dict()
+        # If set, _extract also collects the names that each module uses, until they are
+        # consumed, see derp.usages
+        self.uses: Optional[Dict[str, List[Usage]]] = None
+        self.error: Optional[str] = None
+
+    def _iter_absolute_paths(self) -> Iterator[str]:
+        """Lazily yield all paths to inspect, each only once, followed by those of ``sources``."""
+        if len(self.targets) == 1 and not self.sources:
+            yield from self._iter_target_paths(self.targets[0])
+            return
+        seen = set()
+        for target in self.targets:
+            for path in self._iter_target_paths(target):
+                if path not in seen:
+                    seen.add(path)
+                    yield path
+        for path in self.sources:
+            if path not in seen:
+                yield path
+
+    def _iter_target_paths(self, target: str) -> Iterator[str]:
+        """Lazily yield the paths to inspect at or below a file or directory."""
+        target_path = os.path.abspath(os.path.join(os.getcwd(), target))
+        if not os.path.exists(target_path):
+            raise ValueError(f"{target} must correspond to a file or directory")
+        discovery = FileDiscovery(target_path, exclude=self.exclude,
+                                  default_excludes=self.default_excludes,
+                                  gitignore=self.gitignore)
+        if is_archive(target_path):
+            yield from self._iter_archive_paths(target_path, discovery)
+            return
+        if self.since is not None:
+            changed = changed_files(self.since, target_path)
+            version_path = os.path.realpath(self.version)
+            if not (os.path.isfile(version_path) and version_path in changed):
+                for path in self._changed_paths(target_path, changed):
+                    if not discovery.is_excluded(path):
+                        yield path
+                return
+        n_files = 0
+        for path in discovery:
+            n_files += 1
+            yield path
+        if n_files == 0:
+            raise ValueError(f"No python modules found at {target}")
+
+    def _iter_archive_paths(self, archive_path: str, discovery: FileDiscovery) -> Iterator[str]:
+        """Lazily yield the paths of the modules in an archive, keeping their contents in
+        ``archive_sources`` until they are scanned.
+        """
+        n_files = 0
+        for name, source in iter_archive_modules(archive_path):
+            path = os.path.join(archive_path, *name.split("/"))
+            if discovery.is_excluded(path):
+                continue
+            n_files += 1
+            self.archive_sources[path] = source
+            yield path
+        if n_files == 0:
+            raise ValueError(f"No python modules found in {archive_path}")
+
+    def _record_paths(self, paths: Iterator[str]) -> Iterator[str]:
+        """Pass paths through, recording them in ``file_paths``."""
+        self.file_paths = []
+        for path in paths:
+            self.file_paths.append(path)
+            yield path
 
     def _initialize_absolute_paths(self):
         """Initialize a list of all paths to inspect."""
-        all_files = []
-        target_path = os.path.join(os.getcwd(), self.target)
-        if os.path.isfile(target_path):
-            all_files = [target_path]
-        elif os.path.isdir(target_path):
-            for path, subdirs, files in os.walk(target_path):
-                for name in files:
-                    this_path = os.path.abspath(os.path.join(path, name))
-                    all_files.append(this_path)
-        else:
-            raise ValueError(f"{self.target} must correspond to a file or directory")
-        all_files = [file for file in all_files if file.endswith(".py")]
-        if len(all_files) == 0:
-            raise ValueError(f"No python modules found at {self.target}")
-        self.file_paths = all_files
+        self.file_paths = list(self._iter_absolute_paths())
+
+    @staticmethod
+    def _changed_paths(target_path: str, changed: Set[str]) -> List[str]:
+        """Select the changed python modules that are at or below the target path."""
+        real_target = os.path.realpath(target_path)
+        paths = []
+        for changed_path in sorted(changed):
+            if not changed_path.endswith(".py") or not os.path.isfile(changed_path):
+                continue
+            if changed_path == real_target:
+                paths.append(target_path)
+            elif changed_path.startswith(os.path.join(real_target, "")):
+                paths.append(os.path.join(target_path, os.path.relpath(changed_path, real_target)))
+        return paths
 
     def _initialize_version_number(self):
-        """Initialize current version number either by parsing a file or a version string."""
+        """Initialize current version number either by parsing a file or a version string,
+        or from the metadata of the archive that is the target.
+        """
+        if self.version is None:
+            if len(self.targets) != 1 or not is_archive(self.targets[0]):
+                raise ValueError("A version is required, unless the target is an archive")
+            self.version = archive_version(self.targets[0])
         if os.path.isfile(self.version):
             with open(self.version) as fp:
                 file_text = fp.read()
@@ -67,28 +273,317 @@ class Application:
             self.current_version = VersionNumber(self.version)
 
     def initialize(self):
-        """Set class attributes that are not passed in directly."""
+        """Set class attributes that are not passed in directly.
+
+        The paths to inspect are discovered lazily by ``run_checks``, so that checking can
+        start before discovery has finished.
+        """
+        self.reporter = make_reporter(self.output_format)
         self._initialize_version_number()
-        self._initialize_absolute_paths()
 
     def run_checks(self):
-        """Run deprecation check against all files."""
+        """Run deprecation check against all files, reporting each file as soon as it is done.
+
+        The scan is a pipeline of generators: the files found by ``initialize`` are read and
+        parsed (``_extract``), their deprecations are checked against the current version
+        (``_check``) and any invalid deprecations are handed straight to the reporter.
+        """
         assert isinstance(self.current_version, VersionNumber)
         self.failures = dict()
-        for file_path in self.file_paths:
-            errors = collect_deprecation_errors(file_path, self.current_version)
-            if errors is not None and len(errors) > 0:
-                self.failures[file_path] = errors
+        self.failed_files = 0
+        report_file = self.reporter.report_file
+        if self.profile is not None:
+            report_file = self.profile.wrap(report_file, "report")
+        for file_path, invalid in self._iter_invalid():
+            self.failed_files += 1
+            report_file(file_path, invalid)
+            if self.record_failures:
+                self.failures[file_path] = invalid
+
+    def _iter_invalid(self) -> Iterator[Tuple[str, Invalid]]:
+        """Yield the invalid deprecations of every file that has any, as each file is done.
+
+        Unless ``initialize`` found the files already, they are discovered as they are
+        scanned, limited to the shard if there is one, and scheduled if the scan may stop
+        early. With ``fail_fast``, the scan stops after the first file that has invalid
+        deprecations. Once the scan stops, the files that were scheduled are split into
+        ``file_paths`` and ``unscanned``.
+        """
+        scheduled: Optional[List[str]] = None
+        if self.file_paths is None:
+            paths = self._iter_absolute_paths()
+            if self.shard is not None:
+                paths = select_shard(paths, self.shard, self.shard_positions)
+            if self.fail_fast or self.time_budget is not None:
+                scheduled = paths = self._schedule(paths)
+            paths = self._record_paths(paths)
+        else:
+            paths = iter(self.file_paths)
+        if self.profile is not None:
+            paths = self.profile.timed(paths, "discovery")
+        extracted = self._extract(paths)
+        if scheduled is not None:
+            extracted = self._within_budget(extracted, len(scheduled))
+        checked = self._check(extracted)
+        try:
+            for file_path, invalid in checked:
+                yield file_path, invalid
+                if self.fail_fast:
+                    self.stopped_early = "fail-fast"
+                    break
+        finally:
+            # Cancel the work on the files that are still being read or parsed
+            checked.close()
+            extracted.close()
+            if scheduled is not None:
+                # Files that were handed to the parser but not finished don't count as scanned
+                n_scanned = self._scanned
+                self.file_paths = scheduled[:n_scanned]
+                self.unscanned = scheduled[n_scanned:]
+                if self.unscanned and self.stopped_early is None:
+                    self.stopped_early = "time budget"
+
+    def _open_cache(self):
+        if self.cache is None and not self.no_cache:
+            self.cache = open_cache(self.cache_dir, self.engine)
+
+    def _schedule(self, paths: Iterator[str]) -> List[str]:
+        """Order the paths so that those most likely to have findings come first."""
+        self._open_cache()
+        # The modules of archives are read as the paths are discovered
+        paths = list(paths)
+        sources = dict(self.sources)
+        sources.update(self.archive_sources)
+        return schedule(paths, self.current_version, self.cache,
+                        compile_prefilter(DEPRECATION_TYPE_LIST), sources)
+
+    def _within_budget(
+            self,
+            extracted: Iterator[Tuple[str, List[WrappedDeprecation]]],
+            n_files: int
+    ) -> Iterator[Tuple[str, List[WrappedDeprecation]]]:
+        """Pass the extracted files through, counting them in ``_scanned``, until the time
+        budget runs out.
+        """
+        self._scanned = 0
+        deadline = None
+        if self.time_budget is not None:
+            start = self._start_time if self._start_time is not None else time.perf_counter()
+            deadline = start + self.time_budget
+        try:
+            for item in extracted:
+                self._scanned += 1
+                yield item
+                if deadline is not None and self._scanned < n_files and \
+                        time.perf_counter() > deadline:
+                    return
+        finally:
+            extracted.close()
+
+    def _extract(
+            self,
+            file_paths: Optional[Iterable[str]] = None
+    ) -> Iterator[Tuple[str, List[WrappedDeprecation]]]:
+        """Yield the deprecations in every file, in order, from the cache where possible.
+
+        Files are looked up in the cache as they arrive. The others are prefiltered and
+        parsed, on worker processes if there is more than one job, and read ahead on
+        ``readers`` threads if there are any. The contents of ``sources`` and of modules in
+        archives are handed to the parser as they are, and never cached. Results are yielded
+        in the order of *file_paths*, as soon as every earlier file is done.
+
+        If ``uses`` is a dict, the uses of each module are stored in it before the module is
+        yielded, from the same parse or the same cache entry as its deprecations. Every
+        module is then parsed, without the prefilter or the profile.
+
+        Parameters
+        ----------
+        file_paths: Optional[Iterable[str]]
+            the files to extract deprecations from, by default ``self.file_paths``.
+            May be a lazy iterator.
+
+        """
+        if file_paths is None:
+            file_paths = self.file_paths
+        self._open_cache()
+        collect_uses = self.uses is not None
+        lookup = self.cache.get if self.cache is not None else None
+        if lookup is not None and collect_uses:
+            lookup = partial(self.cache.get, with_uses=True)
+        if lookup is not None and self.profile is not None:
+            lookup = self.profile.wrap(lookup, "cache")
+        # Every file seen so far that has not been yielded, with its cached deprecations
+        # or None if it is being parsed
+        pending: Deque[Tuple[str, Optional[List[WrappedDeprecation]]]] = deque()
+        # Files whose contents were given in memory, which are never cached
+        in_memory: Set[str] = set()
+
+        pattern = compile_prefilter(DEPRECATION_TYPE_LIST)
+
+        def to_parse() -> Iterator[Tuple[str, Optional[bytes]]]:
+            for file_path in file_paths:
+                source = self.sources.get(file_path)
+                if source is None:
+                    source = self.archive_sources.pop(file_path, None)
+                if source is not None:
+                    in_memory.add(file_path)
+                    pending.append((file_path, None))
+                    yield file_path, source
+                    continue
+                cached = lookup(file_path) if lookup is not None else None
+                if cached is not None and collect_uses:
+                    self.uses[file_path] = self.cache.get_uses(file_path)
+                pending.append((file_path, cached))
+                if cached is None:
+                    yield file_path, None
+
+        jobs = resolve_jobs(self.jobs)
+        if collect_uses:
+            scan = partial(apply_prefetched, partial(scan_file_with_uses, engine=self.engine,
+                                                     max_size=self.max_file_size))
+        else:
+            scan_func = scan_file if self.profile is None else profile_scan_file
+            scan = partial(apply_prefetched, partial(scan_func, pattern=pattern,
+                                                     engine=self.engine,
+                                                     max_size=self.max_file_size))
+        items = to_parse()
+        if self.readers > 0:
+            if self.prefetcher is None:
+                self.prefetcher = Prefetcher(self.readers, self.prefetch_depth)
+            items = self.prefetcher.prefetch(items)
+        results = map_files(scan, items, jobs)
+        if self.profile is not None and not collect_uses:
+            results = self.profile.record_files(results)
+        try:
+            for deprecations in results:
+                uses = None
+                if collect_uses:
+                    deprecations, uses = deprecations
+                file_path, cached = pending.popleft()
+                while cached is not None:
+                    yield file_path, cached
+                    file_path, cached = pending.popleft()
+                if deprecations is None:
+                    self.prefilter_skipped += 1
+                    deprecations = []
+                else:
+                    self.parsed_files += 1
+                if uses is not None:
+                    self.uses[file_path] = uses
+                if file_path in in_memory:
+                    in_memory.discard(file_path)
+                elif self.cache is not None and not is_unparseable(deprecations):
+                    # Whether a module can be parsed depends on the engine and the guards, so
+                    # it is tried again next time
+                    self.cache.put(file_path, deprecations, uses)
+                yield file_path, deprecations
+            while pending:
+                yield pending.popleft()
+        finally:
+            # If the consumer stopped early, the work that has not started is cancelled, and
+            # the files scanned so far are still cached
+            results.close()
+            if self.cache is not None:
+                self.cache.save()
+
+    def _check(
+            self,
+            extracted: Iterator[Tuple[str, List[WrappedDeprecation]]]
+    ) -> Iterator[Tuple[str, Invalid]]:
+        """Yield the invalid deprecations of every file that has any."""
+        find_invalid = find_invalid_deprecations
+        if self.profile is not None:
+            find_invalid = self.profile.wrap(find_invalid, "check")
+        for file_path, deprecations in extracted:
+            invalid = find_invalid(deprecations, self.current_version, file_path)
+            if len(invalid) > 0:
+                yield file_path, invalid
+
+    def _parseable(
+            self,
+            extracted: Iterable[Tuple[str, List[WrappedDeprecation]]]
+    ) -> Iterator[Tuple[str, List[WrappedDeprecation]]]:
+        """Pass through the deprecations of every module that could be checked.
+
+        For commands that use the deprecations themselves, rather than the findings. The
+        others are recorded in ``unparseable``, count as failed files, and are written to
+        stderr by ``print_unparseable``.
+        """
+        for file_path, deprecations in extracted:
+            if is_unparseable(deprecations):
+                self.unparseable[file_path] = deprecations[0].deprecation.detail
+                self.failed_files += 1
+            else:
+                yield file_path, deprecations
+
+    def print_unparseable(self):
+        """Write the modules that could not be checked to stderr."""
+        for file_path, detail in self.unparseable.items():
+            print(f"{file_path}: {reason_message(UNPARSEABLE, '', None, detail)}",
+                  file=sys.stderr)
 
     def report(self):
-        """Print failures"""
-        if self.failures:
-            for path, errors in self.failures.items():
-                print(f"{path}:")
-                print('\t' + '\n\t'.join(errors))
+        """Finish reporting, once every file has been checked."""
+        if self.profile is None:
+            self.reporter.finish()
+        else:
+            self.profile.wrap(self.reporter.finish, "report")()
+        if self.verbose:
+            print(self.summary(), file=sys.stderr)
+        if self.stopped_early is not None:
+            self.print_coverage()
+        if self.profile is not None:
+            self.print_profile()
+
+    def print_coverage(self):
+        """Write which files were scanned to stderr, for a scan that stopped early."""
+        n_files = len(self.file_paths) + len(self.unscanned)
+        print(f"Stopped early ({self.stopped_early}): scanned {len(self.file_paths)} of "
+              f"{n_files} files, {len(self.unscanned)} not scanned", file=sys.stderr)
+        if self.verbose and self.unscanned:
+            print("Not scanned:", file=sys.stderr)
+            for path in self.unscanned:
+                print(f"\t{path}", file=sys.stderr)
+
+    def hit_rates(self) -> Dict[str, Optional[float]]:
+        """Return the fraction of lookups answered by the cache, and the fraction of parse
+        candidates ruled out by the prefilter, or None where there was nothing to count.
+        """
+        cache_lookups = self.cache.hits + self.cache.misses if self.cache is not None else 0
+        prefiltered = self.prefilter_skipped + self.parsed_files
+        return dict(
+            cache_hit_rate=self.cache.hits / cache_lookups if cache_lookups else None,
+            prefilter_skip_rate=self.prefilter_skipped / prefiltered if prefiltered else None,
+        )
+
+    def print_profile(self):
+        """Write the profile of the scan to stderr."""
+        if self._start_time is not None:
+            self.profile.total = time.perf_counter() - self._start_time
+        if self.prefetcher is not None:
+            self.profile.stalls = dict(reader=self.prefetcher.reader_stall,
+                                       parser=self.prefetcher.consumer_stall)
+        print(self.profile.format(self.hit_rates(), self.profile_format), file=sys.stderr)
+
+    def summary(self) -> str:
+        """Return a one-line summary of how the files were scanned."""
+        n_files = len(self.file_paths) if self.file_paths is not None else 0
+        cache_hits = self.cache.hits if self.cache is not None else 0
+        summary = f"Scanned {n_files} files: {self.parsed_files} parsed, {cache_hits} from " \
+                  f"cache, {self.prefilter_skipped} skipped by prefilter"
+        if self.prefetcher is not None:
+            reader_stall = self.prefetcher.reader_stall * 1000
+            parser_stall = self.prefetcher.consumer_stall * 1000
+            summary += f"; readers waited {reader_stall:.1f} ms for the parser, the parser " \
+                       f"waited {parser_stall:.1f} ms for the readers"
+        return summary
 
     def _run(self):
-        self.initialize()
+        self._start_time = time.perf_counter()
+        if self.profile is None:
+            self.initialize()
+        else:
+            self.profile.wrap(self.initialize, "initialize")()
         self.run_checks()
         self.report()
 
@@ -98,15 +593,20 @@ class Application:
             self._run()
         except (ValueError, AssertionError) as exc:
             print(exc)
+            self.error = str(exc)
             self.catastrophic_failure = True
         except KeyboardInterrupt:
             print("Caught keyboard interrupt from user")
+            self.error = "Caught keyboard interrupt from user"
             self.catastrophic_failure = True
 
     def exit(self) -> int:
-        """Return exit code, 0 for success or 1 for failure"""
-        found_errors = self.failures is not None and len(self.failures) > 0
-        if self.catastrophic_failure or found_errors:
+        """Return exit code, 0 for success or 1 for failure. A scan that found nothing but
+        did not scan every file returns ``derp.schedule.EXIT_INCOMPLETE``.
+        """
+        if self.catastrophic_failure or self.failed_files > 0:
             return 1
+        elif self.unscanned:
+            return EXIT_INCOMPLETE
         else:
             return 0
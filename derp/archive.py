@@ -0,0 +1,128 @@
+"""Scan the modules of wheels, sdists and other archives without extracting them.
+
+An archive given as a target is read in place: each python module in it is read into memory
+and parsed from there, and nothing is written to disk. A module is reported at the path of
+the archive joined with its name in the archive, e.g., ``dist/my_app-1.0-py3-none-any.whl/
+my_app/io.py``, and the exclude patterns apply to that name.
+
+Without a version, the version of an archive is read from its metadata: the ``METADATA`` of
+the ``.dist-info`` directory of a wheel, or the ``PKG-INFO`` of an sdist or egg. Failing
+that, it is taken from the name of the file, e.g., ``my_app-1.0.tar.gz``. Either way, only
+the release segment of the version (PEP 440) is kept, so that ``1.0rc1`` is checked as
+``1.0``: derp compares numeric versions, and a pre-release is due the removals of its release.
+"""
+
+import os
+import re
+import tarfile
+import zipfile
+from email.parser import HeaderParser
+from typing import Iterator, List, Optional, Tuple
+
+"""Extensions of the files that are read as archives, in lower case."""
+ZIP_SUFFIXES = (".whl", ".zip", ".egg")
+TAR_SUFFIXES = (".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz", ".tar")
+ARCHIVE_SUFFIXES = ZIP_SUFFIXES + TAR_SUFFIXES
+
+"""Names of the metadata files that hold the version, as regular expressions on member names.
+The first one that matches a member wins.
+"""
+_METADATA_MEMBERS = (
+    re.compile(r"^[^/]+\.dist-info/METADATA$"),
+    re.compile(r"^(?:[^/]+/)?PKG-INFO$"),
+    re.compile(r"^EGG-INFO/PKG-INFO$"),
+)
+
+_VERSION_IN_NAME = re.compile(r"^.+?-(v?\d[\w.!+]*?)(?:-|\.(?:tar|tgz|tbz2|txz|zip|whl|egg)\b|$)",
+                              re.IGNORECASE)
+
+"""The release segment of a PEP 440 version, after an optional "v" and epoch."""
+_RELEASE = re.compile(r"[vV]?(?:\d+!)?(\d+(?:\.\d+)*)")
+
+
+def is_archive(path: str) -> bool:
+    """Whether a path is a file that is read as an archive, judging by its extension."""
+    return path.lower().endswith(ARCHIVE_SUFFIXES) and os.path.isfile(path)
+
+
+def _is_zip(path: str) -> bool:
+    return path.lower().endswith(ZIP_SUFFIXES)
+
+
+def iter_archive_modules(path: str) -> Iterator[Tuple[str, bytes]]:
+    """Lazily yield the name and contents of every python module in an archive.
+
+    Modules are yielded in the order in which they are stored. Only one module is held in
+    memory at a time, unless the consumer keeps them.
+
+    Raises
+    ------
+    ValueError
+        If the file cannot be read as an archive
+
+    """
+    try:
+        if _is_zip(path):
+            with zipfile.ZipFile(path) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir() and info.filename.endswith(".py"):
+                        yield info.filename, archive.read(info)
+        else:
+            with tarfile.open(path, "r:*") as archive:
+                for member in archive:
+                    if member.isfile() and member.name.endswith(".py"):
+                        yield member.name, archive.extractfile(member).read()
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError) as exc:
+        raise ValueError(f"{path} is not a readable archive: {exc}")
+
+
+def _member_names(path: str) -> List[str]:
+    if _is_zip(path):
+        with zipfile.ZipFile(path) as archive:
+            return archive.namelist()
+    with tarfile.open(path, "r:*") as archive:
+        return archive.getnames()
+
+
+def _read_member(path: str, name: str) -> bytes:
+    if _is_zip(path):
+        with zipfile.ZipFile(path) as archive:
+            return archive.read(name)
+    with tarfile.open(path, "r:*") as archive:
+        return archive.extractfile(name).read()
+
+
+def _metadata_version(path: str) -> Optional[str]:
+    names = _member_names(path)
+    for pattern in _METADATA_MEMBERS:
+        for name in names:
+            if pattern.match(name):
+                metadata = _read_member(path, name).decode("utf-8", errors="replace")
+                version = HeaderParser().parsestr(metadata).get("Version")
+                if version:
+                    return version.strip()
+    return None
+
+
+def archive_version(path: str) -> str:
+    """Return the version of the package in an archive, from its metadata or its file name.
+
+    Only the release segment of the version is returned, e.g., "1.0" for "1.0rc1".
+
+    Raises
+    ------
+    ValueError
+        If the archive cannot be read or has no version with a release segment
+
+    """
+    try:
+        version = _metadata_version(path)
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError, KeyError) as exc:
+        raise ValueError(f"{path} is not a readable archive: {exc}")
+    if version is None:
+        match = _VERSION_IN_NAME.match(os.path.basename(path))
+        version = match.group(1) if match is not None else None
+    release = _RELEASE.match(version.strip()) if version is not None else None
+    if release is None:
+        raise ValueError(f"Found no version in the metadata or the name of {path}")
+    return release.group(1)
@@ -0,0 +1,290 @@
+"""Measure how long each stage of a scan takes, on synthetic packages of any shape.
+
+A synthetic package is generated from a handful of parameters: the number of modules, how
+deeply they are nested in subpackages, the fraction of functions that are deprecated and the
+approximate number of lines per module. The same parameters and seed always generate the
+same package, so runs on different commits measure the same work.
+
+Each stage of a scan is timed on its own, over every module of the package:
+
+* discovery: finding the modules, as in ``Application._initialize_absolute_paths``
+* read: reading the source of every module
+* parse: ``ast.parse``
+* traverse: finding the deprecations in each syntax tree
+* check: checking every deprecation against the current version, with ``find_invalid_deprecations``
+
+Each stage is repeated and the best time is kept. Results can be appended to a JSON history
+file, and a run can be compared with the latest run in the history that used the same
+parameters, so that a slowdown of any stage is caught.
+"""
+
+import ast
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+from derp import __version__
+from derp.application import Application
+from derp.version_number import VersionNumber
+from derp.walker import _extract_deprecations, find_invalid_deprecations
+
+STAGES = ("discovery", "read", "parse", "traverse", "check")
+
+"""The version that synthetic packages are checked against."""
+BENCHMARK_VERSION = "1.0"
+
+"""Stages that got slower by less than this many seconds never count as regressions, because
+differences that small are dominated by noise.
+"""
+MIN_REGRESSION_SECONDS = 0.001
+
+
+def _method_lines(name: str, deprecated: bool, rng: random.Random) -> List[str]:
+    lines = []
+    if deprecated:
+        # Half expire before BENCHMARK_VERSION, so the check stage finds some
+        removed_in = rng.choice(["0.9", "1.0", "1.5", "2.0"])
+        lines.append(f"    @deprecated(deprecated_in='0.5', removed_in='{removed_in}')")
+    lines.extend([
+        f"    def {name}(self, values):",
+        "        total = 0",
+        "        for value in values:",
+        "            if value % 2:",
+        "                total += value * self.scale",
+        "            else:",
+        "                total -= len(str(value))",
+        "        return total",
+        "",
+    ])
+    return lines
+
+
+def generate_module(lines: int = 200, density: float = 0.1, seed: int = 0) -> str:
+    """Generate the source of a module with classes and methods, some of them deprecated.
+
+    Parameters
+    ----------
+    lines: int
+        approximate number of lines in the module
+    density: float
+        fraction of methods that are deprecated, between 0 and 1
+    seed: int
+        seed of the random choices, so that the same arguments give the same module
+
+    Returns
+    -------
+    str
+        the source code of the module
+
+    """
+    rng = random.Random(seed)
+    source = ["from deprecation import deprecated", ""]
+    n_classes = 0
+    while len(source) < lines:
+        source.extend([f"class Class{n_classes}:", "    scale = 2", ""])
+        for n_methods in range(10):
+            deprecated = rng.random() < density
+            source.extend(_method_lines(f"method{n_methods}", deprecated, rng))
+            if len(source) >= lines:
+                break
+        n_classes += 1
+    return "\n".join(source) + "\n"
+
+
+def generate_package(root: str, modules: int = 100, depth: int = 2, density: float = 0.1,
+                     lines: int = 200, seed: int = 0) -> List[str]:
+    """Write a synthetic package to a directory.
+
+    Modules are spread evenly over a chain of nested subpackages, from the top-level package
+    down to *depth* levels below it.
+
+    Parameters
+    ----------
+    root: str
+        directory in which to create the package. The package itself is called "synthetic".
+    modules: int
+        number of modules, not counting the ``__init__.py`` of each package
+    depth: int
+        number of levels of subpackages below the top-level package
+    density: float
+        fraction of methods that are deprecated, between 0 and 1
+    lines: int
+        approximate number of lines per module
+    seed: int
+        seed of the random choices, so that the same arguments give the same package
+
+    Returns
+    -------
+    List[str]
+        the paths of the generated modules
+
+    """
+    packages = [os.path.join(root, "synthetic")]
+    for level in range(depth):
+        packages.append(os.path.join(packages[-1], f"level{level + 1}"))
+    for package in packages:
+        os.makedirs(package, exist_ok=True)
+        with open(os.path.join(package, "__init__.py"), "w"):
+            pass
+    paths = []
+    for i in range(modules):
+        path = os.path.join(packages[i % len(packages)], f"module{i}.py")
+        with open(path, "w") as fp:
+            fp.write(generate_module(lines, density, seed=seed * modules + i))
+        paths.append(path)
+    return paths
+
+
+def _best_time(func: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def time_stages(target: str, version: str = BENCHMARK_VERSION, repeat: int = 3
+                ) -> Dict[str, float]:
+    """Time each stage of a scan of *target*, keeping the best of *repeat* runs.
+
+    Returns
+    -------
+    Dict[str, float]
+        seconds taken by each of ``STAGES``
+
+    """
+    app = Application(target, version)
+    current_version = VersionNumber(version)
+    timings = dict()
+    timings["discovery"] = _best_time(app._initialize_absolute_paths, repeat)
+    file_paths = app.file_paths
+
+    def read() -> List[str]:
+        sources = []
+        for file_path in file_paths:
+            with open(file_path) as fp:
+                sources.append(fp.read())
+        return sources
+
+    sources = read()
+    timings["read"] = _best_time(read, repeat)
+    trees = [ast.parse(source) for source in sources]
+    timings["parse"] = _best_time(lambda: [ast.parse(source) for source in sources], repeat)
+    deprecations = [_extract_deprecations(tree) for tree in trees]
+    timings["traverse"] = _best_time(lambda: [_extract_deprecations(tree) for tree in trees],
+                                     repeat)
+    timings["check"] = _best_time(
+        lambda: [find_invalid_deprecations(found, current_version) for found in deprecations],
+        repeat
+    )
+    return timings
+
+
+def benchmark_package(modules: int = 100, depth: int = 2, density: float = 0.1,
+                      lines: int = 200, seed: int = 0, repeat: int = 3,
+                      root: Optional[str] = None) -> dict:
+    """Generate a synthetic package and time each stage of scanning it.
+
+    See generate_package for the parameters that shape the package. If *root* is None, the
+    package is generated in a temporary directory that is removed afterwards.
+
+    Returns
+    -------
+    dict
+        a record with the parameters, the environment and the timings of the run, ready to
+        be stored in a history file
+
+    """
+    parameters = dict(modules=modules, depth=depth, density=density, lines=lines, seed=seed)
+    if root is None:
+        with tempfile.TemporaryDirectory() as tmp:
+            return benchmark_package(repeat=repeat, root=tmp, **parameters)
+    generate_package(root, **parameters)
+    timings = time_stages(os.path.join(root, "synthetic"), repeat=repeat)
+    return dict(
+        time=time.strftime("%Y-%m-%dT%H:%M:%S"),
+        derp_version=__version__,
+        python=platform.python_version(),
+        parameters=parameters,
+        repeat=repeat,
+        timings=timings,
+    )
+
+
+def load_history(path: str) -> List[dict]:
+    """Read the records in a history file, or none if the file doesn't exist."""
+    if not os.path.exists(path):
+        return []
+    with open(path) as fp:
+        return json.load(fp)
+
+
+def append_history(path: str, record: dict):
+    """Add a record to the end of a history file, creating it if necessary."""
+    history = load_history(path)
+    history.append(record)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as fp:
+        json.dump(history, fp, indent=2)
+        fp.write("\n")
+
+
+def find_baseline(history: List[dict], record: dict) -> Optional[dict]:
+    """Return the latest record in the history with the same parameters as *record*."""
+    for previous in reversed(history):
+        if previous.get("parameters") == record["parameters"]:
+            return previous
+    return None
+
+
+def find_regressions(record: dict, baseline: dict, tolerance: float = 0.25) -> List[str]:
+    """Compare the timings of a run with those of a baseline run.
+
+    Parameters
+    ----------
+    record: dict
+        the new run
+    baseline: dict
+        the run to compare with
+    tolerance: float
+        how much slower, as a fraction, a stage may get before it is a regression
+
+    Returns
+    -------
+    List[str]
+        a description of every stage that regressed
+
+    """
+    regressions = []
+    for stage in STAGES:
+        new = record["timings"].get(stage)
+        old = baseline["timings"].get(stage)
+        if new is None or old is None:
+            continue
+        if new > old * (1 + tolerance) and new - old > MIN_REGRESSION_SECONDS:
+            change = f" (+{(new / old - 1) * 100:.0f}%)" if old > 0 else ""
+            regressions.append(f"{stage}: {old * 1000:.1f} ms -> {new * 1000:.1f} ms{change}")
+    return regressions
+
+
+def format_record(record: dict, baseline: Optional[dict] = None) -> str:
+    """Format the timings of a run as a table, with the change from a baseline if given."""
+    parameters = ", ".join(f"{key}={value}" for key, value in record["parameters"].items())
+    lines = [f"Synthetic package: {parameters}"]
+    for stage in STAGES:
+        seconds = record["timings"][stage]
+        line = f"  {stage:<10} {seconds * 1000:10.2f} ms"
+        if baseline is not None and baseline["timings"].get(stage):
+            change = seconds / baseline["timings"][stage] - 1
+            line += f"  ({change * 100:+.0f}%)"
+        lines.append(line)
+    total = sum(record["timings"].values())
+    lines.append(f"  {'total':<10} {total * 1000:10.2f} ms")
+    return "\n".join(lines)
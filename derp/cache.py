@@ -0,0 +1,322 @@
+"""An on-disk cache of the deprecations found in each module, so that unchanged modules are
+never parsed twice.
+
+The cache stores the raw deprecation data (names, 'deprecated_in' and 'removed_in'), not the
+error messages, so an entry stays valid when the current version of the software changes.
+An entry is looked up by the absolute path of the module, and is valid if the size and
+modification time of the file are unchanged. If only the modification time has changed
+(e.g., after a fresh checkout in CI), the content hash of the file decides. Each entry also
+records the engine that found the deprecations (see derp.walker.ENGINES), which differ in
+what they find, and only a scan with the same engine uses it. Scans that also
+need the names each module uses (``derp usages``) store them in the entry as well, and
+treat an entry without them as a miss.
+
+All entries live in a single json file per "salt": the derp version and the registered
+deprecation types. Upgrading derp or registering a new deprecation type therefore starts
+a fresh cache, and the stale file is deleted.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from derp import DEPRECATION_TYPE_LIST, __version__
+from derp.deprecation import WrappedDeprecation
+from derp.walker import Usage
+
+DEFAULT_CACHE_DIR = ".derp_cache"
+
+"""Maximum number of modules to keep in the cache. When it is exceeded, the entries that
+have gone unused for the longest are evicted.
+"""
+DEFAULT_MAX_ENTRIES = 100000
+
+_CACHE_FORMAT = 2
+
+
+def _salt() -> str:
+    type_names = ",".join(f"{t.__module__}.{t.__qualname__}" for t in DEPRECATION_TYPE_LIST)
+    key = f"{_CACHE_FORMAT}|{__version__}|{type_names}"
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def content_hash(filepath: str) -> str:
+    """Return the sha256 hex digest of the contents of a file."""
+    with open(filepath, "rb") as fp:
+        return hashlib.sha256(fp.read()).hexdigest()
+
+
+class ResultCache:
+    """Cache of the deprecations found in each module.
+
+    Entries are loaded once when the cache is created and written back by ``save``.
+
+    Parameters
+    ----------
+    cache_dir: Optional[str]
+        directory in which to store the cache. It is created if it does not exist. If None,
+        the cache is kept in memory only, see WarmCache.
+    max_entries: int
+        maximum number of modules to keep in the cache
+    engine: str
+        the engine of the scan, see derp.walker.ENGINES. Entries written with another engine
+        are not used.
+
+    Attributes
+    ----------
+    hits: int
+        number of lookups that were answered from the cache
+    misses: int
+        number of lookups that were not
+
+    """
+
+    def __init__(self, cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, engine: str = "ast"):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.engine = engine
+        self.salt = _salt()
+        self.cache_path: Optional[str] = None
+        if cache_dir is not None:
+            self.cache_path = os.path.join(cache_dir, f"results-{self.salt}.json")
+        self.entries: Dict[str, dict] = self._load()
+        self.hits = 0
+        self.misses = 0
+        self._now = time.time()
+
+    def _load(self) -> Dict[str, dict]:
+        if self.cache_path is None:
+            return dict()
+        try:
+            with open(self.cache_path) as fp:
+                entries = json.load(fp)
+        except (OSError, ValueError):
+            return dict()
+        return entries if isinstance(entries, dict) else dict()
+
+    def get(self, filepath: str, with_uses: bool = False
+            ) -> Optional[List[WrappedDeprecation]]:
+        """Return the cached deprecations of a module, or None if there is no valid entry.
+
+        Parameters
+        ----------
+        filepath: str
+            absolute path to a python module
+        with_uses: bool
+            whether the entry must also hold the uses of the module, see get_uses
+
+        """
+        deprecations = self.peek(filepath)
+        if deprecations is not None and with_uses and "uses" not in self.entries[filepath]:
+            deprecations = None
+        if deprecations is None:
+            self.misses += 1
+            return None
+        self.entries[filepath]["used"] = self._now
+        self.hits += 1
+        return deprecations
+
+    def peek(self, filepath: str) -> Optional[List[WrappedDeprecation]]:
+        """Like ``get``, but without counting the lookup or marking the entry as used."""
+        entry = self.entries.get(filepath)
+        if entry is None or entry.get("engine") != self.engine:
+            return None
+        try:
+            stat = os.stat(filepath)
+            if stat.st_size != entry["size"]:
+                return None
+            if stat.st_mtime_ns != entry["mtime_ns"]:
+                if content_hash(filepath) != entry["sha256"]:
+                    return None
+                entry["mtime_ns"] = stat.st_mtime_ns
+            return self._decode(filepath, entry)
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _decode(self, filepath: str, entry: dict) -> List[WrappedDeprecation]:
+        """Rebuild the deprecations of a valid entry."""
+        return [WrappedDeprecation.from_dict(data, DEPRECATION_TYPE_LIST)
+                for data in entry["deprecations"]]
+
+    def get_uses(self, filepath: str) -> List[Usage]:
+        """Return the cached uses of a module, after a lookup with ``with_uses``."""
+        return [Usage(filepath, *use) for use in self.entries[filepath].get("uses", ())]
+
+    def put(self, filepath: str, deprecations: List[WrappedDeprecation],
+            uses: Optional[List[Usage]] = None):
+        """Store the deprecations of a module.
+
+        Parameters
+        ----------
+        filepath: str
+            absolute path to a python module
+        deprecations: List[WrappedDeprecation]
+            every deprecation found in the module, valid or not
+        uses: Optional[List[Usage]]
+            if given, the names that the module uses, see derp.walker.collect_usages
+
+        """
+        try:
+            stat = os.stat(filepath)
+            sha256 = content_hash(filepath)
+        except OSError:
+            return
+        self.entries[filepath] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256,
+            "used": self._now,
+            "engine": self.engine,
+            "deprecations": [deprecation.to_dict() for deprecation in deprecations],
+        }
+        if uses is not None:
+            self.entries[filepath]["uses"] = [list(use[1:]) for use in uses]
+
+    def _evict(self):
+        if len(self.entries) <= self.max_entries:
+            return
+        by_age = sorted(self.entries, key=lambda path: self.entries[path].get("used", 0))
+        for path in by_age[:len(self.entries) - self.max_entries]:
+            del self.entries[path]
+
+    def _remove_stale_files(self):
+        for name in os.listdir(self.cache_dir):
+            stale = name.startswith("results-") and name.endswith(".json")
+            if stale and name != os.path.basename(self.cache_path):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+
+    def save(self):
+        """Evict old entries and write the cache to disk.
+
+        The file is replaced atomically, so concurrent runs cannot corrupt it. If the cache
+        cannot be written, e.g., in a read-only checkout, a warning is written to stderr and
+        the results of the scan are unaffected.
+        """
+        self._evict()
+        if self.cache_path is None:
+            return
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, "w") as fp:
+                json.dump(self.entries, fp, separators=(",", ":"))
+            os.replace(tmp_path, self.cache_path)
+            self._remove_stale_files()
+        except OSError as exc:
+            print(f"Could not write the cache to {self.cache_dir}, continuing without it: "
+                  f"{exc}", file=sys.stderr)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+class WarmCache(ResultCache):
+    """A cache that stays in memory between the scans of a long-running process.
+
+    The deprecations of every entry are kept once decoded, so that looking up an unchanged
+    module costs little more than a stat. Scans don't write the cache to disk; ``flush`` does,
+    unless the cache has no directory.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, engine: str = "ast"):
+        super().__init__(cache_dir, max_entries, engine)
+        # The entry that each list of deprecations was decoded from
+        self._decoded: Dict[str, Tuple[dict, List[WrappedDeprecation]]] = dict()
+
+    def start(self, engine: str = "ast"):
+        """Start counting the hits and misses of a new scan, which uses *engine*."""
+        self.engine = engine
+        self.hits = 0
+        self.misses = 0
+        self._now = time.time()
+
+    def _decode(self, filepath: str, entry: dict) -> List[WrappedDeprecation]:
+        decoded = self._decoded.get(filepath)
+        if decoded is not None and decoded[0] is entry:
+            return decoded[1]
+        deprecations = super()._decode(filepath, entry)
+        self._decoded[filepath] = (entry, deprecations)
+        return deprecations
+
+    def put(self, filepath: str, deprecations: List[WrappedDeprecation],
+            uses: Optional[List[Usage]] = None):
+        super().put(filepath, deprecations, uses)
+        entry = self.entries.get(filepath)
+        if entry is not None:
+            self._decoded[filepath] = (entry, deprecations)
+
+    def save(self):
+        """Evict old entries, without writing the cache: it is written by ``flush``."""
+        self._evict()
+        self._forget_evicted()
+
+    def flush(self):
+        """Evict old entries and write the cache to disk."""
+        super().save()
+        self._forget_evicted()
+
+    def _forget_evicted(self):
+        for filepath in list(self._decoded):
+            if filepath not in self.entries:
+                del self._decoded[filepath]
+
+
+"""Caches that are reused by every scan in this process, by directory, once share_caches has
+been called.
+"""
+_shared_caches: Optional[Dict[str, WarmCache]] = None
+
+"""Caches that are kept in memory only, by working directory, for the scans that don't ask for
+a cache directory once share_caches has been called.
+"""
+_memory_caches: Dict[str, WarmCache] = dict()
+
+
+def share_caches() -> Dict[str, WarmCache]:
+    """Make every later scan in this process reuse a single, warm cache per directory.
+
+    Scans without a cache directory then reuse a cache per working directory that is kept in
+    memory only, so that a long-running process never parses an unchanged module twice.
+
+    Returns
+    -------
+    Dict[str, WarmCache]
+        the shared caches, by absolute directory, which are filled in as scans open them
+
+    """
+    global _shared_caches
+    if _shared_caches is None:
+        _shared_caches = dict()
+        _memory_caches.clear()
+    return _shared_caches
+
+
+def open_cache(cache_dir: Optional[str], engine: str = "ast") -> Optional[ResultCache]:
+    """Return the cache in a directory, loading it from disk unless it is shared and warm.
+
+    Without a directory, there is no cache unless caches are shared, in which case scans from
+    the same working directory share a cache that is never written to disk.
+    """
+    if _shared_caches is None:
+        return ResultCache(cache_dir, engine=engine) if cache_dir is not None else None
+    if cache_dir is None:
+        key = os.getcwd()
+        cache = _memory_caches.get(key)
+        if cache is None:
+            cache = _memory_caches[key] = WarmCache(None)
+    else:
+        key = os.path.abspath(cache_dir)
+        cache = _shared_caches.get(key)
+        if cache is None:
+            cache = _shared_caches[key] = WarmCache(key)
+    cache.start(engine)
+    return cache
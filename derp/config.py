@@ -0,0 +1,147 @@
+"""Read the packages to check from a configuration file, for repositories with many packages.
+
+The packages can be listed in pyproject.toml,
+
+.. code-block:: toml
+
+    [tool.derp]
+    packages = [
+        {target = "packages/a/src/a", version = "packages/a/src/a/__version__.py"},
+        {target = "packages/b/src/b", version = "packages/b/src/b/__version__.py", name = "b"},
+    ]
+
+or, equivalently, with one ``[[tool.derp.packages]]`` table per package. Reading pyproject.toml
+requires python 3.11 or the tomli package. Alternatively, they can be listed in setup.cfg,
+with one package per line, each a target followed by its version:
+
+.. code-block:: ini
+
+    [derp]
+    packages =
+        packages/a/src/a packages/a/src/a/__version__.py
+        packages/b/src/b packages/b/src/b/__version__.py
+
+Paths are relative to the directory that contains the configuration file. A version may also
+be given as a version number, e.g., "1.2.0". Each package is named after its target, unless
+a name is given.
+"""
+
+import configparser
+import os
+import re
+from typing import List, NamedTuple, Optional
+
+try:
+    import tomllib
+except ImportError:  # python < 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+"""Configuration files that are searched for a list of packages, in order."""
+CONFIG_FILES = ("pyproject.toml", "setup.cfg")
+
+_PYPROJECT_SECTION = re.compile(r"^\[+\s*tool\.derp\b", re.MULTILINE)
+
+
+class PackageConfig(NamedTuple):
+    """A package to check: the path to scan, and its version or version file. The version may
+    be None if the target is an archive, see derp.archive.
+    """
+
+    name: str
+    target: str
+    version: Optional[str]
+
+
+def _has_section(path: str) -> bool:
+    if os.path.basename(path) == "pyproject.toml":
+        with open(path, encoding="utf-8") as fp:
+            return _PYPROJECT_SECTION.search(fp.read()) is not None
+    parser = configparser.ConfigParser()
+    parser.read(path, encoding="utf-8")
+    return parser.has_section("derp")
+
+
+def find_config(directory: str) -> Optional[str]:
+    """Return the first file of ``CONFIG_FILES`` in a directory that lists packages, if any."""
+    for name in CONFIG_FILES:
+        path = os.path.join(directory, name)
+        if os.path.isfile(path) and _has_section(path):
+            return path
+    return None
+
+
+def _package(entry: dict, base: str) -> PackageConfig:
+    try:
+        target = entry["target"]
+        version = entry["version"]
+    except (KeyError, TypeError):
+        raise ValueError(f"Every package must have a 'target' and a 'version', not {entry}")
+    version_path = os.path.join(base, version)
+    # A version number, rather than a file, is kept as it is
+    if not os.path.exists(version_path) and re.match(r"^(\d+\.)*\d+$", version):
+        version_path = version
+    return PackageConfig(entry.get("name", target), os.path.join(base, target), version_path)
+
+
+def _read_pyproject(path: str) -> List[dict]:
+    if tomllib is None:
+        raise ValueError(f"Reading {path} requires python 3.11 or the tomli package")
+    with open(path, "rb") as fp:
+        try:
+            data = tomllib.load(fp)
+        except tomllib.TOMLDecodeError as exc:
+            raise ValueError(f"{path} is not valid toml: {exc}")
+    packages = data.get("tool", {}).get("derp", {}).get("packages")
+    if not isinstance(packages, list):
+        raise ValueError(f"[tool.derp] in {path} must have a list of 'packages'")
+    return packages
+
+
+def _read_setup_cfg(path: str) -> List[dict]:
+    parser = configparser.ConfigParser()
+    parser.read(path, encoding="utf-8")
+    if not parser.has_option("derp", "packages"):
+        raise ValueError(f"[derp] in {path} must have a list of 'packages'")
+    packages = []
+    for line in parser.get("derp", "packages").splitlines():
+        if not line.strip():
+            continue
+        parts = line.split()
+        if len(parts) != 2:
+            raise ValueError(f"Every package in {path} must be a target followed by a "
+                             f"version, not '{line.strip()}'")
+        packages.append({"target": parts[0], "version": parts[1]})
+    return packages
+
+
+def read_config(path: str) -> List[PackageConfig]:
+    """Read the packages listed in a configuration file.
+
+    Parameters
+    ----------
+    path: str
+        path to a pyproject.toml or setup.cfg file
+
+    Returns
+    -------
+    List[PackageConfig]
+        the packages, in the order they are listed, with paths resolved relative to the
+        directory of the configuration file
+
+    Raises
+    ------
+    ValueError
+        If the file doesn't list any packages, or lists them incorrectly
+
+    """
+    if os.path.basename(path) == "pyproject.toml":
+        entries = _read_pyproject(path)
+    else:
+        entries = _read_setup_cfg(path)
+    if not entries:
+        raise ValueError(f"{path} does not list any packages")
+    base = os.path.dirname(path)
+    return [_package(entry, base) for entry in entries]
@@ -1,39 +1,125 @@
-"""Classes corresponding to way a developer might mark something as deprecated.
-Currently, the only supported option is to use the @deprecated decorator from python's
-deprecation library. This is captured with PythonDeprecation. Additional types of deprecation
-can be added by creating new classes that extend Deprecation, and including them in the list
-``DEPRECATION_TYPE_LIST`` in __init__.py.
+"""Classes corresponding to ways a developer might mark something as deprecated.
+
+Three kinds of decorators are supported:
+
+* ``@deprecated(deprecated_in=..., removed_in=...)`` from python's deprecation library,
+  captured with PythonDeprecation
+* ``@deprecated("message")`` from PEP 702, i.e., ``warnings.deprecated`` or
+  ``typing_extensions.deprecated``, captured with Pep702Deprecation
+* ``@deprecated(version=..., reason=...)`` from the Deprecated library, captured with
+  DeprecatedLibraryDeprecation
+
+All three are usually imported as ``deprecated``, so they are told apart by the module they
+are accessed through, if any (e.g., ``@warnings.deprecated``), and otherwise by the shape of
+the call. The last two have no field for the removal version, so it is read from the message,
+e.g., "Use g() instead. Will be removed in 2.0."
+
+Additional types of deprecation can be added by creating new classes that extend Deprecation,
+and including them in the list ``DEPRECATION_TYPE_LIST`` in __init__.py.
 """
 
 import ast
+import re
 from abc import abstractmethod, ABC
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
+from derp.finding import EXPIRED, MISSING_REMOVAL_VERSION, MISSING_VERSIONS, UNPARSEABLE, \
+    UNPARSEABLE_VERSION, Finding, reason_message
+from derp.registry import decorator_name
 from derp.version_number import VersionNumber
 
 
+def _string_value(node: ast.AST) -> Optional[str]:
+    """Return the value of a string literal, or None if the node is anything else."""
+    if isinstance(node, ast.Constant):
+        value = node.value
+    else:
+        # ast.Str, before python 3.8
+        value = getattr(node, "s", None)
+    return value if isinstance(value, str) else None
+
+
+def _check_removal(removed_in: str, current_version: VersionNumber) -> Optional[str]:
+    """Return a reason code if the current version has reached the removal version."""
+    try:
+        removed_version = VersionNumber(removed_in)
+    except ValueError:
+        return UNPARSEABLE_VERSION
+    if current_version >= removed_version:
+        return EXPIRED
+    return None
+
+
 class Deprecation(ABC):
     """Abstract representation of a way to mark deprecations.
-    There are two things any child class ust implement.
-    * An initialization method that takes a node of type ast.AST and throws a ValueError
-        if it can't be parsed. Deprecations should only be initialized within a
-        try-except block.
-    * A check_error method that takes the current version and returns a string if there is
-        an error, otherwise returns None.
+    There are a few things any child class must implement.
+    * A from_decorator class method that takes a decorator node and returns the deprecation
+        it represents, or None if the decorator is not this kind of deprecation. It should
+        not raise an exception for decorators it doesn't recognize. For backwards
+        compatibility, the default implementation calls the initialization method and
+        returns None if it raises a ValueError.
+    * A check_reason method that takes the current version and returns a reason code from
+        derp.finding if the deprecation is invalid, otherwise returns None. Types that
+        predate reason codes may implement check_error instead, returning a message.
+    * A to_dict method and a from_dict class method that convert the deprecation to and from
+        its raw, json-serializable data, so that it can be cached between runs.
+
+    Child classes should also list the names a deprecation can be referred to by in
+    ``decorator_names``. Decorators are only handed to the deprecation types that list their
+    name, see derp.registry, and a module whose source contains none of the names registered
+    in ``DEPRECATION_TYPE_LIST`` is never parsed. If it is left empty, every decorator is
+    handed to the type and every module is parsed.
+
+    ``modules`` lists the modules the decorator may be accessed through, as in
+    ``@module.deprecated``. A decorator accessed through one of them is only handed to the
+    types that list that module.
     """
 
-    @abstractmethod
+    decorator_names: Tuple[str, ...] = ()
+    modules: Tuple[str, ...] = ()
+    # What went wrong, for reasons that need more than a code, see derp.finding.reason_message
+    detail: Optional[str] = None
+
+    @classmethod
+    def from_decorator(cls, decorator: ast.AST) -> Optional["Deprecation"]:
+        """Return the deprecation a decorator node represents, or None if it is not one."""
+        try:
+            return cls(decorator)
+        except ValueError:
+            return None
+
+    def check_reason(self, current_version: VersionNumber) -> Optional[str]:
+        """Return a reason code, see derp.finding, if the deprecation is invalid."""
+        if type(self).check_error is Deprecation.check_error:
+            raise NotImplementedError
+        # The message serves as the reason
+        return self.check_error(current_version)
+
     def check_error(self, current_version: VersionNumber) -> Optional[str]:
         """Return a user-facing error message if the deprecation is invalid."""
+        reason = self.check_reason(current_version)
+        if reason is None:
+            return None
+        return reason_message(reason, current_version.version, self.to_dict().get("removed_in"),
+                              self.detail)
+
+    @abstractmethod
+    def to_dict(self) -> Dict[str, Optional[str]]:
+        """Return the raw data of the deprecation as a json-serializable dictionary."""
+        raise NotImplementedError
+
+    @classmethod
+    @abstractmethod
+    def from_dict(cls, data: Dict[str, Optional[str]]) -> "Deprecation":
+        """Rebuild a deprecation from the output of to_dict, without an ast node."""
         raise NotImplementedError
 
 
 class PythonDeprecation(Deprecation):
-    """Attempt to parse a decorator from the deprecation library.
+    """Parse a decorator from the deprecation library.
 
-    Because we don't know if a node corresponds to a deprecation until we parse it,
-    we use exceptions to control the flow of the program.
-    ValueErrors are typical when initializing PythonDeprecation, and so it should only
-    be initialized within a try-except block.
+    The decorator must be called, with arguments (if any) that the deprecation library's
+    ``deprecated`` accepts: 'deprecated_in', 'removed_in', 'current_version' and 'details',
+    passed by keyword or, if there are at least two of them, by position.
 
     Parameters
     ----------
@@ -43,35 +129,50 @@ class PythonDeprecation(Deprecation):
     Raises
     ------
     ValueError
-        If the node cannot be parsed as a PythonDeprecation
+        If the node cannot be parsed as a PythonDeprecation. Use from_decorator to get
+        None instead.
 
     """
 
+    decorator_names = ("deprecated",)
+    modules = ("deprecation",)
+    arguments = ("deprecated_in", "removed_in", "current_version", "details")
+
     def __init__(self, decorator: ast.AST):
-        if isinstance(decorator, ast.Call):
-            try:
-                func: ast.Name = decorator.func
-                name: str = func.id
-                if not name == "deprecated":
-                    raise ValueError("Decorator does not follow Python Deprecation format")
-                keyword_dict = dict()
-                keywords: List[ast.keyword] = decorator.keywords
-                for keyword in keywords:
-                    try:
-                        arg = keyword.arg
-                        value = keyword.value.s
-                        keyword_dict[arg] = value
-                    except AttributeError:
-                        pass
-                self.deprecated_in = keyword_dict.get("deprecated_in", None)
-                self.removed_in = keyword_dict.get("removed_in", None)
-            except AttributeError:
-                raise ValueError("deprecation decorator must have \'func\' and \'name\' fields")
-        else:
+        versions = None
+        if decorator_name(decorator)[0] in self.decorator_names:
+            versions = self._parse(decorator)
+        if versions is None:
             raise ValueError("not a deprecation decorator")
+        self.deprecated_in, self.removed_in = versions
 
-    def check_error(self, current_version: VersionNumber) -> Optional[str]:
-        """Return a user-facing error message if the deprecation is invalid.
+    @classmethod
+    def _parse(cls, decorator: ast.AST) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        """Return 'deprecated_in' and 'removed_in', or None if the shape doesn't match."""
+        if not isinstance(decorator, ast.Call):
+            return None
+        # A single positional argument is the message of a PEP 702 deprecation
+        if len(decorator.args) == 1 or len(decorator.args) > len(cls.arguments):
+            return None
+        values = dict()
+        for arg, value in zip(cls.arguments, decorator.args):
+            values[arg] = _string_value(value)
+        for keyword in decorator.keywords:
+            if keyword.arg not in cls.arguments:
+                return None
+            values[keyword.arg] = _string_value(keyword.value)
+        return values.get("deprecated_in"), values.get("removed_in")
+
+    @classmethod
+    def from_decorator(cls, decorator: ast.AST) -> Optional["PythonDeprecation"]:
+        """Return the deprecation a decorator node represents, or None if it is not one."""
+        versions = cls._parse(decorator)
+        if versions is None:
+            return None
+        return cls.from_dict({"deprecated_in": versions[0], "removed_in": versions[1]})
+
+    def check_reason(self, current_version: VersionNumber) -> Optional[str]:
+        """Return a reason code if the deprecation is invalid.
 
         In order to be valid, a PythonDeprecation must have fields 'deprecated_in'
         and 'removed_in' both specified. Additionally, the current version of the software
@@ -84,14 +185,153 @@ class PythonDeprecation(Deprecation):
 
         """
         if self.deprecated_in is None or self.removed_in is None:
-            return "Both 'deprecated_in' and 'removed_in' must be specified"
-        try:
-            removed_version = VersionNumber(self.removed_in)
-            if current_version >= removed_version:
-                return "Current version, {}, exceeds expected removal version, {}" \
-                    .format(current_version.version, removed_version.version)
-        except ValueError as e:
-            return f"Encountered an exception when parsing a version number: {e}"
+            return MISSING_VERSIONS
+        return _check_removal(self.removed_in, current_version)
+
+    def to_dict(self) -> Dict[str, Optional[str]]:
+        """Return the raw 'deprecated_in' and 'removed_in' strings."""
+        return {"deprecated_in": self.deprecated_in, "removed_in": self.removed_in}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Optional[str]]) -> "PythonDeprecation":
+        """Rebuild a PythonDeprecation from the output of to_dict."""
+        deprecation = cls.__new__(cls)
+        deprecation.deprecated_in = data.get("deprecated_in")
+        deprecation.removed_in = data.get("removed_in")
+        return deprecation
+
+
+"""Matches the removal version in a deprecation message, e.g., "will be removed in 2.0"."""
+_REMOVED_IN = re.compile(r"\bremoved\s+(?:in|by|with)\s+(?:version\s+)?v?(\d+(?:\.\d+)*)",
+                         re.IGNORECASE)
+
+"""Matches the version in which something was deprecated, e.g., "deprecated since 1.4"."""
+_DEPRECATED_IN = re.compile(
+    r"\bdeprecated\s+(?:since|in|as\s+of)\s+(?:version\s+)?v?(\d+(?:\.\d+)*)", re.IGNORECASE
+)
+
+
+def _search_version(pattern, message: Optional[str]) -> Optional[str]:
+    if message is None:
+        return None
+    match = pattern.search(message)
+    return match.group(1) if match is not None else None
+
+
+class MessageDeprecation(Deprecation, ABC):
+    """A deprecation whose removal version, if any, is written in its message.
+
+    A MessageDeprecation is valid if its message names a removal version, e.g., "removed in
+    2.0", and the current version of the software is less than that version.
+    """
+
+    def __init__(self, deprecated_in: Optional[str], removed_in: Optional[str]):
+        self.deprecated_in = deprecated_in
+        self.removed_in = removed_in
+
+    def check_reason(self, current_version: VersionNumber) -> Optional[str]:
+        """Return a reason code if the deprecation is invalid."""
+        if self.removed_in is None:
+            return MISSING_REMOVAL_VERSION
+        return _check_removal(self.removed_in, current_version)
+
+    def to_dict(self) -> Dict[str, Optional[str]]:
+        """Return the raw 'deprecated_in' and 'removed_in' strings."""
+        return {"deprecated_in": self.deprecated_in, "removed_in": self.removed_in}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Optional[str]]) -> "MessageDeprecation":
+        """Rebuild a deprecation from the output of to_dict."""
+        return cls(data.get("deprecated_in"), data.get("removed_in"))
+
+
+class Pep702Deprecation(MessageDeprecation):
+    """Parse a ``@deprecated("message")`` decorator, as specified by PEP 702.
+
+    The message must be a string literal, and the only keywords allowed are 'category' and
+    'stacklevel'.
+    """
+
+    decorator_names = ("deprecated",)
+    modules = ("warnings", "typing_extensions")
+    keywords = ("category", "stacklevel")
+
+    @classmethod
+    def from_decorator(cls, decorator: ast.AST) -> Optional["Pep702Deprecation"]:
+        """Return the deprecation a decorator node represents, or None if it is not one."""
+        if not isinstance(decorator, ast.Call) or len(decorator.args) != 1:
+            return None
+        message = _string_value(decorator.args[0])
+        if message is None:
+            return None
+        for keyword in decorator.keywords:
+            if keyword.arg not in cls.keywords:
+                return None
+        return cls(_search_version(_DEPRECATED_IN, message),
+                   _search_version(_REMOVED_IN, message))
+
+
+class DeprecatedLibraryDeprecation(MessageDeprecation):
+    """Parse a decorator from the Deprecated library, e.g., ``@deprecated(version="1.4",
+    reason="use g() instead, it will be removed in 2.0")``.
+
+    The decorator may be used bare, as ``@deprecated``, or called with at most one positional
+    argument (the reason) and the keywords the library accepts. 'version' is the version in
+    which the decorated object was deprecated.
+    """
+
+    decorator_names = ("deprecated",)
+    modules = ("deprecated", "deprecated.classic", "deprecated.sphinx")
+    keywords = ("reason", "version", "action", "category", "extra_stacklevel", "line_length")
+
+    @classmethod
+    def from_decorator(cls, decorator: ast.AST) -> Optional["DeprecatedLibraryDeprecation"]:
+        """Return the deprecation a decorator node represents, or None if it is not one."""
+        if not isinstance(decorator, ast.Call):
+            return cls(None, None)
+        if len(decorator.args) > 1:
+            return None
+        values = dict()
+        if decorator.args:
+            values["reason"] = _string_value(decorator.args[0])
+        for keyword in decorator.keywords:
+            if keyword.arg not in cls.keywords:
+                return None
+            values[keyword.arg] = _string_value(keyword.value)
+        reason = values.get("reason")
+        deprecated_in = values.get("version") or _search_version(_DEPRECATED_IN, reason)
+        return cls(deprecated_in, _search_version(_REMOVED_IN, reason))
+
+
+class UnparseableModule(Deprecation):
+    """Stands in for the deprecations of a module that could not be read or parsed.
+
+    It is not a kind of decorator, and is never registered in ``DEPRECATION_TYPE_LIST``. A
+    scan that fails on a module reports it in place of the module's deprecations, so that
+    the failure becomes an "unparseable" finding rather than aborting the scan.
+
+    Parameters
+    ----------
+    detail: str
+        what went wrong, e.g., "SyntaxError: invalid syntax"
+
+    """
+
+    def __init__(self, detail: str):
+        self.detail = detail
+
+    def check_reason(self, current_version: VersionNumber) -> Optional[str]:
+        """Always invalid, whatever the version."""
+        return UNPARSEABLE
+
+    def to_dict(self) -> Dict[str, Optional[str]]:
+        """Return the detail."""
+        return {"detail": self.detail}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Optional[str]]) -> "UnparseableModule":
+        """Rebuild an UnparseableModule from the output of to_dict."""
+        return cls(data.get("detail"))
 
 
 class WrappedDeprecation:
@@ -103,13 +343,24 @@ class WrappedDeprecation:
     ----------
     name: str
         the name of the method or class that has the deprecation decorator
-    deprecation: PythonDeprecation
+    deprecation: Deprecation
         a representation of the deprecation decorator
+    qualname: Optional[str]
+        the qualified name of the method or class within its module, e.g., "MyClass.method".
+        Defaults to the name.
+    lineno: Optional[int]
+        line number of the deprecation decorator
+    col: Optional[int]
+        column offset of the deprecation decorator
     """
 
-    def __init__(self, name: str, deprecation: PythonDeprecation):
+    def __init__(self, name: str, deprecation: Deprecation, qualname: Optional[str] = None,
+                 lineno: Optional[int] = None, col: Optional[int] = None):
         self.name = name
         self.deprecation = deprecation
+        self.qualname = qualname if qualname is not None else name
+        self.lineno = lineno
+        self.col = col
 
     def check_error(self, current_version: VersionNumber) -> Optional[str]:
         """Return an error message, if the deprecation is invalid for the current version.
@@ -128,3 +379,54 @@ class WrappedDeprecation:
         deprecation_error = self.deprecation.check_error(current_version)
         if deprecation_error is not None:
             return "{}: {}".format(self.name, deprecation_error)
+
+    def check(self, current_version: VersionNumber, path: str = "") -> Optional[Finding]:
+        """Return a finding, if the deprecation is invalid for the current version.
+
+        Parameters
+        ----------
+        current_version: VersionNumber
+            the current version of the software, against which to check the deprecation
+        path: str
+            path to the module that contains the deprecation
+
+        """
+        reason = self.deprecation.check_reason(current_version)
+        if reason is None:
+            return None
+        versions = self.deprecation.to_dict()
+        return Finding(path, self.lineno, self.col, self.qualname, versions.get("deprecated_in"),
+                       versions.get("removed_in"), type(self.deprecation).__name__, reason,
+                       current_version.version, self.deprecation.detail)
+
+    def to_dict(self) -> Dict[str, Optional[str]]:
+        """Return a json-serializable dictionary, including the type of the deprecation."""
+        data = {"name": self.name, "qualname": self.qualname, "lineno": self.lineno,
+                "col": self.col, "type": type(self.deprecation).__name__}
+        data.update(self.deprecation.to_dict())
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Optional[str]],
+                  deprecation_types: List[type]) -> "WrappedDeprecation":
+        """Rebuild a WrappedDeprecation from the output of to_dict.
+
+        Parameters
+        ----------
+        data: Dict[str, Optional[str]]
+            output of to_dict
+        deprecation_types: List[type]
+            the registered deprecation types, one of which must match data["type"]
+
+        Raises
+        ------
+        ValueError
+            If the type of the deprecation is not registered
+
+        """
+        for deprecation_type in deprecation_types:
+            if deprecation_type.__name__ == data["type"]:
+                return cls(data["name"], deprecation_type.from_dict(data),
+                           qualname=data.get("qualname"), lineno=data.get("lineno"),
+                           col=data.get("col"))
+        raise ValueError(f"Unknown deprecation type {data['type']}")
@@ -0,0 +1,248 @@
+"""Find the python modules to scan, quickly and lazily.
+
+Directories are listed with ``os.scandir``, which avoids a stat call per entry, and excluded
+directories are pruned before they are entered. Version control metadata, virtual
+environments, build output and caches often hold more files than the package itself, so they
+are excluded by default. Modules are yielded as soon as they are found, so scanning can start
+before the walk has finished.
+
+Exclude patterns are shell-style globs, as understood by ``fnmatch``. A pattern that contains
+a slash is matched against the path relative to the target, any other pattern against the
+name of each file and directory. All patterns are compiled into a single regular expression.
+
+Optionally, ``.gitignore`` files are honoured as well: those in the target and its
+subdirectories, and those in its parent directories up to the root of the git repository.
+The common subset of the gitignore syntax is supported: comments, negation with ``!``,
+directory-only patterns with a trailing ``/``, anchoring with a leading or inner ``/``, and
+the wildcards ``*``, ``?``, ``[...]`` and ``**``.
+"""
+
+import fnmatch
+import os
+import re
+from typing import Iterable, Iterator, List, Optional, Pattern, Tuple
+
+"""Names of files and directories that are never scanned unless default excludes are off."""
+DEFAULT_EXCLUDES = (
+    ".git", ".hg", ".svn", ".tox", ".nox", ".venv", "venv", "build", "dist", "node_modules",
+    "__pycache__", ".mypy_cache", ".pytest_cache", ".derp_cache", "*.egg-info",
+)
+
+_NEVER = re.compile(r"(?!)")
+
+
+def _compile_globs(patterns: Iterable[str]) -> Tuple[Pattern[str], Pattern[str]]:
+    """Compile exclude globs into one regex for names and one for relative paths."""
+    name_globs = []
+    path_globs = []
+    for pattern in patterns:
+        pattern = pattern.strip().rstrip("/")
+        if not pattern:
+            continue
+        if "/" in pattern:
+            path_globs.append(fnmatch.translate(pattern.lstrip("/")))
+        else:
+            name_globs.append(fnmatch.translate(pattern))
+    name_regex = re.compile("|".join(name_globs)) if name_globs else _NEVER
+    path_regex = re.compile("|".join(path_globs)) if path_globs else _NEVER
+    return name_regex, path_regex
+
+
+def _translate_gitignore(pattern: str) -> str:
+    """Translate the body of a gitignore pattern into a regex over '/'-separated paths."""
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+    parts = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i) and (i == 0 or pattern[i - 1] == "/"):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            parts.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            body = pattern[i + 1:end]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            parts.append("[" + body.replace("\\", "\\\\") + "]")
+            i = end + 1
+        elif pattern[i] == "\\" and i + 1 < len(pattern):
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    body = "".join(parts)
+    return body if anchored else f"(?:.*/)?{body}"
+
+
+class GitignoreRule:
+    """A single line of a .gitignore file.
+
+    Parameters
+    ----------
+    line: str
+        the line, without its newline
+    base: str
+        absolute path of the directory that contains the .gitignore file
+
+    """
+
+    def __init__(self, line: str, base: str):
+        self.base = base
+        self._prefix = os.path.join(base, "")
+        self.negated = line.startswith("!")
+        if self.negated:
+            line = line[1:]
+        self.directory_only = line.endswith("/")
+        self.regex = re.compile(_translate_gitignore(line.rstrip("/")) + r"\Z")
+
+    def matches(self, path: str, is_dir: bool) -> bool:
+        """Whether the rule matches an absolute path below its base directory."""
+        if (self.directory_only and not is_dir) or not path.startswith(self._prefix):
+            return False
+        relative = path[len(self._prefix):].replace(os.sep, "/")
+        return self.regex.match(relative) is not None
+
+
+def read_gitignore(directory: str) -> List[GitignoreRule]:
+    """Read the rules of the .gitignore file in a directory, if there is one."""
+    try:
+        with open(os.path.join(directory, ".gitignore")) as fp:
+            lines = fp.read().splitlines()
+    except OSError:
+        return []
+    rules = []
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("\\#") or line.startswith("\\!"):
+            line = line[1:]
+        rules.append(GitignoreRule(line, directory))
+    return rules
+
+
+def _ancestor_gitignores(directory: str) -> List[GitignoreRule]:
+    """Read the .gitignore files of the parents of a directory, up to the repository root."""
+    ancestors = []
+    current = os.path.dirname(directory)
+    while True:
+        ancestors.append(current)
+        if os.path.exists(os.path.join(current, ".git")):
+            break
+        parent = os.path.dirname(current)
+        if parent == current:
+            # not in a git repository, so no parent .gitignore applies
+            return []
+        current = parent
+    rules = []
+    for ancestor in reversed(ancestors):
+        rules.extend(read_gitignore(ancestor))
+    return rules
+
+
+def _is_ignored(rules: List[GitignoreRule], path: str, is_dir: bool) -> bool:
+    ignored = False
+    for rule in rules:
+        if rule.matches(path, is_dir):
+            ignored = not rule.negated
+    return ignored
+
+
+class FileDiscovery:
+    """Lazily find every python module at or below a target path.
+
+    Parameters
+    ----------
+    target: str
+        absolute path to a file or directory
+    exclude: Iterable[str]
+        glob patterns of files and directories to skip, in addition to ``DEFAULT_EXCLUDES``
+    default_excludes: bool
+        whether to skip ``DEFAULT_EXCLUDES`` and virtual environments
+    gitignore: bool
+        whether to skip files and directories ignored by .gitignore files
+
+    """
+
+    def __init__(self, target: str, exclude: Iterable[str] = (), default_excludes: bool = True,
+                 gitignore: bool = False):
+        self.target = target
+        patterns = list(exclude)
+        if default_excludes:
+            patterns.extend(DEFAULT_EXCLUDES)
+        self.default_excludes = default_excludes
+        self._name_regex, self._path_regex = _compile_globs(patterns)
+        self.gitignore = gitignore
+
+    def is_excluded(self, path: str) -> bool:
+        """Whether a path below the target, or any directory on the way to it, is excluded."""
+        relative = os.path.relpath(path, self.target).replace(os.sep, "/")
+        parts = relative.split("/")
+        for i, name in enumerate(parts):
+            if self._name_regex.match(name) or self._path_regex.match("/".join(parts[:i + 1])):
+                return True
+        return False
+
+    def _excluded(self, entry: os.DirEntry, relative: str, is_dir: bool) -> bool:
+        if self._name_regex.match(entry.name) or self._path_regex.match(relative):
+            return True
+        if is_dir and self.default_excludes:
+            # A virtual environment, whatever its name
+            return os.path.exists(os.path.join(entry.path, "pyvenv.cfg"))
+        return False
+
+    def __iter__(self) -> Iterator[str]:
+        if os.path.isfile(self.target):
+            if self.target.endswith(".py"):
+                yield self.target
+            return
+        rules = _ancestor_gitignores(self.target) if self.gitignore else []
+        # Depth-first, with the files of a directory before its subdirectories, like os.walk
+        stack: List[Tuple[str, str, List[GitignoreRule]]] = [(self.target, "", rules)]
+        while stack:
+            directory, prefix, rules = stack.pop()
+            if self.gitignore:
+                rules = rules + read_gitignore(directory)
+            try:
+                with os.scandir(directory) as it:
+                    entries = sorted(it, key=lambda entry: entry.name)
+            except OSError:
+                continue
+            subdirectories = []
+            for entry in entries:
+                relative = prefix + entry.name
+                try:
+                    # Like os.walk, don't follow symbolic links to directories
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if not is_dir and not entry.name.endswith(".py"):
+                    continue
+                if self._excluded(entry, relative, is_dir):
+                    continue
+                if rules and _is_ignored(rules, entry.path, is_dir):
+                    continue
+                if is_dir:
+                    subdirectories.append((entry.path, relative + "/", rules))
+                else:
+                    yield entry.path
+            stack.extend(reversed(subdirectories))
+
+
+def iter_python_files(target: str, exclude: Optional[Iterable[str]] = None,
+                      default_excludes: bool = True, gitignore: bool = False) -> Iterator[str]:
+    """Lazily yield the absolute path of every python module at or below *target*.
+
+    See FileDiscovery for a description of the parameters.
+    """
+    return iter(FileDiscovery(target, exclude or (), default_excludes, gitignore))
@@ -0,0 +1,121 @@
+"""Run a function over many files, either serially or on a pool of worker processes.
+
+Parsing is CPU-bound, so threads don't help; a process pool does. Files are handed to the
+workers in chunks so that the cost of pickling arguments and results is paid once per chunk
+rather than once per file. Results are always yielded in the order of the input paths, which
+keeps the output of a parallel run identical to that of a serial run.
+
+Only a few chunks per worker are in flight at any time: the input is consumed as the results
+are, so that a lazy input (discovery, or files read ahead by derp.prefetch) is never read far
+ahead of the workers, and the first results are yielded before the last paths are known.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Callable, Deque, Iterable, Iterator, List, Sized, TypeVar, Union
+
+T = TypeVar("T")
+
+"""Number of files per chunk when the number of files is not known in advance."""
+DEFAULT_CHUNK_SIZE = 16
+
+"""Number of chunks to create per worker. More than one chunk per worker evens out the load
+when some files are much larger than others, while still keeping the chunks large.
+"""
+CHUNKS_PER_WORKER = 4
+
+"""Number of chunks per worker that are submitted but not yet yielded. Two keep every worker
+busy while the results of the previous chunk are consumed.
+"""
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+
+def resolve_jobs(jobs: Union[int, str, None]) -> int:
+    """Convert a user-facing job count into a number of worker processes.
+
+    Parameters
+    ----------
+    jobs: Union[int, str, None]
+        a positive integer, the string "auto" to use every available cpu, or None for a
+        serial run
+
+    Returns
+    -------
+    int
+        the number of processes to use, at least 1
+
+    """
+    if jobs is None:
+        return 1
+    if jobs == "auto":
+        return os.cpu_count() or 1
+    try:
+        n_jobs = int(jobs)
+    except ValueError:
+        raise ValueError(f"jobs must be a positive integer or 'auto', not {jobs}")
+    if n_jobs < 1:
+        raise ValueError(f"jobs must be a positive integer or 'auto', not {jobs}")
+    return n_jobs
+
+
+def _chunk_size(n_items: int, n_jobs: int) -> int:
+    return max(1, n_items // (n_jobs * CHUNKS_PER_WORKER))
+
+
+def _apply_to_chunk(func: Callable[[str], T], chunk: List[str]) -> List[T]:
+    return [func(item) for item in chunk]
+
+
+def map_files(func: Callable[[str], T], file_paths: Iterable[str], jobs: int = 1) -> Iterator[T]:
+    """Apply *func* to every path, yielding results in the same order as *file_paths*.
+
+    Parameters
+    ----------
+    func: Callable[[str], T]
+        a picklable callable (a module-level function or a functools.partial of one)
+    file_paths: Iterable[str]
+        paths to apply the function to. If this is a lazy iterator, it is consumed as
+        results are needed: in a parallel run, at most ``CHUNKS_IN_FLIGHT_PER_WORKER`` chunks
+        per worker ahead of the results that have been yielded.
+    jobs: int
+        number of worker processes. With 1 job, or only a single file, everything runs in
+        the current process.
+
+    Returns
+    -------
+    Iterator[T]
+        results of the function, in input order
+
+    """
+    n_files = len(file_paths) if isinstance(file_paths, Sized) else None
+    if jobs <= 1 or (n_files is not None and n_files <= 1):
+        yield from map(func, file_paths)
+        return
+    if n_files is None:
+        n_workers = jobs
+        chunk_size = DEFAULT_CHUNK_SIZE
+    else:
+        n_workers = min(jobs, n_files)
+        chunk_size = _chunk_size(n_files, n_workers)
+    max_in_flight = n_workers * CHUNKS_IN_FLIGHT_PER_WORKER
+    items = iter(file_paths)
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        in_flight: Deque[Future] = deque()
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(in_flight) < max_in_flight:
+                    chunk = list(islice(items, chunk_size))
+                    if chunk:
+                        in_flight.append(executor.submit(_apply_to_chunk, func, chunk))
+                    else:
+                        exhausted = True
+                if not in_flight:
+                    return
+                yield from in_flight.popleft().result()
+        finally:
+            # If the consumer stopped early, the chunks that have not started are dropped
+            for future in in_flight:
+                future.cancel()
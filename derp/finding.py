@@ -0,0 +1,105 @@
+"""Compact records of invalid deprecations, for reporters and for tools that call derp directly.
+
+A Finding is a named tuple of plain values, so that it is cheap to keep many of them, easy to
+serialize and comparable. Rather than a formatted message, it carries a reason code (one of
+``REASONS``), and the message is only formatted when it is needed.
+"""
+
+from typing import Dict, NamedTuple, Optional
+
+"""The deprecation must specify both the version it was deprecated in and its removal version."""
+MISSING_VERSIONS = "missing-versions"
+"""The deprecation message must name a removal version."""
+MISSING_REMOVAL_VERSION = "missing-removal-version"
+"""The current version has reached the removal version."""
+EXPIRED = "expired"
+"""The removal version is not a sequence of integers."""
+UNPARSEABLE_VERSION = "unparseable-version"
+"""The module could not be read or parsed, so its deprecations could not be checked."""
+UNPARSEABLE = "unparseable"
+
+"""Message for each reason code. A deprecation type that predates reason codes reports its
+message in place of a code, and that message is used as it is.
+"""
+REASONS: Dict[str, str] = {
+    MISSING_VERSIONS: "Both 'deprecated_in' and 'removed_in' must be specified",
+    MISSING_REMOVAL_VERSION: "The deprecation message must name a removal version, "
+                             "e.g., 'removed in 2.0'",
+    EXPIRED: "Current version, {version}, exceeds expected removal version, {removed_in}",
+    UNPARSEABLE_VERSION: "Encountered an exception when parsing a version number: version "
+                         "{removed_in} is not parseable as a sequence of integers",
+    UNPARSEABLE: "The module could not be checked: {detail}",
+}
+
+
+def reason_message(reason: str, version: str, removed_in: Optional[str],
+                   detail: Optional[str] = None) -> str:
+    """Format the human-readable message of a reason code.
+
+    Parameters
+    ----------
+    reason: str
+        one of ``REASONS``, or a message
+    version: str
+        the current version, against which the deprecation was checked
+    removed_in: Optional[str]
+        the removal version of the deprecation
+    detail: Optional[str]
+        what went wrong, for reasons that need more than a code, e.g., the syntax error
+        that made a module unparseable
+
+    """
+    template = REASONS.get(reason)
+    if template is None:
+        return reason
+    return template.format(version=version, removed_in=removed_in, detail=detail)
+
+
+class Finding(NamedTuple):
+    """An invalid deprecation.
+
+    Attributes
+    ----------
+    path: str
+        path to the module that contains the deprecation
+    line: Optional[int]
+        line number of the deprecation decorator
+    col: Optional[int]
+        column offset of the deprecation decorator
+    qualname: str
+        qualified name of the deprecated function or class, e.g., "MyClass.method"
+    deprecated_in: Optional[str]
+        version in which it was deprecated, if known
+    removed_in: Optional[str]
+        version in which it is to be removed, if known
+    detector: str
+        name of the deprecation type that found it, e.g., "PythonDeprecation"
+    reason: str
+        why the deprecation is invalid, one of ``REASONS``
+    version: str
+        the current version, against which the deprecation was checked
+    detail: Optional[str]
+        what went wrong, for reasons that need more than a code (see reason_message)
+
+    """
+
+    path: str
+    line: Optional[int]
+    col: Optional[int]
+    qualname: str
+    deprecated_in: Optional[str]
+    removed_in: Optional[str]
+    detector: str
+    reason: str
+    version: str
+    detail: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        """The name of the deprecated function or class, without its enclosing scopes."""
+        return self.qualname.rpartition(".")[2]
+
+    @property
+    def message(self) -> str:
+        """A human-readable description of why the deprecation is invalid."""
+        return reason_message(self.reason, self.version, self.removed_in, self.detail)
@@ -0,0 +1,127 @@
+"""Forecast which deprecations will have expired at any number of future versions.
+
+The package is scanned once, and every deprecation is indexed by its parsed removal version.
+The deprecations that have expired at a given version are then a prefix of the index, found
+by binary search, so asking about more versions costs almost nothing.
+"""
+
+import sys
+from bisect import bisect_right
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from derp.application import Application
+from derp.deprecation import WrappedDeprecation
+from derp.version_number import VersionNumber
+
+
+class IndexedDeprecation(NamedTuple):
+    """A deprecation and the path of the module it was found in."""
+
+    path: str
+    deprecation: WrappedDeprecation
+
+
+class DeprecationIndex:
+    """Deprecations sorted by removal version.
+
+    Parameters
+    ----------
+    extracted: Iterable[Tuple[str, List[WrappedDeprecation]]]
+        pairs of a module path and every deprecation in that module
+
+    Attributes
+    ----------
+    unscheduled: List[IndexedDeprecation]
+        deprecations whose removal version is missing or cannot be parsed
+
+    """
+
+    def __init__(self, extracted: Iterable[Tuple[str, List[WrappedDeprecation]]]):
+        scheduled = []
+        self.unscheduled: List[IndexedDeprecation] = []
+        for path, deprecations in extracted:
+            for deprecation in deprecations:
+                entry = IndexedDeprecation(path, deprecation)
+                removed_version = _removal_version(deprecation)
+                if removed_version is None:
+                    self.unscheduled.append(entry)
+                else:
+                    scheduled.append((removed_version, entry))
+        scheduled.sort(key=lambda pair: pair[0])
+        self._removal_versions = [removed_version for removed_version, _ in scheduled]
+        self._entries = [entry for _, entry in scheduled]
+
+    def __len__(self):
+        return len(self._entries) + len(self.unscheduled)
+
+    def expired_at(self, version: VersionNumber) -> List[IndexedDeprecation]:
+        """Return every deprecation that is due for removal at or before *version*.
+
+        The result is sorted by removal version.
+        """
+        return self._entries[:bisect_right(self._removal_versions, version)]
+
+
+def _removal_version(deprecation: WrappedDeprecation) -> Optional[VersionNumber]:
+    removed_in = getattr(deprecation.deprecation, "removed_in", None)
+    if removed_in is None:
+        return None
+    try:
+        return VersionNumber(removed_in)
+    except ValueError:
+        return None
+
+
+def _describe(entry: IndexedDeprecation) -> str:
+    removed_in = getattr(entry.deprecation.deprecation, "removed_in", None)
+    description = f"{entry.path}: {entry.deprecation.name}"
+    if removed_in is not None:
+        description += f" (removed in {removed_in})"
+    return description
+
+
+class ForecastApplication(Application):
+    """Scan a package once and report the deprecations that expire at each of many versions.
+
+    Parameters
+    ----------
+    target: str
+        path to the file or directory to scan for deprecations
+    versions: List[str]
+        the versions to forecast, as strings
+    **kwargs
+        passed on to Application, e.g., ``jobs`` or ``cache_dir``
+
+    """
+
+    def __init__(self, target: str, versions: List[str], **kwargs):
+        super().__init__(target, version=None, **kwargs)
+        self.versions = versions
+        self.target_versions: Optional[List[VersionNumber]] = None
+        self.index: Optional[DeprecationIndex] = None
+
+    def initialize(self):
+        """Parse the target versions and find the files to scan."""
+        self.target_versions = sorted(VersionNumber(version) for version in self.versions)
+        self._initialize_absolute_paths()
+
+    def run_checks(self):
+        """Extract the deprecations from every file and index them."""
+        self.index = DeprecationIndex(self._parseable(self._extract()))
+
+    def report(self):
+        """Print the deprecations that have expired at each target version."""
+        for version in self.target_versions:
+            expired = self.index.expired_at(version)
+            print(f"At version {version.version}, {len(expired)} of {len(self.index)} "
+                  f"deprecations have expired" + (":" if expired else ""))
+            for entry in expired:
+                print(f"\t{_describe(entry)}")
+        if self.index.unscheduled:
+            print(f"{len(self.index.unscheduled)} deprecations have no parseable "
+                  f"removal version:")
+            for entry in self.index.unscheduled:
+                print(f"\t{_describe(entry)}")
+        self.print_unparseable()
+        if self.verbose:
+            print(self.summary(), file=sys.stderr)
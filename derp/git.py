@@ -0,0 +1,43 @@
+"""Ask git which files have changed, so that a scan can be limited to them."""
+
+import os
+import subprocess
+from typing import List, Set
+
+
+def _git(args: List[str], cwd: str) -> str:
+    try:
+        result = subprocess.run(["git"] + args, cwd=cwd, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, universal_newlines=True)
+    except FileNotFoundError:
+        raise ValueError("git must be installed to scan only changed files")
+    if result.returncode != 0:
+        raise ValueError(f"git {' '.join(args)} failed: {result.stderr.strip()}")
+    return result.stdout
+
+
+def changed_files(ref: str, path: str) -> Set[str]:
+    """Return the absolute paths of all files that differ from a git ref.
+
+    This includes committed, staged and unstaged changes relative to *ref*, as well as
+    untracked files that are not ignored. Deleted files are excluded.
+
+    Parameters
+    ----------
+    ref: str
+        any git revision, e.g., a branch name or a commit hash
+    path: str
+        a file or directory inside the git repository
+
+    Raises
+    ------
+    ValueError
+        If git is not installed, *path* is not in a git repository or *ref* is unknown
+
+    """
+    cwd = path if os.path.isdir(path) else os.path.dirname(path)
+    root = _git(["rev-parse", "--show-toplevel"], cwd).strip()
+    diff = _git(["diff", "--name-only", "-z", "--diff-filter=d", ref, "--"], root)
+    untracked = _git(["ls-files", "--others", "--exclude-standard", "-z"], root)
+    names = [name for name in (diff + untracked).split("\0") if name]
+    return {os.path.realpath(os.path.join(root, name)) for name in names}
@@ -0,0 +1,288 @@
+"""A persistent inventory of every deprecation in a package, stored in a SQLite database.
+
+``derp index`` builds the inventory and keeps it up to date: a module is parsed again only if
+its size and modification time, or failing those its content hash, have changed.
+``derp query`` then answers questions such as "what was deprecated before 1.4?" or
+"what in this package is due for removal by 2.0?" from the database, without scanning.
+
+Version numbers cannot be compared as strings, so every parseable version is also stored as
+a sort key in which each component is zero-padded. Comparing keys as strings then gives the
+same ordering as comparing VersionNumbers, and the comparison can use an index.
+"""
+
+import os
+import sqlite3
+import sys
+from typing import List, Optional, Set
+
+from derp.application import Application
+from derp.cache import DEFAULT_CACHE_DIR, content_hash
+from derp.deprecation import WrappedDeprecation
+from derp.version_number import VersionNumber
+from derp.walker import unparseable_module
+
+DEFAULT_DATABASE = os.path.join(DEFAULT_CACHE_DIR, "inventory.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS deprecations (
+    path TEXT NOT NULL,
+    lineno INTEGER,
+    col INTEGER,
+    name TEXT NOT NULL,
+    qualname TEXT NOT NULL,
+    deprecated_in TEXT,
+    removed_in TEXT,
+    deprecated_key TEXT,
+    removed_key TEXT,
+    detector TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS deprecations_path ON deprecations (path);
+CREATE INDEX IF NOT EXISTS deprecations_deprecated_key ON deprecations (deprecated_key);
+CREATE INDEX IF NOT EXISTS deprecations_removed_key ON deprecations (removed_key);
+CREATE INDEX IF NOT EXISTS deprecations_detector ON deprecations (detector);
+"""
+
+_COLUMNS = ("path", "lineno", "col", "name", "qualname", "deprecated_in", "removed_in",
+            "detector")
+
+"""Number of digits each version component is padded to in a sort key."""
+_KEY_WIDTH = 10
+
+
+def version_key(version: Optional[str]) -> Optional[str]:
+    """Convert a version string to a key that sorts like the version, or None if unparseable.
+
+    Trailing zeros are dropped, so that "1.2" and "1.2.0" have the same key.
+    """
+    if version is None:
+        return None
+    try:
+        numbers = VersionNumber(version).version_numbers
+    except ValueError:
+        return None
+    while len(numbers) > 1 and numbers[-1] == 0:
+        numbers = numbers[:-1]
+    return ".".join(str(number).zfill(_KEY_WIDTH) for number in numbers)
+
+
+def _required_key(version: str) -> str:
+    key = version_key(version)
+    if key is None:
+        raise ValueError(f"version {version} is not parseable as a sequence of integers")
+    return key
+
+
+class Inventory:
+    """A SQLite database of deprecations and the state of the files they were found in.
+
+    Parameters
+    ----------
+    database: str
+        path to the database file. It is created, along with its directory, if necessary.
+
+    """
+
+    def __init__(self, database: str = DEFAULT_DATABASE):
+        self.database = database
+        directory = os.path.dirname(database)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(database)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        """Commit any changes and close the database."""
+        self.connection.commit()
+        self.connection.close()
+
+    def stale_files(self, file_paths: List[str]) -> List[str]:
+        """Return the files whose recorded deprecations may be out of date.
+
+        A file whose modification time changed but whose content did not is not stale;
+        its recorded modification time is updated instead. A file that cannot be read, such as
+        a broken symbolic link, is stale, so that the scan reports it.
+        """
+        stale = []
+        for file_path in file_paths:
+            row = self.connection.execute(
+                "SELECT size, mtime_ns, sha256 FROM files WHERE path = ?", (file_path,)
+            ).fetchone()
+            try:
+                stat = os.stat(file_path)
+                unchanged = row is not None and row["size"] == stat.st_size and (
+                    row["mtime_ns"] == stat.st_mtime_ns or
+                    content_hash(file_path) == row["sha256"])
+            except OSError:
+                unchanged = False
+            if not unchanged:
+                stale.append(file_path)
+            elif row["mtime_ns"] != stat.st_mtime_ns:
+                self.connection.execute("UPDATE files SET mtime_ns = ? WHERE path = ?",
+                                        (stat.st_mtime_ns, file_path))
+        return stale
+
+    def update_file(self, file_path: str, deprecations: List[WrappedDeprecation]):
+        """Replace the recorded deprecations of a file.
+
+        Raises
+        ------
+        OSError
+            If the file can no longer be read, in which case its record is left as it was
+
+        """
+        stat = os.stat(file_path)
+        sha256 = content_hash(file_path)
+        self.connection.execute("DELETE FROM deprecations WHERE path = ?", (file_path,))
+        self.connection.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+            (file_path, stat.st_size, stat.st_mtime_ns, sha256)
+        )
+        rows = []
+        for deprecation in deprecations:
+            data = deprecation.to_dict()
+            rows.append((file_path, data["lineno"], data["col"], data["name"], data["qualname"],
+                         data.get("deprecated_in"), data.get("removed_in"),
+                         version_key(data.get("deprecated_in")),
+                         version_key(data.get("removed_in")), data["type"]))
+        self.connection.executemany(
+            "INSERT INTO deprecations (path, lineno, col, name, qualname, deprecated_in, "
+            "removed_in, deprecated_key, removed_key, detector) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+
+    def remove_missing(self, root: str, present: Set[str]) -> int:
+        """Forget every file at or below *root* that is not in *present*.
+
+        Returns
+        -------
+        int
+            the number of files forgotten
+
+        """
+        rows = self.connection.execute(
+            "SELECT path FROM files WHERE path = ? OR (path >= ? AND path < ?)",
+            (root, os.path.join(root, ""), os.path.join(root, "\uffff"))
+        ).fetchall()
+        missing = [(row["path"],) for row in rows if row["path"] not in present]
+        self.connection.executemany("DELETE FROM deprecations WHERE path = ?", missing)
+        self.connection.executemany("DELETE FROM files WHERE path = ?", missing)
+        return len(missing)
+
+    def count_deprecations(self) -> int:
+        """Return the total number of recorded deprecations."""
+        return self.connection.execute("SELECT COUNT(*) FROM deprecations").fetchone()[0]
+
+    def query(self, deprecated_before: Optional[str] = None, removed_by: Optional[str] = None,
+              path: Optional[str] = None, missing_removed_in: bool = False,
+              detector: Optional[str] = None) -> List[sqlite3.Row]:
+        """Return the recorded deprecations that match every given filter.
+
+        Parameters
+        ----------
+        deprecated_before: Optional[str]
+            only deprecations whose 'deprecated_in' version is strictly less than this
+        removed_by: Optional[str]
+            only deprecations whose 'removed_in' version is less than or equal to this,
+            i.e., that have expired at this version
+        path: Optional[str]
+            only deprecations in this file, or in files below this directory
+        missing_removed_in: bool
+            only deprecations that don't specify 'removed_in'
+        detector: Optional[str]
+            only deprecations of this type, e.g., "PythonDeprecation"
+
+        Returns
+        -------
+        List[sqlite3.Row]
+            rows with the columns path, lineno, col, name, qualname, deprecated_in, removed_in
+            and detector, ordered by path and line
+
+        Raises
+        ------
+        ValueError
+            If a version cannot be parsed
+
+        """
+        clauses = []
+        parameters = []
+        if deprecated_before is not None:
+            clauses.append("deprecated_key < ?")
+            parameters.append(_required_key(deprecated_before))
+        if removed_by is not None:
+            clauses.append("removed_key <= ?")
+            parameters.append(_required_key(removed_by))
+        if path is not None:
+            path = os.path.abspath(path)
+            clauses.append("(path = ? OR (path >= ? AND path < ?))")
+            parameters.extend([path, os.path.join(path, ""), os.path.join(path, "\uffff")])
+        if missing_removed_in:
+            clauses.append("removed_in IS NULL")
+        if detector is not None:
+            clauses.append("detector = ?")
+            parameters.append(detector)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM deprecations{where} ORDER BY path, lineno"
+        return self.connection.execute(sql, parameters).fetchall()
+
+
+class IndexApplication(Application):
+    """Bring the inventory of a package up to date, parsing only modules that changed.
+
+    Parameters
+    ----------
+    target: str
+        path to the file or directory to index
+    database: str
+        path to the inventory database
+    **kwargs
+        passed on to Application, e.g., ``jobs`` or ``cache_dir``
+
+    """
+
+    def __init__(self, target: str, database: str = DEFAULT_DATABASE, **kwargs):
+        super().__init__(target, version=None, **kwargs)
+        self.database = database
+        self.updated_files = 0
+        self.removed_files = 0
+        self.total_deprecations = 0
+
+    def initialize(self):
+        """Find the files to index."""
+        self._initialize_absolute_paths()
+
+    def run_checks(self):
+        """Re-extract the deprecations of every stale file, and forget deleted files."""
+        inventory = Inventory(self.database)
+        try:
+            stale = inventory.stale_files(self.file_paths)
+            # A module that cannot be parsed keeps its stale record, and is tried again
+            for file_path, deprecations in self._parseable(self._extract(stale)):
+                try:
+                    inventory.update_file(file_path, deprecations)
+                except OSError as exc:
+                    # e.g., the file was deleted since it was parsed
+                    self.unparseable[file_path] = unparseable_module(exc).deprecation.detail
+                    self.failed_files += 1
+            self.updated_files = len(stale) - len(self.unparseable)
+            root = os.path.abspath(os.path.join(os.getcwd(), self.target))
+            self.removed_files = inventory.remove_missing(root, set(self.file_paths))
+            self.total_deprecations = inventory.count_deprecations()
+        finally:
+            inventory.close()
+
+    def report(self):
+        """Print a summary of the update."""
+        print(f"Indexed {len(self.file_paths)} modules ({self.updated_files} updated, "
+              f"{self.removed_files} removed) into {self.database}; it holds "
+              f"{self.total_deprecations} deprecations")
+        self.print_unparseable()
+        if self.verbose:
+            print(self.summary(), file=sys.stderr)
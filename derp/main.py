@@ -1,22 +1,533 @@
 import argparse
+import json
+import os
 import sys
-from typing import Optional, List
+from typing import Callable, Dict, Optional, List
+import derp_client
+from derp import benchmark as benchmarks
 from derp.application import Application
+from derp.archive import is_archive
+from derp.cache import DEFAULT_CACHE_DIR
+from derp.config import PackageConfig, find_config, read_config
+from derp.forecast import ForecastApplication
+from derp.inventory import DEFAULT_DATABASE, IndexApplication, Inventory
+from derp.monorepo import MonorepoApplication
+from derp.prefetch import DEFAULT_DEPTH
+from derp.profiling import PROFILE_FORMATS
+from derp.report import REPORTERS, make_reporter
+from derp.schedule import EXIT_INCOMPLETE
+from derp.server import DEFAULT_SOCKET, DerpServer
+from derp.shard import Shard, merge_partials, parse_shard, write_partial
+from derp.stats import STATS_FORMATS, StatsApplication, combine, read_stats, write_stats
+from derp.usages import UsagesApplication
+from derp.walker import ENGINES
+from derp.watch import WatchApplication
 
 
-def main(argv: Optional[List[str]] = None) -> int:
-    parser = argparse.ArgumentParser(prog='derp')
-    parser.add_argument("target", help="file or directory to scan for deprecations")
+def _add_scan_arguments(parser: argparse.ArgumentParser):
+    """Add the arguments that control how files are scanned, shared by every command."""
+    parser.add_argument("-j", "--jobs", default=None,
+                        help="number of worker processes to scan with, or 'auto' to use one "
+                             "per cpu. Files are scanned serially by default.")
+    parser.add_argument("--cache", action="store_true",
+                        help="cache the deprecations found in each module between runs, in "
+                             f"{DEFAULT_CACHE_DIR}, so that unchanged modules are not parsed "
+                             "again. Nothing is cached by default.")
+    parser.add_argument("--cache-dir", default=None,
+                        help="cache in this directory rather than the default one; implies "
+                             "--cache")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="parse every module, and don't write a cache, even if --cache "
+                             "or --cache-dir is given")
+    parser.add_argument("--exclude", action="append", default=[], metavar="PATTERNS",
+                        help="comma-separated glob patterns of files and directories to skip. "
+                             "Patterns containing a '/' match paths relative to the target, "
+                             "others match names. May be repeated.")
+    parser.add_argument("--no-default-excludes", action="store_true",
+                        help="also scan version control metadata, virtual environments, build "
+                             "output and caches, which are skipped by default")
+    parser.add_argument("--gitignore", action="store_true",
+                        help="skip files and directories ignored by .gitignore files")
+    parser.add_argument("--engine", choices=ENGINES, default="ast",
+                        help="'ast' parses each module; 'tokenize' streams its tokens instead, "
+                             "which uses far less memory on very large modules; 'auto' parses "
+                             "each module, falling back to its tokens if it cannot be parsed "
+                             "(default: ast)")
+    parser.add_argument("--readers", type=int, default=0, metavar="N",
+                        help="number of threads that read modules ahead of parsing, which "
+                             "helps on slow storage such as network filesystems. By default "
+                             "each module is read just before it is parsed.")
+    parser.add_argument("--prefetch-depth", type=int, default=DEFAULT_DEPTH, metavar="N",
+                        help="maximum number of modules read ahead but not yet parsed "
+                             f"(default: {DEFAULT_DEPTH})")
+    parser.add_argument("--max-file-size", type=_positive_int, default=None, metavar="BYTES",
+                        help="don't parse modules larger than this, and report them as "
+                             "unparseable. By default every module is parsed.")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="print a summary of the scan to stderr")
+
+
+def _scan_kwargs(args: argparse.Namespace) -> dict:
+    """Convert the arguments added by _add_scan_arguments to Application keyword arguments."""
+    cache_dir = args.cache_dir
+    if cache_dir is None and args.cache:
+        cache_dir = DEFAULT_CACHE_DIR
+    if args.no_cache:
+        cache_dir = None
+    exclude = [pattern for patterns in args.exclude for pattern in patterns.split(",")]
+    return dict(jobs=args.jobs, cache_dir=cache_dir, verbose=args.verbose, exclude=exclude,
+                default_excludes=not args.no_default_excludes, gitignore=args.gitignore,
+                engine=args.engine, readers=args.readers, prefetch_depth=args.prefetch_depth,
+                max_file_size=args.max_file_size, no_cache=args.no_cache)
+
+
+def _read_file_list(path: str) -> List[str]:
+    """Read a list of paths from a file, or from stdin if *path* is "-".
+
+    Paths are separated by NUL characters if there are any, as written by ``git diff -z`` or
+    ``find -print0``, and by newlines otherwise.
+    """
+    if path == "-":
+        text = sys.stdin.read()
+    else:
+        with open(path) as fp:
+            text = fp.read()
+    paths = text.split("\0") if "\0" in text else text.splitlines()
+    return [path for path in paths if path.strip()]
+
+
+def _shard(text: str) -> Shard:
+    try:
+        return parse_shard(text)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc))
+
+
+def _positive_int(text: str) -> int:
+    try:
+        value = int(text)
+    except ValueError:
+        value = 0
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {text!r}")
+    return value
+
+
+def check(argv: List[str]) -> int:
+    """Check all deprecations against the current version. This is the default command."""
+    parser = argparse.ArgumentParser(
+        prog='derp',
+        epilog=f"Other commands: {', '.join(sorted(SUBCOMMANDS))}. "
+               f"Run 'derp <command> --help' for details."
+    )
+    parser.add_argument("targets", nargs="*", metavar="target",
+                        help="files, directories or archives (wheels, sdists and zip files) to "
+                             "scan for deprecations. If neither targets nor the version are "
+                             "given, the packages listed in the config file are checked instead.")
     version_help = "current version of your software, either passed as a string or a path to a " \
                    "file that contains the version. Must be specified as a sequence of integers " \
-                   "separated by periods, e.g., '1.23.4'."
-    parser.add_argument("version", help=version_help)
+                   "separated by periods, e.g., '1.23.4'. It is always the last argument. If " \
+                   "every target is an archive, it may be left out to check each archive " \
+                   "against the version in its metadata."
+    parser.add_argument("version", nargs="?", help=version_help)
+    parser.add_argument("--files-from", metavar="FILE",
+                        help="also scan the files listed in FILE, or on stdin if FILE is '-', "
+                             "one per line or separated by NUL characters")
+    parser.add_argument("--stdin-filename", metavar="PATH",
+                        help="check the source code piped on stdin, as if it were the contents "
+                             "of PATH")
+    parser.add_argument("--config", metavar="FILE",
+                        help="pyproject.toml with a [tool.derp] section or setup.cfg with a "
+                             "[derp] section that lists packages to check, each with its own "
+                             "version. By default, these files are looked for in the current "
+                             "directory when no target is given.")
+    _add_scan_arguments(parser)
+    parser.add_argument("--format", dest="output_format", choices=sorted(REPORTERS),
+                        default="text",
+                        help="'text' for a human-readable report, or 'ndjson' for one json "
+                             "record per invalid deprecation (default: text)")
+    parser.add_argument("--since", metavar="REF",
+                        help="only scan modules that differ from this git ref, or are "
+                             "untracked. Everything is scanned if the version file changed.")
+    parser.add_argument("--watch", action="store_true",
+                        help="after the first scan, keep polling for changes and re-check only "
+                             "the modules that changed, until interrupted")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="seconds between polls in watch mode (default: 1)")
+    parser.add_argument("--profile", nargs="?", const="text", choices=PROFILE_FORMATS,
+                        help="time each stage of the scan and list the slowest files, written "
+                             "to stderr as text or, with '--profile json', as json")
+    parser.add_argument("--profile-top", type=int, default=10, metavar="N",
+                        help="number of slowest files to list in the profile (default: 10)")
+    parser.add_argument("--fail-fast", action="store_true",
+                        help="stop at the first file with invalid deprecations. Files are "
+                             "scanned in order of how likely they are to have any.")
+    parser.add_argument("--time-budget", type=float, metavar="SECONDS",
+                        help="stop after this many seconds, scanning the files most likely to "
+                             "have invalid deprecations first, and report which files were not "
+                             f"scanned. Exits with {EXIT_INCOMPLETE} if nothing was found but "
+                             f"not every file was scanned.")
+    parser.add_argument("--shard", type=_shard, metavar="K/N",
+                        help="only scan the K-th of N shards of the files, e.g., on one of N CI "
+                             "nodes. Every file belongs to exactly one shard.")
+    parser.add_argument("--partial", metavar="FILE",
+                        help="also write the results to FILE, to be combined with those of the "
+                             "other shards by 'derp merge'")
+    args = parser.parse_args(argv)
+    if args.watch and args.profile is not None:
+        parser.error("--profile cannot be combined with --watch")
+    if args.watch and (args.shard is not None or args.partial is not None):
+        parser.error("--shard and --partial cannot be combined with --watch")
+    budgeted = args.fail_fast or args.time_budget is not None
+    if args.watch and budgeted:
+        parser.error("--fail-fast and --time-budget cannot be combined with --watch")
+    if args.time_budget is not None and args.time_budget <= 0:
+        parser.error("--time-budget must be a positive number of seconds")
+    # The version is the last positional argument, whichever of the two argparse put it in
+    positionals = args.targets + ([args.version] if args.version is not None else [])
+    has_inputs = args.files_from is not None or args.stdin_filename is not None
+    # Archives have their own versions
+    from_archives = len(positionals) > 0 and is_archive(positionals[-1])
+    if from_archives:
+        if has_inputs:
+            parser.error("the version is required with --files-from and --stdin-filename")
+        if not all(is_archive(target) for target in positionals):
+            parser.error("the version is required unless every target is an archive")
+        args.version = None
+    else:
+        if len(positionals) == 1 and not has_inputs:
+            parser.error("the version is required when a target is given")
+        if not positionals and has_inputs:
+            parser.error("the version is required with --files-from and --stdin-filename")
+        args.version = positionals.pop() if positionals else None
+    targets = positionals
+    if args.files_from == "-" and args.stdin_filename is not None:
+        parser.error("--files-from - and --stdin-filename cannot both read stdin")
+    if args.watch and has_inputs:
+        parser.error("--watch cannot be combined with --files-from or --stdin-filename")
+    if args.watch and any(is_archive(target) for target in targets):
+        parser.error("--watch cannot be combined with archives")
+
+    if args.files_from is not None:
+        try:
+            targets.extend(_read_file_list(args.files_from))
+        except OSError as exc:
+            print(exc)
+            return 1
+    sources = None
+    if args.stdin_filename is not None:
+        sources = {args.stdin_filename: sys.stdin.buffer.read()}
+
+    if from_archives and len(targets) > 1:
+        if args.shard is not None or args.partial is not None or budgeted:
+            parser.error("--shard, --partial, --fail-fast and --time-budget require a version "
+                         "when checking several archives")
+        packages = [PackageConfig(os.path.basename(target), target, None) for target in targets]
+        app = MonorepoApplication(packages, output_format=args.output_format,
+                                  record_failures=False, since=args.since, profile=args.profile,
+                                  profile_top=args.profile_top, **_scan_kwargs(args))
+    elif args.version is None and not from_archives:
+        config = args.config if args.config is not None else find_config(os.getcwd())
+        if config is None:
+            parser.error("a target and version are required, unless pyproject.toml or "
+                         "setup.cfg lists packages to check")
+        if args.watch:
+            parser.error("--watch cannot be combined with a config file")
+        if args.shard is not None or args.partial is not None or budgeted:
+            parser.error("--shard, --partial, --fail-fast and --time-budget cannot be combined "
+                         "with a config file")
+        try:
+            packages = read_config(config)
+        except (OSError, ValueError) as exc:
+            print(exc)
+            return 1
+        app = MonorepoApplication(packages, output_format=args.output_format,
+                                  record_failures=False, since=args.since, profile=args.profile,
+                                  profile_top=args.profile_top, **_scan_kwargs(args))
+    elif args.watch:
+        app = WatchApplication(target=targets, version=args.version,
+                               interval=args.interval, output_format=args.output_format,
+                               **_scan_kwargs(args))
+    else:
+        app = Application(target=targets, version=args.version, sources=sources,
+                          output_format=args.output_format,
+                          record_failures=args.partial is not None, since=args.since,
+                          profile=args.profile, profile_top=args.profile_top, shard=args.shard,
+                          fail_fast=args.fail_fast, time_budget=args.time_budget,
+                          **_scan_kwargs(args))
+    app.run()
+    if args.partial is not None:
+        try:
+            write_partial(app, args.partial)
+        except OSError as exc:
+            print(exc)
+            return 1
+    return app.exit()
+
+
+def merge(argv: List[str]) -> int:
+    """Combine the partial results of every shard into the report of a single run."""
+    parser = argparse.ArgumentParser(prog='derp merge', description=merge.__doc__)
+    parser.add_argument("partials", nargs="+", metavar="partial",
+                        help="files written with --partial, one for each shard")
+    parser.add_argument("--format", dest="output_format", choices=sorted(REPORTERS),
+                        default="text",
+                        help="'text' for a human-readable report, or 'ndjson' for one json "
+                             "record per invalid deprecation (default: text)")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="print a summary of how the files were scanned")
+    args = parser.parse_args(argv)
+
+    try:
+        merged = merge_partials(args.partials)
+    except (OSError, ValueError) as exc:
+        print(exc)
+        return 1
+    for error in merged.errors:
+        print(error)
+    reporter = make_reporter(args.output_format)
+    for path, findings in merged.failed:
+        reporter.report_file(path, findings)
+    reporter.finish()
+    if args.verbose:
+        print(merged.summary(), file=sys.stderr)
+    return merged.exit()
+
+
+def forecast(argv: List[str]) -> int:
+    """Report the deprecations that will have expired at each of several future versions."""
+    parser = argparse.ArgumentParser(prog='derp forecast', description=forecast.__doc__)
+    parser.add_argument("target", help="file or directory to scan for deprecations")
+    parser.add_argument("versions", nargs="+", metavar="version",
+                        help="versions to forecast, e.g., '2.0' '2.1' '3.0'")
+    _add_scan_arguments(parser)
+    args = parser.parse_args(argv)
+
+    app = ForecastApplication(target=args.target, versions=args.versions,
+                              **_scan_kwargs(args))
+    app.run()
+    return app.exit()
+
+
+def index(argv: List[str]) -> int:
+    """Build or update a database of every deprecation, parsing only modules that changed."""
+    parser = argparse.ArgumentParser(prog='derp index', description=index.__doc__)
+    parser.add_argument("target", help="file or directory to index")
+    parser.add_argument("--db", default=DEFAULT_DATABASE,
+                        help=f"path to the inventory database (default: {DEFAULT_DATABASE})")
+    _add_scan_arguments(parser)
+    args = parser.parse_args(argv)
+
+    app = IndexApplication(target=args.target, database=args.db, **_scan_kwargs(args))
+    app.run()
+    return app.exit()
+
+
+def usages(argv: List[str]) -> int:
+    """List deprecated symbols with every place in the package that still uses them."""
+    parser = argparse.ArgumentParser(prog='derp usages', description=usages.__doc__)
+    parser.add_argument("target", help="file or directory to scan")
+    parser.add_argument("version", nargs="?",
+                        help="if given, only list the deprecations that are invalid at this "
+                             "version, e.g., those that have expired")
+    parser.add_argument("--used-only", action="store_true",
+                        help="leave out deprecated symbols that nothing uses")
+    parser.add_argument("--format", dest="output_format", choices=["text", "ndjson"],
+                        default="text",
+                        help="'text' to list each symbol followed by its uses, or 'ndjson' for "
+                             "one json record per symbol (default: text)")
+    _add_scan_arguments(parser)
     args = parser.parse_args(argv)
 
-    app = Application(target=args.target, version=args.version)
+    app = UsagesApplication(target=args.target, version=args.version,
+                            output_format=args.output_format, unused=not args.used_only,
+                            **_scan_kwargs(args))
     app.run()
     return app.exit()
 
 
+def stats(argv: List[str]) -> int:
+    """Summarize the deprecation debt of a package, or combine the summaries of its shards."""
+    parser = argparse.ArgumentParser(prog='derp stats', description=stats.__doc__)
+    parser.add_argument("target", nargs="?",
+                        help="file, directory or archive to scan")
+    parser.add_argument("version", nargs="?",
+                        help="current version, against which ages and invalid deprecations "
+                             "are counted. It may be left out if the target is an archive.")
+    parser.add_argument("--merge", nargs="+", metavar="STATS", default=None,
+                        help="rather than scanning, combine statistics written with "
+                             "'--format json', e.g., by every shard of a scan")
+    parser.add_argument("--format", dest="output_format", choices=STATS_FORMATS,
+                        default="table",
+                        help="'table' for a human-readable summary, or 'json' for statistics "
+                             "that can be combined with --merge (default: table)")
+    parser.add_argument("--top", type=_positive_int, default=10, metavar="N",
+                        help="number of packages to list in the table (default: 10)")
+    parser.add_argument("--shard", type=_shard, metavar="K/N",
+                        help="only scan the K-th of N shards of the files")
+    _add_scan_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.merge is not None:
+        if args.target is not None or args.shard is not None:
+            parser.error("--merge cannot be combined with targets or --shard")
+        try:
+            merged = combine(read_stats(path) for path in args.merge)
+        except (OSError, ValueError) as exc:
+            print(exc)
+            return 1
+        write_stats(merged, args.output_format, args.top)
+        return 0
+    if args.target is None:
+        parser.error("a target is required, unless statistics are merged with --merge")
+    app = StatsApplication(target=args.target, version=args.version,
+                           output_format=args.output_format, top=args.top, shard=args.shard,
+                           **_scan_kwargs(args))
+    app.run()
+    return app.exit()
+
+
+def query(argv: List[str]) -> int:
+    """List the deprecations in a database built by 'derp index' that match every filter."""
+    parser = argparse.ArgumentParser(prog='derp query', description=query.__doc__)
+    parser.add_argument("--db", default=DEFAULT_DATABASE,
+                        help=f"path to the inventory database (default: {DEFAULT_DATABASE})")
+    parser.add_argument("--deprecated-before", metavar="VERSION",
+                        help="only deprecations whose deprecated_in is less than VERSION")
+    parser.add_argument("--removed-by", metavar="VERSION",
+                        help="only deprecations that have expired at VERSION")
+    parser.add_argument("--path", help="only deprecations in this file or directory")
+    parser.add_argument("--missing-removed-in", action="store_true",
+                        help="only deprecations that don't specify removed_in")
+    parser.add_argument("--detector", help="only deprecations of this type")
+    parser.add_argument("--count", action="store_true",
+                        help="print the number of matching deprecations instead of listing them")
+    parser.add_argument("--format", dest="output_format", choices=["text", "ndjson"],
+                        default="text", help="format of the listing (default: text)")
+    args = parser.parse_args(argv)
+
+    inventory = Inventory(args.db)
+    try:
+        rows = inventory.query(deprecated_before=args.deprecated_before,
+                               removed_by=args.removed_by, path=args.path,
+                               missing_removed_in=args.missing_removed_in,
+                               detector=args.detector)
+    except ValueError as exc:
+        print(exc)
+        return 1
+    finally:
+        inventory.close()
+    if args.count:
+        print(len(rows))
+    elif args.output_format == "ndjson":
+        for row in rows:
+            print(json.dumps(dict(row)))
+    else:
+        for row in rows:
+            print(f"{row['path']}:{row['lineno']}: {row['qualname']} "
+                  f"(deprecated in {row['deprecated_in']}, removed in {row['removed_in']})")
+    return 0
+
+
+def benchmark(argv: List[str]) -> int:
+    """Time each stage of scanning a generated package, optionally comparing with earlier runs."""
+    parser = argparse.ArgumentParser(prog='derp benchmark', description=benchmark.__doc__)
+    parser.add_argument("--modules", type=int, default=100,
+                        help="number of modules in the package (default: 100)")
+    parser.add_argument("--depth", type=int, default=2,
+                        help="levels of subpackages below the top-level package (default: 2)")
+    parser.add_argument("--density", type=float, default=0.1,
+                        help="fraction of functions that are deprecated (default: 0.1)")
+    parser.add_argument("--lines", type=int, default=200,
+                        help="approximate number of lines per module (default: 200)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed for generating the package (default: 0)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="times to run each stage, keeping the best (default: 3)")
+    parser.add_argument("--history", metavar="FILE",
+                        help="json file to append the results to")
+    parser.add_argument("--compare", action="store_true",
+                        help="compare with the latest run in the history with the same "
+                             "parameters, and fail without recording if any stage regressed")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="fraction by which a stage may slow down before it counts as a "
+                             "regression (default: 0.25)")
+    args = parser.parse_args(argv)
+    if args.compare and args.history is None:
+        parser.error("--compare requires --history")
+
+    record = benchmarks.benchmark_package(modules=args.modules, depth=args.depth,
+                                          density=args.density, lines=args.lines,
+                                          seed=args.seed, repeat=args.repeat)
+    baseline = None
+    if args.compare:
+        baseline = benchmarks.find_baseline(benchmarks.load_history(args.history), record)
+    print(benchmarks.format_record(record, baseline))
+    if baseline is not None:
+        regressions = benchmarks.find_regressions(record, baseline, args.tolerance)
+        if regressions:
+            print(f"Regressions since the run of {baseline['time']}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+    elif args.compare:
+        print("No earlier run with the same parameters to compare with")
+    if args.history is not None:
+        benchmarks.append_history(args.history, record)
+    return 0
+
+
+def serve(argv: List[str]) -> int:
+    """Run command lines sent by derp-client, keeping the scan results of every module warm."""
+    parser = argparse.ArgumentParser(prog='derp serve', description=serve.__doc__)
+    parser.add_argument("--socket", default=DEFAULT_SOCKET,
+                        help=f"path of the Unix socket to listen on (default: {DEFAULT_SOCKET}). "
+                             f"Point derp-client at another path with $DERP_SOCKET.")
+    parser.add_argument("--stop", action="store_true",
+                        help="stop the server listening on the socket, and exit")
+    args = parser.parse_args(argv)
+
+    if args.stop:
+        try:
+            derp_client.request({"stop": True}, args.socket)
+        except OSError:
+            print(f"No server is listening on {args.socket}")
+            return 1
+        return 0
+    try:
+        server = DerpServer(args.socket)
+        server.start()
+    except (OSError, ValueError) as exc:
+        print(exc)
+        return 1
+    print(f"Listening on {server.socket_path}", file=sys.stderr, flush=True)
+    server.serve()
+    return 0
+
+
+"""Commands other than the default check, selected by the first argument unless it is an
+existing path, which is checked.
+"""
+SUBCOMMANDS: Dict[str, Callable[[List[str]], int]] = {
+    "benchmark": benchmark,
+    "forecast": forecast,
+    "index": index,
+    "merge": merge,
+    "query": query,
+    "serve": serve,
+    "stats": stats,
+    "usages": usages,
+}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    if argv is None:
+        argv = sys.argv[1:]
+    # A package named after a command, e.g., "stats", is scanned rather than run as the command
+    if len(argv) > 0 and argv[0] in SUBCOMMANDS and not os.path.exists(argv[0]):
+        return SUBCOMMANDS[argv[0]](argv[1:])
+    return check(argv)
+
+
 if __name__ == '__main__':
     sys.exit(main())
@@ -0,0 +1,180 @@
+"""Check many packages, each with its own version, in a single run.
+
+In a repository with many packages, running derp once per package pays for interpreter
+startup, a worker pool and a cache load every time. Here, the files of every package are
+discovered in one pass and scanned together, on one worker pool and with one cache. Each file
+is then checked against the version of every package it belongs to, and the results are
+reported grouped by package. The packages are usually read from a configuration file, see
+derp.config.
+"""
+
+import sys
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from derp.application import Application
+from derp.config import PackageConfig
+from derp.report import Invalid, make_reporter
+from derp.walker import find_invalid_deprecations
+
+
+class MonorepoApplication(Application):
+    """Scan many packages at once and check each against its own version.
+
+    Every package is represented by an Application, which finds its files and parses its
+    version; this application scans all of those files.
+
+    Parameters
+    ----------
+    packages: List[PackageConfig]
+        the packages to check
+    **kwargs
+        passed on to Application, e.g., ``jobs``, ``cache_dir`` or ``exclude``. The discovery
+        options (``since``, ``exclude``, ``default_excludes`` and ``gitignore``) apply to
+        every package.
+
+    Attributes
+    ----------
+    broken_packages: Dict[str, str]
+        packages that could not be checked, e.g., because their version could not be
+        parsed, with the reason
+
+    """
+
+    def __init__(self, packages: List[PackageConfig], **kwargs):
+        super().__init__(target=None, version=None, **kwargs)
+        self.names = [package.name for package in packages]
+        self.packages = [
+            Application(package.target, package.version, since=self.since, exclude=self.exclude,
+                        default_excludes=self.default_excludes, gitignore=self.gitignore)
+            for package in packages
+        ]
+        # The packages find the modules in archives, and this application scans them
+        for package in self.packages:
+            package.archive_sources = self.archive_sources
+        self.package_failed_files: Dict[str, int] = {name: 0 for name in self.names}
+        self.broken_packages: Dict[str, str] = dict()
+        # The indices of the packages that each file belongs to
+        self._owners: Dict[str, List[int]] = dict()
+        # The deprecations of the files checked so far
+        self._checked: Dict[str, list] = dict()
+        # Packages that claimed a file after it was checked, with that file
+        self._late: List[Tuple[int, str]] = []
+
+    def _break(self, index: int, reason: str):
+        self.broken_packages[self.names[index]] = reason
+        print(f"{self.names[index]}: {reason}", flush=True)
+
+    def initialize(self):
+        """Parse the version of every package."""
+        self.reporter = make_reporter(self.output_format)
+        for index, package in enumerate(self.packages):
+            try:
+                package._initialize_version_number()
+            except ValueError as exc:
+                self._break(index, str(exc))
+
+    def _iter_absolute_paths(self) -> Iterator[str]:
+        """Lazily yield the files of every package, each only once, package by package."""
+        for index, package in enumerate(self.packages):
+            if package.current_version is None:
+                continue
+            try:
+                for path in package._record_paths(package._iter_absolute_paths()):
+                    owners = self._owners.setdefault(path, [])
+                    owners.append(index)
+                    if len(owners) == 1:
+                        yield path
+                    elif path in self._checked:
+                        self._late.append((index, path))
+            except ValueError as exc:
+                self._break(index, str(exc))
+
+    def run_checks(self):
+        """Scan the files of every package, reporting the results of each package together.
+
+        Files are discovered package by package, so the results of a package can be reported
+        as they come, except those of files that also belong to a later package (i.e., the
+        packages overlap). Those are reported when it is the later package's turn. Since
+        discovery is lazy, a later package may only claim a file once it has been checked, in
+        which case the file is checked again for that package, without scanning it again.
+        """
+        self.failures = dict()
+        self.failed_files = 0
+        paths = self._record_paths(self._iter_absolute_paths())
+        find_invalid = find_invalid_deprecations
+        report_file = self.reporter.report_file
+        if self.profile is not None:
+            paths = self.profile.timed(paths, "discovery")
+            find_invalid = self.profile.wrap(find_invalid, "check")
+            report_file = self.profile.wrap(report_file, "report")
+
+        current: Optional[int] = None
+        started = set()
+        deferred: Dict[int, List[Tuple[str, Invalid]]] = dict()
+
+        def report(index: int, file_path: str, invalid: Invalid):
+            if index not in started:
+                started.add(index)
+                self.reporter.start_group(self.names[index])
+            self.failed_files += 1
+            self.package_failed_files[self.names[index]] += 1
+            report_file(file_path, invalid)
+            if self.record_failures:
+                self.failures.setdefault(file_path, []).extend(invalid)
+
+        def check(index: int, file_path: str, deprecations: list):
+            invalid = find_invalid(deprecations, self.packages[index].current_version, file_path)
+            if not invalid:
+                return
+            if index == current:
+                report(index, file_path, invalid)
+            else:
+                deferred.setdefault(index, []).append((file_path, invalid))
+
+        def check_late():
+            for index, late_path in self._late:
+                check(index, late_path, self._checked[late_path])
+            self._late.clear()
+
+        def advance(index: int):
+            for later in sorted(deferred):
+                if later <= index:
+                    for file_path, invalid in deferred.pop(later):
+                        report(later, file_path, invalid)
+
+        for file_path, deprecations in self._extract(paths):
+            owners = self._owners[file_path]
+            if owners[0] != current:
+                current = owners[0]
+                advance(current)
+            self._checked[file_path] = deprecations
+            for index in owners:
+                check(index, file_path, deprecations)
+            check_late()
+        check_late()
+        advance(len(self.packages))
+
+    def summary(self) -> str:
+        """Return a summary of the scan, with a line per package."""
+        lines = [super().summary()]
+        for name, package in zip(self.names, self.packages):
+            if name in self.broken_packages:
+                lines.append(f"  {name}: not checked")
+            else:
+                n_files = len(package.file_paths) if package.file_paths is not None else 0
+                lines.append(f"  {name}: {n_files} files, "
+                             f"{self.package_failed_files[name]} with invalid deprecations")
+        return "\n".join(lines)
+
+    def report(self):
+        """Finish reporting, once every package has been checked."""
+        super().report()
+        if self.broken_packages:
+            print(f"{len(self.broken_packages)} of {len(self.packages)} packages could not be "
+                  f"checked", file=sys.stderr)
+
+    def exit(self) -> int:
+        """Return exit code, 0 if every package passed or 1 if any failed or was broken."""
+        if self.broken_packages:
+            return 1
+        return super().exit()
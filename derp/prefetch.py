@@ -0,0 +1,164 @@
+"""Read files ahead of the parser, so that waiting on storage overlaps with parsing.
+
+Without prefetching, each module is read just before it is parsed, and on slow storage (a
+network filesystem, say) the cpu sits idle during every read. A Prefetcher reads modules on a
+few threads instead; file reads release the GIL, so they proceed while the main thread
+parses. The modules that have been read wait in a bounded queue: when parsing falls behind,
+the queue fills up and reading pauses, which bounds the memory held by modules waiting to be
+parsed.
+
+Both sides of the queue record how long they waited on the other. Time the readers spent
+waiting for room in the queue means parsing is the bottleneck; time the parser spent waiting
+for a module means storage is.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, Tuple, TypeVar, Union
+
+T = TypeVar("T")
+
+"""Number of modules that may wait in the queue, read but not yet parsed."""
+DEFAULT_DEPTH = 64
+
+_DONE = object()
+
+
+def read_bytes(filepath: str) -> bytes:
+    """Return the contents of a file."""
+    with open(filepath, "rb") as fp:
+        return fp.read()
+
+
+def apply_prefetched(func: Callable[..., T], prefetched: Tuple[str, Optional[bytes]]) -> T:
+    """Call ``func(path, source=contents)`` on a path and contents yielded by a Prefetcher.
+
+    A functools.partial of this function can be handed to derp.executor.map_files, in place
+    of a function that takes only a path. If the contents are None, *func* reads the file.
+    """
+    filepath, source = prefetched
+    return func(filepath, source=source)
+
+
+class _Failure:
+    """An exception raised while producing paths, to be re-raised by the consumer."""
+
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+class Prefetcher:
+    """Read files on a pool of threads, ahead of the code that consumes them.
+
+    Parameters
+    ----------
+    readers: int
+        number of threads that read files
+    depth: int
+        maximum number of files held in the queue, read but not yet consumed
+
+    Attributes
+    ----------
+    reader_stall: float
+        seconds spent waiting for room in the queue, because consumption was slower than
+        reading
+    consumer_stall: float
+        seconds the consumer spent waiting for a file to be read
+    bytes_read: int
+        total size of the files read
+
+    """
+
+    def __init__(self, readers: int = 4, depth: int = DEFAULT_DEPTH):
+        if readers < 1:
+            raise ValueError(f"The number of readers must be a positive integer, not {readers}")
+        if depth < 1:
+            raise ValueError(f"The prefetch depth must be a positive integer, not {depth}")
+        self.readers = readers
+        self.depth = depth
+        self.reader_stall = 0.0
+        self.consumer_stall = 0.0
+        self.bytes_read = 0
+
+    def _put(self, items: queue.Queue, item, stop: threading.Event):
+        start = time.perf_counter()
+        try:
+            while not stop.is_set():
+                try:
+                    items.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+        finally:
+            self.reader_stall += time.perf_counter() - start
+
+    def _feed(self, file_paths: Iterable[Union[str, Tuple[str, Optional[bytes]]]],
+              executor: ThreadPoolExecutor, items: queue.Queue, stop: threading.Event):
+        """Submit a read for every path, queueing the pending reads in order."""
+        try:
+            for item in file_paths:
+                if stop.is_set():
+                    return
+                file_path, source = (item, None) if isinstance(item, str) else item
+                if source is None:
+                    future = executor.submit(read_bytes, file_path)
+                else:
+                    future = Future()
+                    future.set_result(source)
+                self._put(items, (file_path, future), stop)
+        except BaseException as exc:
+            self._put(items, _Failure(exc), stop)
+        else:
+            self._put(items, _DONE, stop)
+
+    def prefetch(
+            self,
+            file_paths: Iterable[Union[str, Tuple[str, Optional[bytes]]]]
+    ) -> Iterator[Tuple[str, Optional[bytes]]]:
+        """Yield every path with the contents of its file, in the order of *file_paths*.
+
+        Paths may come paired with their contents, or None if the file is to be read. Contents
+        that are already known are passed through without reading. A file that cannot be
+        read is yielded with None as its contents, so that the consumer reads it again and
+        handles the error like that of any other file it reads, see derp.walker.scan_file.
+
+        *file_paths* is consumed on a separate thread, so it may be a lazy iterator that does
+        work of its own, such as discovering the files. An exception raised while producing
+        the paths is raised here once every earlier file has been yielded.
+        """
+        items: queue.Queue = queue.Queue(maxsize=self.depth)
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=self.readers)
+        feeder = threading.Thread(target=self._feed, args=(file_paths, executor, items, stop),
+                                  daemon=True)
+        feeder.start()
+        try:
+            while True:
+                start = time.perf_counter()
+                item = items.get()
+                if isinstance(item, _Failure):
+                    self.consumer_stall += time.perf_counter() - start
+                    raise item.exc
+                if item is _DONE:
+                    self.consumer_stall += time.perf_counter() - start
+                    return
+                file_path, future = item
+                try:
+                    source = future.result()
+                except OSError:
+                    source = None
+                self.consumer_stall += time.perf_counter() - start
+                if source is not None:
+                    self.bytes_read += len(source)
+                yield file_path, source
+        finally:
+            # If the consumer stopped early, unblock the feeder so that it can finish
+            stop.set()
+            while feeder.is_alive():
+                try:
+                    items.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            executor.shutdown(wait=True)
@@ -0,0 +1,68 @@
+"""A cheap, byte-level check for whether a module could contain a deprecation at all.
+
+Decoding and parsing a module is by far the most expensive part of a scan, and most modules
+in a package don't deprecate anything. Every deprecation type lists the names it can be
+referred to by, and a module whose raw bytes contain none of them can be skipped without
+being parsed. The check is conservative: a module that passes may still contain no
+deprecations, but a module that fails cannot contain any.
+"""
+
+import mmap
+import os
+import re
+from typing import Iterable, Optional, Pattern
+
+
+def compile_prefilter(deprecation_types: Iterable[type]) -> Optional[Pattern[bytes]]:
+    """Compile a single pattern that matches any of the names of the deprecation types.
+
+    Parameters
+    ----------
+    deprecation_types: Iterable[type]
+        the registered deprecation types
+
+    Returns
+    -------
+    Optional[Pattern[bytes]]
+        the pattern, or None if some deprecation type does not list its names, in which
+        case no module can be skipped
+
+    """
+    names = set()
+    for deprecation_type in deprecation_types:
+        if not deprecation_type.decorator_names:
+            return None
+        names.update(deprecation_type.decorator_names)
+    alternatives = b"|".join(re.escape(name.encode()) for name in sorted(names))
+    return re.compile(alternatives)
+
+
+def may_contain_deprecation(
+        filepath: str,
+        pattern: Optional[Pattern[bytes]],
+        source: Optional[bytes] = None
+) -> bool:
+    """Return whether the raw bytes of a module contain any of the deprecation names.
+
+    Unless its contents are given, the file is memory-mapped rather than read, so the
+    search does not copy it.
+
+    Parameters
+    ----------
+    filepath: str
+        path to a python module
+    pattern: Optional[Pattern[bytes]]
+        output of compile_prefilter. If None, every module is a candidate.
+    source: Optional[bytes]
+        the contents of the module, if they have already been read
+
+    """
+    if pattern is None:
+        return True
+    if source is not None:
+        return pattern.search(source) is not None
+    with open(filepath, "rb") as fp:
+        if os.fstat(fp.fileno()).st_size == 0:
+            return False
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as contents:
+            return pattern.search(contents) is not None
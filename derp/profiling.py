@@ -0,0 +1,199 @@
+"""Find out where the time of a scan goes.
+
+With profiling on, the scan records the time spent in each stage: discovering modules,
+looking them up in the cache, prefiltering, reading, parsing, finding deprecations, checking
+them and reporting the results. It also keeps the slowest files, with their sizes and the
+number of nodes in their syntax trees.
+
+Profiling is opt-in. Profiled files are scanned by ``profile_scan_file``, which has
+``derp.walker.scan_file`` time each of its steps, and the rest of the instrumentation is only
+put in place when a profile is requested, so an ordinary scan does no extra work at all.
+
+Stages that run on worker processes (prefilter, read, parse and traverse) are summed over
+all workers, so with more than one job they can add up to more than the wall time.
+"""
+
+import heapq
+import json
+import os
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Pattern, \
+    Tuple, TypeVar
+
+from derp.deprecation import WrappedDeprecation
+from derp.walker import scan_file
+
+T = TypeVar("T")
+
+"""Stages of a scan, in the order in which they happen to each file."""
+STAGES = ("initialize", "discovery", "cache", "prefilter", "read", "parse", "traverse", "check",
+          "report")
+
+"""Formats in which a profile can be written."""
+PROFILE_FORMATS = ("text", "json")
+
+
+class FileProfile(NamedTuple):
+    """How long a single file took to scan, and how big it is."""
+
+    path: str
+    size: int
+    nodes: int
+    prefilter: float
+    read: float
+    parse: float
+    traverse: float
+
+    @property
+    def total(self) -> float:
+        return self.prefilter + self.read + self.parse + self.traverse
+
+
+def profile_scan_file(
+        filepath: str,
+        pattern: Optional[Pattern[bytes]] = None,
+        engine: str = "ast",
+        source: Optional[bytes] = None,
+        max_size: Optional[int] = None
+) -> Tuple[Optional[List[WrappedDeprecation]], FileProfile]:
+    """Call derp.walker.scan_file, timing each step.
+
+    If the contents of the file are given, they were read ahead of time (see
+    derp.prefetch), so the time spent reading it is 0.
+
+    Returns
+    -------
+    Tuple[Optional[List[WrappedDeprecation]], FileProfile]
+        the result of scan_file, and the profile of the file. A file skipped by the
+        prefilter is not read or parsed, so its node count is 0.
+
+    """
+    stages: Dict[str, float] = dict()
+    deprecations = scan_file(filepath, pattern, engine, source, max_size, stages)
+    try:
+        size = os.path.getsize(filepath) if source is None else len(source)
+    except OSError:
+        size = 0
+    profile = FileProfile(filepath, size, int(stages.get("nodes", 0)),
+                          *(stages.get(stage, 0.0)
+                            for stage in ("prefilter", "read", "parse", "traverse")))
+    return deprecations, profile
+
+
+class Profile:
+    """Time spent in each stage of a scan, and the slowest files.
+
+    Parameters
+    ----------
+    top: int
+        number of slowest files to keep
+
+    Attributes
+    ----------
+    stages: Dict[str, float]
+        seconds spent in each of ``STAGES``
+    total: float
+        wall time of the whole scan, in seconds
+    stalls: Dict[str, float]
+        seconds that each side of the prefetch queue spent waiting on the other (see
+        derp.prefetch), if modules were read ahead
+
+    """
+
+    def __init__(self, top: int = 10):
+        self.top = top
+        self.stages: Dict[str, float] = {stage: 0.0 for stage in STAGES}
+        self.total = 0.0
+        self.stalls: Dict[str, float] = dict()
+        self.profiled_files = 0
+        # min-heap of (time, path, profile), so the fastest of the slowest files is at the top
+        self._slowest: List[Tuple[float, str, FileProfile]] = []
+
+    def add_file(self, profile: FileProfile):
+        """Add the profile of a file to the stages, and keep it if it is among the slowest."""
+        self.profiled_files += 1
+        for stage in ("prefilter", "read", "parse", "traverse"):
+            self.stages[stage] += getattr(profile, stage)
+        entry = (profile.total, profile.path, profile)
+        if len(self._slowest) < self.top:
+            heapq.heappush(self._slowest, entry)
+        elif self.top > 0 and entry > self._slowest[0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def slowest_files(self) -> List[FileProfile]:
+        """Return the slowest files, slowest first."""
+        return [profile for _, _, profile in sorted(self._slowest, reverse=True)]
+
+    def wrap(self, func: Callable[..., T], stage: str) -> Callable[..., T]:
+        """Return a version of a function that adds the time spent in it to a stage."""
+        stages = self.stages
+
+        def timed_func(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stages[stage] += time.perf_counter() - start
+        return timed_func
+
+    def record_files(
+            self,
+            results: Iterable[Tuple[Optional[List[WrappedDeprecation]], FileProfile]]
+    ) -> Iterator[Optional[List[WrappedDeprecation]]]:
+        """Pass through the results of profile_scan_file, adding each file to the profile."""
+        for deprecations, profile in results:
+            self.add_file(profile)
+            yield deprecations
+
+    def timed(self, iterable: Iterable[T], stage: str) -> Iterator[T]:
+        """Pass items through, adding the time spent producing each of them to a stage."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.stages[stage] += time.perf_counter() - start
+                return
+            self.stages[stage] += time.perf_counter() - start
+            yield item
+
+    def to_dict(self, rates: Dict[str, Optional[float]]) -> dict:
+        """Return the profile as a json-serializable dict.
+
+        Parameters
+        ----------
+        rates: Dict[str, Optional[float]]
+            hit rates to include, e.g., of the cache and the prefilter, as fractions, or None
+            where nothing was looked up
+
+        """
+        return dict(
+            total=self.total,
+            stages=dict(self.stages),
+            stalls=dict(self.stalls),
+            rates=rates,
+            slowest_files=[dict(path=profile.path, seconds=profile.total, size=profile.size,
+                                nodes=profile.nodes)
+                           for profile in self.slowest_files()],
+        )
+
+    def format(self, rates: Dict[str, Optional[float]], output_format: str = "text") -> str:
+        """Format the profile as text or json, see to_dict for *rates*."""
+        if output_format == "json":
+            return json.dumps(self.to_dict(rates))
+        lines = [f"Profile of a {self.total * 1000:.1f} ms scan:"]
+        for stage in STAGES:
+            lines.append(f"  {stage:<10} {self.stages[stage] * 1000:10.1f} ms")
+        for side, stall in self.stalls.items():
+            lines.append(f"  {side} stall: {stall * 1000:.1f} ms")
+        for name, rate in rates.items():
+            value = "n/a" if rate is None else f"{rate * 100:.1f}%"
+            lines.append(f"  {name.replace('_', ' ')}: {value}")
+        slowest = self.slowest_files()
+        if slowest:
+            lines.append("Slowest files:")
+            for profile in slowest:
+                lines.append(f"  {profile.total * 1000:8.1f} ms {profile.size:>10} bytes "
+                             f"{profile.nodes:>8} nodes  {profile.path}")
+        return "\n".join(lines)
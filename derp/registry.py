@@ -0,0 +1,115 @@
+"""Find the deprecation type that a decorator belongs to, without trying every type.
+
+Most decorators in a package (``@property``, ``@staticmethod``, ``@pytest.fixture``...) are not
+deprecations. Every deprecation type lists the names it can be referred to by, so decorators
+are dispatched on their name with a single dictionary lookup: a decorator whose name no type
+lists is rejected straight away, and one whose name matches is only handed to the types that
+list it. Those types decide from the shape of the call whether it is theirs, returning None
+rather than raising if it is not.
+
+A decorator may be accessed through a module, as in ``@deprecation.deprecated(...)``. If that
+module is one of the ``modules`` of some of the candidate types, only those types are tried.
+Otherwise (e.g., the module was imported under an alias) every candidate type is tried.
+"""
+
+import ast
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def _dotted_name(node: ast.AST) -> Optional[str]:
+    """Return the dotted name of a chain of attributes, e.g., "deprecated.sphinx"."""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return ".".join(reversed(parts))
+
+
+def decorator_name(decorator: ast.AST) -> Tuple[Optional[str], Optional[str]]:
+    """Split a decorator into its name and the module it is accessed through.
+
+    For example, ``@deprecated(...)`` gives ("deprecated", None) and
+    ``@typing_extensions.deprecated("...")`` gives ("deprecated", "typing_extensions").
+    A decorator without a simple name, e.g., ``@handlers[0]``, gives (None, None).
+    """
+    if isinstance(decorator, ast.Call):
+        decorator = decorator.func
+    if isinstance(decorator, ast.Name):
+        return decorator.id, None
+    elif isinstance(decorator, ast.Attribute):
+        return decorator.attr, _dotted_name(decorator.value)
+    return None, None
+
+
+class DetectorRegistry:
+    """Deprecation types indexed by the decorator names they claim.
+
+    Parameters
+    ----------
+    deprecation_types: Iterable[type]
+        subclasses of derp.deprecation.Deprecation, in order of precedence. When more than
+        one type could parse a decorator, the first one wins.
+
+    """
+
+    def __init__(self, deprecation_types: Iterable[type]):
+        self.deprecation_types = tuple(deprecation_types)
+        self._by_name: Dict[str, List[type]] = dict()
+        # Types that don't list their names are handed every decorator
+        self._unnamed: List[type] = []
+        for deprecation_type in self.deprecation_types:
+            if not deprecation_type.decorator_names:
+                self._unnamed.append(deprecation_type)
+            for name in deprecation_type.decorator_names:
+                self._by_name.setdefault(name, []).append(deprecation_type)
+
+    def claims_name(self, name: Optional[str]) -> bool:
+        """Whether a decorator with this name could be a deprecation of some registered type."""
+        return name in self._by_name or bool(self._unnamed)
+
+    def _candidates(self, name: Optional[str], module: Optional[str]) -> List[type]:
+        candidates = self._by_name.get(name, []) if name is not None else []
+        if module is not None:
+            matching = [candidate for candidate in candidates if module in candidate.modules]
+            if matching:
+                candidates = matching
+        if self._unnamed:
+            candidates = candidates + self._unnamed
+        return candidates
+
+    def detect(self, decorator: ast.AST):
+        """Return the deprecation that a decorator node represents, or None.
+
+        Returns
+        -------
+        Optional[Deprecation]
+            the deprecation parsed by the first type that claims the decorator
+
+        """
+        name, module = decorator_name(decorator)
+        if not self.claims_name(name):
+            return None
+        for candidate in self._candidates(name, module):
+            deprecation = candidate.from_decorator(decorator)
+            if deprecation is not None:
+                return deprecation
+        return None
+
+
+_registry: Optional[DetectorRegistry] = None
+
+
+def get_registry(deprecation_types: Iterable[type]) -> DetectorRegistry:
+    """Return a registry of the given deprecation types.
+
+    The registry is reused for as long as the deprecation types stay the same, so that
+    ``DEPRECATION_TYPE_LIST`` can still be changed at runtime.
+    """
+    global _registry
+    deprecation_types = tuple(deprecation_types)
+    if _registry is None or _registry.deprecation_types != deprecation_types:
+        _registry = DetectorRegistry(deprecation_types)
+    return _registry
@@ -0,0 +1,107 @@
+"""Ways to write out the invalid deprecations found by a scan.
+
+Reporters are handed the results of one file at a time, as soon as that file has been
+checked, so output streams while the scan is still running.
+"""
+
+import json
+import sys
+from abc import ABC, abstractmethod
+from typing import List, Optional, TextIO
+
+from derp.finding import Finding
+
+"""The invalid deprecations of a file."""
+Invalid = List[Finding]
+
+
+class Reporter(ABC):
+    """Abstract writer of scan results.
+
+    Parameters
+    ----------
+    stream: TextIO
+        where to write the results, stdout by default
+
+    """
+
+    def __init__(self, stream: TextIO = None):
+        self.stream = stream if stream is not None else sys.stdout
+
+    @abstractmethod
+    def report_file(self, path: str, invalid: Invalid):
+        """Write the invalid deprecations of a single file, which must not be empty."""
+        raise NotImplementedError
+
+    def start_group(self, name: str):
+        """Start a group of files, e.g., a package, whose results follow."""
+        pass
+
+    def finish(self):
+        """Write anything that has to come after the results of every file."""
+        pass
+
+
+class TextReporter(Reporter):
+    """Write the path of each file, followed by one indented line per invalid deprecation.
+    Each group starts with a header line.
+    """
+
+    def start_group(self, name: str):
+        print(f"== {name} ==", file=self.stream, flush=True)
+
+    def report_file(self, path: str, invalid: Invalid):
+        lines = [f"{path}:"]
+        lines.extend(f"\t{finding.name}: {finding.message}" for finding in invalid)
+        print("\n".join(lines), file=self.stream, flush=True)
+
+
+class NdjsonReporter(Reporter):
+    """Write one json object per invalid deprecation, one per line (newline-delimited json).
+    Within a group, every object has the name of the group as its "package".
+    """
+
+    def __init__(self, stream: TextIO = None):
+        super().__init__(stream)
+        self.group: Optional[str] = None
+
+    def start_group(self, name: str):
+        self.group = name
+
+    def report_file(self, path: str, invalid: Invalid):
+        lines = []
+        for finding in invalid:
+            record = {"path": path}
+            if self.group is not None:
+                record["package"] = self.group
+            record.update(name=finding.name, qualname=finding.qualname, lineno=finding.line,
+                          col=finding.col, type=finding.detector,
+                          deprecated_in=finding.deprecated_in, removed_in=finding.removed_in,
+                          reason=finding.reason, message=finding.message)
+            if finding.detail is not None:
+                record["detail"] = finding.detail
+            lines.append(json.dumps(record))
+        print("\n".join(lines), file=self.stream, flush=True)
+
+
+REPORTERS = {
+    "text": TextReporter,
+    "ndjson": NdjsonReporter,
+}
+
+
+def make_reporter(output_format: str, stream: TextIO = None) -> Reporter:
+    """Create the reporter for an output format, one of the keys of ``REPORTERS``.
+
+    Raises
+    ------
+    ValueError
+        If the format is unknown
+
+    """
+    try:
+        reporter_type = REPORTERS[output_format]
+    except KeyError:
+        raise ValueError(f"Unknown output format {output_format}, "
+                         f"must be one of {sorted(REPORTERS)}")
+    return reporter_type(stream)
@@ -0,0 +1,105 @@
+"""Order the files of a scan so that the ones most likely to have findings are scanned first.
+
+A complete scan reports files in the order in which they were discovered. When the scan may
+stop early, with ``--fail-fast`` or ``--time-budget``, the order matters: the sooner a
+finding is reached, the sooner the scan can stop, and the more of the likely findings fit in
+the budget. Files are put in one of three tiers, cheapest evidence first:
+
+1. files whose cached deprecations are invalid at the current version. These are past
+   findings that still hold, and they are answered from the cache without parsing.
+2. files that changed since they were cached, or were never cached, and that the prefilter
+   cannot rule out.
+3. everything else: files whose cached deprecations are all valid, and files the prefilter
+   rules out. Neither can have findings.
+
+Within a tier, the most recently modified files come first, since deprecations tend to
+expire where work is going on. Ties keep the order of discovery.
+"""
+
+import os
+from typing import Dict, Iterable, List, Optional, Pattern
+
+from derp.cache import ResultCache
+from derp.prefilter import may_contain_deprecation
+from derp.version_number import VersionNumber
+from derp.walker import find_invalid_deprecations
+
+"""Exit code of a scan that found no invalid deprecations but stopped before scanning every
+file, so that it is not mistaken for a complete scan that passed.
+"""
+EXIT_INCOMPLETE = 3
+
+"""Tiers of files, see the description of this module."""
+KNOWN_FINDINGS = 0
+LIKELY = 1
+UNLIKELY = 2
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return 0.0
+
+
+def file_tier(path: str, current_version: VersionNumber, cache: Optional[ResultCache] = None,
+              pattern: Optional[Pattern[bytes]] = None, source: Optional[bytes] = None) -> int:
+    """Return the tier of a file, ``KNOWN_FINDINGS``, ``LIKELY`` or ``UNLIKELY``.
+
+    Parameters
+    ----------
+    path: str
+        absolute path to a python module
+    current_version: VersionNumber
+        the version that the scan checks against
+    cache: Optional[ResultCache]
+        the cache of the scan, if any. It is peeked at, without counting a lookup.
+    pattern: Optional[Pattern[bytes]]
+        prefilter pattern, see derp.prefilter.compile_prefilter
+    source: Optional[bytes]
+        the contents of the module, if they are held in memory. Such a module is never
+        looked up in the cache.
+
+    """
+    if cache is not None and source is None:
+        deprecations = cache.peek(path)
+        if deprecations is not None:
+            if find_invalid_deprecations(deprecations, current_version, path):
+                return KNOWN_FINDINGS
+            return UNLIKELY
+    try:
+        likely = may_contain_deprecation(path, pattern, source)
+    except OSError:
+        # Let the scan report it
+        likely = True
+    return LIKELY if likely else UNLIKELY
+
+
+def schedule(paths: Iterable[str], current_version: VersionNumber,
+             cache: Optional[ResultCache] = None, pattern: Optional[Pattern[bytes]] = None,
+             sources: Optional[Dict[str, bytes]] = None) -> List[str]:
+    """Return every path, ordered by tier, then most recently modified first.
+
+    Parameters
+    ----------
+    paths: Iterable[str]
+        the paths to scan, in discovery order
+    current_version: VersionNumber
+        the version that the scan checks against
+    cache: Optional[ResultCache]
+        the cache of the scan, if any
+    pattern: Optional[Pattern[bytes]]
+        prefilter pattern
+    sources: Optional[Dict[str, bytes]]
+        contents held in memory for some paths, see ``Application.sources``
+
+    """
+    sources = sources if sources is not None else dict()
+    keyed = []
+    for position, path in enumerate(paths):
+        source = sources.get(path)
+        tier = file_tier(path, current_version, cache, pattern, source)
+        mtime = _mtime(path) if source is None else 0.0
+        keyed.append((tier, -mtime, position, path))
+    keyed.sort()
+    return [path for _, _, _, path in keyed]
@@ -0,0 +1,183 @@
+"""Keep derp running in the background, so that editors and git hooks don't pay for a cold start.
+
+Every run of ``derp`` starts an interpreter, imports derp and loads its cache before it looks
+at a single module. ``derp serve`` does all of that once, then listens on a Unix socket for
+command lines sent by the client (the ``derp-client`` script, see derp_client.py). Each
+command line is run exactly as ``derp`` would run it, in the client's working directory, and
+its output and exit code are sent back.
+
+Between runs, the server keeps a warm cache in memory for each working directory, with the
+deprecations of each module already decoded (see derp.cache.WarmCache), whether or not the
+command line asks for a cache. A module whose size and modification time are unchanged is
+therefore never read again, and only the modules that changed are parsed. The caches of the
+command lines that ask for a cache directory are written to it when the server stops; the
+others stay in memory. ``--no-cache`` parses every module, as usual.
+
+The protocol is one json object per line, in each direction. A request is
+``{"argv": [...], "cwd": "..."}``, with the client's stdin as ``"stdin"`` (bytes decoded as
+latin-1) if the command line reads it, or ``{"stop": true}`` to stop the server. The response
+is ``{"stdout": "...", "stderr": "...", "exit": 0}``. Requests are handled one at a time.
+"""
+
+import contextlib
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+from typing import Callable, List, Optional
+
+from derp.cache import DEFAULT_CACHE_DIR, share_caches
+
+"""Path of the socket, relative to the directory in which the server is started."""
+DEFAULT_SOCKET = os.path.join(DEFAULT_CACHE_DIR, "server.sock")
+
+"""Arguments that cannot be run by the server, because they never return."""
+UNSUPPORTED_ARGUMENTS = ("--watch",)
+
+
+def run_captured(run: Callable[[List[str]], int], argv: List[str], cwd: str,
+                 stdin: Optional[bytes] = None) -> dict:
+    """Run a command line in a working directory, capturing its output and exit code.
+
+    Parameters
+    ----------
+    run: Callable[[List[str]], int]
+        the entry point, e.g., derp.main.main
+    argv: List[str]
+        the arguments, without the program name
+    cwd: str
+        working directory of the client
+    stdin: Optional[bytes]
+        the client's stdin, if the command line reads it
+
+    Returns
+    -------
+    dict
+        the response to send to the client
+
+    """
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    previous_cwd = os.getcwd()
+    previous_stdin = sys.stdin
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            sys.stdin = io.TextIOWrapper(io.BytesIO(stdin or b""))
+            os.chdir(cwd)
+            exit_code = run(argv)
+        except SystemExit as exc:
+            # e.g., argparse errors and --help
+            exit_code = exc.code if isinstance(exc.code, int) else 0 if exc.code is None else 1
+        except OSError as exc:
+            print(exc, file=sys.stderr)
+            exit_code = 1
+        finally:
+            sys.stdin = previous_stdin
+            os.chdir(previous_cwd)
+    return {"stdout": stdout.getvalue(), "stderr": stderr.getvalue(), "exit": exit_code}
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line)
+            if request.get("stop"):
+                response = {"stdout": "", "stderr": "", "exit": 0}
+                self.server.stopping = True
+            else:
+                stdin = request.get("stdin")
+                if stdin is not None:
+                    stdin = stdin.encode("latin-1")
+                response = self.server.derp_server.handle(request["argv"], request["cwd"], stdin)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            response = {"stdout": "", "stderr": "derp serve: malformed request\n", "exit": 2}
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class DerpServer:
+    """Run derp command lines sent over a Unix socket, keeping caches warm between runs.
+
+    Parameters
+    ----------
+    socket_path: str
+        path of the Unix socket to listen on
+    run: Optional[Callable[[List[str]], int]]
+        the entry point that runs a command line, derp.main.main by default
+
+    Attributes
+    ----------
+    requests: int
+        number of command lines run so far
+
+    """
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET,
+                 run: Optional[Callable[[List[str]], int]] = None):
+        if not hasattr(socket, "AF_UNIX"):
+            raise ValueError("derp serve requires Unix domain sockets")
+        if run is None:
+            from derp.main import main as run
+        self.socket_path = os.path.abspath(socket_path)
+        self.run = run
+        self.requests = 0
+        self.caches = share_caches()
+        self._server: Optional[socketserver.UnixStreamServer] = None
+
+    def handle(self, argv: List[str], cwd: str, stdin: Optional[bytes] = None) -> dict:
+        """Run a command line from the client, and return the response."""
+        self.requests += 1
+        if argv and argv[0] == "serve":
+            return {"stdout": "", "stderr": "derp serve: the server cannot start a server\n",
+                    "exit": 2}
+        for argument in UNSUPPORTED_ARGUMENTS:
+            if argument in argv:
+                return {"stdout": "", "stderr": f"derp serve: {argument} is not supported, "
+                                                f"run derp directly\n", "exit": 2}
+        return run_captured(self.run, argv, cwd, stdin)
+
+    def _remove_stale_socket(self):
+        if not os.path.exists(self.socket_path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except OSError:
+            os.remove(self.socket_path)
+        else:
+            raise ValueError(f"A server is already listening on {self.socket_path}")
+        finally:
+            probe.close()
+
+    def start(self):
+        """Bind the socket. Requests are queued until ``serve`` is called."""
+        os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+        self._remove_stale_socket()
+        self._server = socketserver.UnixStreamServer(self.socket_path, _RequestHandler)
+        self._server.derp_server = self
+        self._server.stopping = False
+
+    def serve(self, max_requests: Optional[int] = None):
+        """Handle requests until a stop request, an interrupt or *max_requests* requests.
+
+        The socket is removed and the caches are written to disk afterwards.
+        """
+        if self._server is None:
+            self.start()
+        try:
+            while not self._server.stopping:
+                if max_requests is not None and self.requests >= max_requests:
+                    break
+                self._server.handle_request()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+            with contextlib.suppress(OSError):
+                os.remove(self.socket_path)
+            for cache in self.caches.values():
+                with contextlib.suppress(OSError):
+                    cache.flush()
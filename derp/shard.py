@@ -0,0 +1,220 @@
+"""Split a scan across several machines, and merge the results back into one report.
+
+``derp --shard K/N`` scans only the K-th of N shards of the files. A file belongs to the shard
+given by a stable hash (crc32) of its path relative to the working directory, so every CI
+node that runs from the root of the same checkout agrees on the shards, whatever the
+absolute path of the checkout, and no file is scanned twice or missed.
+
+With ``--partial FILE``, a run writes its results to a json file: the findings of every file
+that has any, and the counters needed for the summary. ``derp merge`` combines the partial
+results of every shard into the report and exit code that a single run over all the files
+would have produced. To report files in the same order as such a run, every shard records
+the position of each of its files among all the files it discovered. Paths are recorded
+relative to the working directory, and the merged report has them relative to the
+directory that ``derp merge`` runs in, as if the full run had happened there.
+"""
+
+import json
+import os
+import zlib
+from typing import Dict, Iterator, List, Tuple
+
+from derp import __version__
+from derp.finding import Finding
+from derp.schedule import EXIT_INCOMPLETE
+
+"""Version of the format of partial results."""
+PARTIAL_FORMAT = 1
+
+Shard = Tuple[int, int]
+
+
+def parse_shard(text: str) -> Shard:
+    """Parse a shard given as "K/N", the K-th of N shards, counting from 1.
+
+    Raises
+    ------
+    ValueError
+        If the text is not of that form, or K is not between 1 and N
+
+    """
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise ValueError(f"A shard must be given as K/N, e.g., 2/4, not {text}")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Shard {text} must have 1 <= K <= N")
+    return index, count
+
+
+def shard_of(path: str, count: int) -> int:
+    """Return the shard, from 1 to *count*, that a path belongs to."""
+    relative = os.path.relpath(path).replace(os.sep, "/")
+    return zlib.crc32(relative.encode()) % count + 1
+
+
+def select_shard(paths: Iterator[str], shard: Shard, positions: Dict[str, int]) -> Iterator[str]:
+    """Lazily yield the paths that belong to a shard.
+
+    Parameters
+    ----------
+    paths: Iterator[str]
+        every path, in discovery order
+    shard: Shard
+        the shard to select, as (K, N)
+    positions: Dict[str, int]
+        filled in with the position of each selected path among all of *paths*
+
+    """
+    index, count = shard
+    for position, path in enumerate(paths):
+        if count == 1 or shard_of(path, count) == index:
+            positions[path] = position
+            yield path
+
+
+def partial_result(app) -> dict:
+    """Return the partial result of a run, see ``derp.application.Application.shard``.
+
+    Parameters
+    ----------
+    app: derp.application.Application
+        an application that has run, keeping its failures
+
+    """
+    file_paths = app.file_paths if app.file_paths is not None else []
+    positions = app.shard_positions
+    failed = []
+    for position, path in enumerate(file_paths):
+        findings = (app.failures or dict()).get(path)
+        if findings:
+            # The path of each finding is that of the file
+            failed.append({"path": os.path.relpath(path),
+                           "position": positions.get(path, position),
+                           "findings": [list(finding)[1:] for finding in findings]})
+    return {
+        "format": PARTIAL_FORMAT,
+        "derp_version": __version__,
+        "shard": list(app.shard) if app.shard is not None else [1, 1],
+        "targets": app.targets,
+        "version": app.current_version.version if app.current_version is not None else None,
+        "error": app.error,
+        "files": len(file_paths),
+        "parsed_files": app.parsed_files,
+        "cache_hits": app.cache.hits if app.cache is not None else 0,
+        "prefilter_skipped": app.prefilter_skipped,
+        "unscanned": len(app.unscanned),
+        "failed": failed,
+    }
+
+
+def write_partial(app, path: str):
+    """Write the partial result of a run to a json file."""
+    with open(path, "w") as fp:
+        json.dump(partial_result(app), fp)
+
+
+def read_partial(path: str) -> dict:
+    """Read a partial result written by write_partial.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a partial result of this version of derp
+
+    """
+    with open(path) as fp:
+        try:
+            partial = json.load(fp)
+        except ValueError:
+            raise ValueError(f"{path} is not a partial result")
+    if not isinstance(partial, dict) or partial.get("format") != PARTIAL_FORMAT:
+        raise ValueError(f"{path} is not a partial result")
+    if partial.get("derp_version") != __version__:
+        raise ValueError(f"{path} was written by derp {partial.get('derp_version')}, "
+                         f"not {__version__}")
+    return partial
+
+
+class MergedResult:
+    """The combined results of every shard of a scan.
+
+    Parameters
+    ----------
+    partials: List[dict]
+        the partial results of the shards, in any order
+
+    Raises
+    ------
+    ValueError
+        If a shard is missing or appears twice, or the shards are of different scans
+
+    """
+
+    def __init__(self, partials: List[dict]):
+        if not partials:
+            raise ValueError("No partial results to merge")
+        count = partials[0]["shard"][1]
+        # Shards that failed may not have parsed the version
+        succeeded = [partial for partial in partials if partial["error"] is None]
+        for partial in succeeded:
+            for key in ("targets", "version"):
+                if partial[key] != succeeded[0][key]:
+                    raise ValueError(f"The shards are of different scans: {key} "
+                                     f"{partial[key]} != {succeeded[0][key]}")
+        for partial in partials:
+            if partial["shard"][1] != count:
+                raise ValueError(f"The shards are of different scans: shard "
+                                 f"{partial['shard'][0]}/{partial['shard'][1]} is not one of "
+                                 f"{count}")
+        found = sorted(partial["shard"][0] for partial in partials)
+        expected = list(range(1, count + 1))
+        if found != expected:
+            missing = sorted(set(expected) - set(found))
+            duplicated = sorted({index for index in found if found.count(index) > 1})
+            problems = []
+            if missing:
+                problems.append(f"missing shards {', '.join(f'{i}/{count}' for i in missing)}")
+            if duplicated:
+                problems.append(f"repeated shards "
+                                f"{', '.join(f'{i}/{count}' for i in duplicated)}")
+            raise ValueError(f"Cannot merge: {'; '.join(problems)}")
+        self.errors: List[str] = [partial["error"] for partial in partials
+                                  if partial["error"] is not None]
+        self.files = sum(partial["files"] for partial in partials)
+        self.parsed_files = sum(partial["parsed_files"] for partial in partials)
+        self.cache_hits = sum(partial["cache_hits"] for partial in partials)
+        self.prefilter_skipped = sum(partial["prefilter_skipped"] for partial in partials)
+        # Files that shards stopped early without scanning, see derp.schedule
+        self.unscanned = sum(partial.get("unscanned", 0) for partial in partials)
+        failed = [entry for partial in partials for entry in partial["failed"]]
+        failed.sort(key=lambda entry: entry["position"])
+        self.failed: List[Tuple[str, List[Finding]]] = []
+        for entry in failed:
+            path = os.path.abspath(entry["path"])
+            self.failed.append((path, [Finding(path, *fields) for fields in entry["findings"]]))
+
+    @property
+    def failed_files(self) -> int:
+        return len(self.failed)
+
+    def summary(self) -> str:
+        """Return the summary that a single run over every file would have printed."""
+        summary = f"Scanned {self.files} files: {self.parsed_files} parsed, " \
+                  f"{self.cache_hits} from cache, {self.prefilter_skipped} skipped by prefilter"
+        if self.unscanned:
+            summary += f"; {self.unscanned} files not scanned"
+        return summary
+
+    def exit(self) -> int:
+        """Return exit code, 0 if every shard succeeded or 1 otherwise, or
+        ``derp.schedule.EXIT_INCOMPLETE`` if no shard failed but some stopped early.
+        """
+        if self.errors or self.failed_files > 0:
+            return 1
+        return EXIT_INCOMPLETE if self.unscanned else 0
+
+
+def merge_partials(paths: List[str]) -> MergedResult:
+    """Read and merge the partial results of every shard of a scan."""
+    return MergedResult([read_partial(path) for path in paths])
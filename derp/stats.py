@@ -0,0 +1,351 @@
+"""Summarize the deprecation debt of a package: how much there is, how old it is, when it is
+due and where it lives.
+
+``derp stats`` computes its figures while scanning, from the deprecations of each module as
+they come out of the scan. Every figure is a counter or a histogram, so the statistics of
+two sets of modules combine into those of their union by adding them up, in any order and
+grouping. The figures therefore come for free from every way that derp scans: with
+``--jobs``, from the cache, from archives, or shard by shard (``--shard K/N --format json``)
+to be combined with ``derp stats --merge``.
+
+The age of a deprecation is the current version minus its ``deprecated_in``, counted at the
+most significant part of the version that differs, e.g., "2 major" from 1.4 to 3.0, or
+"3 minor" from 2.1 to 2.4. A module's package is the dotted name of the package that holds
+it, see derp.walker.module_name.
+"""
+
+import json
+import sys
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+
+from derp.application import Application
+from derp.deprecation import WrappedDeprecation
+from derp.shard import select_shard
+from derp.version_number import VersionNumber
+from derp.walker import is_unparseable, module_name
+
+"""Version of the format of the json statistics."""
+STATS_FORMAT = 1
+
+"""Formats in which statistics can be written."""
+STATS_FORMATS = ("table", "json")
+
+"""Names of the parts of a version, for the age of a deprecation. Any part after these
+counts as a patch.
+"""
+_PARTS = ("major", "minor", "patch")
+
+"""Ages that are not a number of releases, in the order in which they are listed."""
+CURRENT = "current"
+FUTURE = "future"
+UNKNOWN = "unknown"
+
+
+def deprecation_age(deprecated_in: Optional[str], current_version: VersionNumber) -> str:
+    """Return the age of a deprecation at the current version, e.g., "2 major".
+
+    Returns ``CURRENT`` if it was deprecated in the current version, ``FUTURE`` if in a later
+    one, and ``UNKNOWN`` if its ``deprecated_in`` is missing or cannot be parsed.
+    """
+    if deprecated_in is None:
+        return UNKNOWN
+    try:
+        deprecated = VersionNumber(deprecated_in).version_numbers
+    except ValueError:
+        return UNKNOWN
+    current = current_version.version_numbers
+    length = max(len(current), len(deprecated))
+    current = current + [0] * (length - len(current))
+    deprecated = deprecated + [0] * (length - len(deprecated))
+    for position, (now, then) in enumerate(zip(current, deprecated)):
+        if now != then:
+            if now < then:
+                return FUTURE
+            return f"{now - then} {_PARTS[min(position, len(_PARTS) - 1)]}"
+    return CURRENT
+
+
+def _age_order(age: str) -> Tuple[int, int]:
+    """Sort ages from the oldest to the most recent, then the ages that are not numbers."""
+    count, _, part = age.partition(" ")
+    if part in _PARTS:
+        return _PARTS.index(part), -int(count)
+    return len(_PARTS) + (CURRENT, FUTURE, UNKNOWN).index(age), 0
+
+
+def _version_order(version: str) -> Tuple[int, List[int], str]:
+    """Sort removal versions in order, then those that cannot be parsed, by name."""
+    try:
+        return 0, VersionNumber(version).version_numbers, version
+    except ValueError:
+        return 1, [], version
+
+
+def _same_version(version: str, other: str) -> bool:
+    """Whether two versions are equal as version numbers, e.g., "1.0" and "1.0.0"."""
+    try:
+        return VersionNumber(version) == VersionNumber(other)
+    except ValueError:
+        return version == other
+
+
+class DebtStats:
+    """Mergeable statistics of the deprecations in a set of modules.
+
+    Parameters
+    ----------
+    version: Optional[str]
+        the current version, against which ages and findings are counted
+
+    Attributes
+    ----------
+    files: int
+        number of modules scanned
+    files_with_deprecations: int
+        number of modules with at least one deprecation
+    deprecations: int
+        number of deprecations
+    missing_removal: int
+        number of deprecations without a ``removed_in``
+    unparseable_files: int
+        number of modules that could not be checked, see derp.walker.scan_file
+    by_removed_in: Counter
+        number of deprecations by ``removed_in``
+    by_age: Counter
+        number of deprecations by age, see deprecation_age
+    by_reason: Counter
+        number of invalid deprecations by reason code, see derp.finding
+    by_package: Counter
+        number of deprecations by package
+
+    """
+
+    _COUNTS = ("files", "files_with_deprecations", "deprecations", "missing_removal",
+               "unparseable_files")
+    _HISTOGRAMS = ("by_removed_in", "by_age", "by_reason", "by_package")
+
+    def __init__(self, version: Optional[str] = None):
+        self.version = version
+        self.files = 0
+        self.files_with_deprecations = 0
+        self.deprecations = 0
+        self.missing_removal = 0
+        self.unparseable_files = 0
+        self.by_removed_in: Counter = Counter()
+        self.by_age: Counter = Counter()
+        self.by_reason: Counter = Counter()
+        self.by_package: Counter = Counter()
+
+    def add_file(self, path: str, deprecations: List[WrappedDeprecation],
+                 current_version: VersionNumber):
+        """Add the deprecations of a module, as if merging the statistics of that module."""
+        self.files += 1
+        if is_unparseable(deprecations):
+            self.unparseable_files += 1
+            return
+        if not deprecations:
+            return
+        self.files_with_deprecations += 1
+        self.deprecations += len(deprecations)
+        module = module_name(path)
+        self.by_package[module.rpartition(".")[0] or module] += len(deprecations)
+        for deprecation in deprecations:
+            versions = deprecation.deprecation.to_dict()
+            removed_in = versions.get("removed_in")
+            if removed_in is None:
+                self.missing_removal += 1
+            else:
+                self.by_removed_in[removed_in] += 1
+            self.by_age[deprecation_age(versions.get("deprecated_in"), current_version)] += 1
+            finding = deprecation.check(current_version, path)
+            if finding is not None:
+                self.by_reason[finding.reason] += 1
+
+    def merge(self, other: "DebtStats") -> "DebtStats":
+        """Add the statistics of another set of modules to these, and return them.
+
+        Versions are compared as version numbers, so that statistics at "1.0" and at "1.0.0"
+        merge, under the version of these statistics.
+
+        Raises
+        ------
+        ValueError
+            If the statistics were counted against different versions
+
+        """
+        if self.version is None:
+            self.version = other.version
+        elif other.version is not None and not _same_version(self.version, other.version):
+            raise ValueError(f"Cannot merge statistics at version {other.version} into "
+                             f"statistics at version {self.version}")
+        for name in self._COUNTS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for name in self._HISTOGRAMS:
+            getattr(self, name).update(getattr(other, name))
+        return self
+
+    def expired(self) -> int:
+        """Return the number of deprecations that have reached their removal version."""
+        if self.version is None:
+            return 0
+        current_version = VersionNumber(self.version)
+        expired = 0
+        for removed_in, count in self.by_removed_in.items():
+            try:
+                expired += count if VersionNumber(removed_in) <= current_version else 0
+            except ValueError:
+                pass
+        return expired
+
+    def to_dict(self) -> dict:
+        """Return the statistics as a json-serializable dict."""
+        data = {"format": STATS_FORMAT, "version": self.version}
+        data.update((name, getattr(self, name)) for name in self._COUNTS)
+        data.update((name, dict(getattr(self, name))) for name in self._HISTOGRAMS)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DebtStats":
+        """Rebuild statistics from the output of to_dict.
+
+        Raises
+        ------
+        ValueError
+            If the data are not statistics in this format
+
+        """
+        if not isinstance(data, dict) or data.get("format") != STATS_FORMAT:
+            raise ValueError("Not deprecation statistics")
+        stats = cls(data.get("version"))
+        try:
+            for name in cls._COUNTS:
+                setattr(stats, name, int(data[name]))
+            for name in cls._HISTOGRAMS:
+                getattr(stats, name).update({key: int(count)
+                                             for key, count in data[name].items()})
+        except (KeyError, TypeError, AttributeError):
+            raise ValueError("Not deprecation statistics")
+        return stats
+
+    def table(self, top: int = 10) -> str:
+        """Return the statistics as a human-readable table.
+
+        Parameters
+        ----------
+        top: int
+            number of packages to list, those with the most deprecations first
+
+        """
+        at_version = f" at version {self.version}" if self.version is not None else ""
+        lines = [f"Deprecation debt{at_version}: {self.deprecations} deprecations in "
+                 f"{self.files_with_deprecations} of {self.files} modules, "
+                 f"{self.expired()} expired"]
+        if self.unparseable_files:
+            lines.append(f"{self.unparseable_files} modules could not be checked")
+
+        def section(title: str, rows: Iterable[Tuple[str, int, str]]):
+            rows = list(rows)
+            if rows:
+                lines.append("")
+                lines.append(title)
+                lines.extend(f"  {label:<30}{count:>8}{note}" for label, count, note in rows)
+
+        section("Invalid deprecations",
+                sorted(((reason, count, "") for reason, count in self.by_reason.items()),
+                       key=lambda row: (-row[1], row[0])))
+        current_version = VersionNumber(self.version) if self.version is not None else None
+        removal_rows = []
+        for removed_in in sorted(self.by_removed_in, key=_version_order):
+            note = ""
+            try:
+                if current_version is not None and VersionNumber(removed_in) <= current_version:
+                    note = "  expired"
+            except ValueError:
+                note = "  unparseable"
+            removal_rows.append((removed_in, self.by_removed_in[removed_in], note))
+        if self.missing_removal:
+            removal_rows.append(("(missing)", self.missing_removal, ""))
+        section("Removal version", removal_rows)
+        ages = sorted(self.by_age, key=_age_order)
+        section("Age", ((age, self.by_age[age], "") for age in ages))
+        section(f"Top {top} packages" if len(self.by_package) > top else "Packages",
+                ((package, count, "") for package, count in
+                 sorted(self.by_package.items(), key=lambda item: (-item[1], item[0]))[:top]))
+        return "\n".join(lines)
+
+
+def combine(stats: Iterable[DebtStats]) -> DebtStats:
+    """Merge statistics of disjoint sets of modules into those of their union."""
+    combined = DebtStats()
+    for part in stats:
+        combined.merge(part)
+    return combined
+
+
+def read_stats(path: str) -> DebtStats:
+    """Read statistics written by ``derp stats --format json``.
+
+    Raises
+    ------
+    ValueError
+        If the file does not hold statistics
+
+    """
+    with open(path) as fp:
+        try:
+            return DebtStats.from_dict(json.load(fp))
+        except ValueError:
+            raise ValueError(f"{path} does not hold deprecation statistics")
+
+
+def write_stats(stats: DebtStats, output_format: str = "table", top: int = 10):
+    """Print statistics in one of ``STATS_FORMATS``."""
+    if output_format == "json":
+        print(json.dumps(stats.to_dict(), sort_keys=True))
+    else:
+        print(stats.table(top))
+
+
+class StatsApplication(Application):
+    """Scan a package once, and summarize its deprecation debt.
+
+    Parameters
+    ----------
+    target: str
+        path to the file, directory or archive to scan
+    version: Optional[str]
+        the current version, which may be read from an archive, see Application
+    output_format: str
+        one of ``STATS_FORMATS``
+    top: int
+        number of packages to list in the table
+    **kwargs
+        passed on to Application, e.g., ``jobs``, ``cache_dir`` or ``shard``
+
+    """
+
+    def __init__(self, target: str, version: Optional[str], output_format: str = "table",
+                 top: int = 10, **kwargs):
+        super().__init__(target, version=version, output_format=output_format, **kwargs)
+        self.top = top
+        self.stats: Optional[DebtStats] = None
+
+    def initialize(self):
+        """Parse the version. The files to scan are found while scanning."""
+        self._initialize_version_number()
+
+    def run_checks(self):
+        """Add the deprecations of every module to the statistics, as they are scanned."""
+        self.stats = DebtStats(self.current_version.version)
+        paths = self._iter_absolute_paths()
+        if self.shard is not None:
+            paths = select_shard(paths, self.shard, self.shard_positions)
+        for file_path, deprecations in self._extract(self._record_paths(paths)):
+            self.stats.add_file(file_path, deprecations, self.current_version)
+
+    def report(self):
+        """Print the statistics."""
+        write_stats(self.stats, self.output_format, self.top)
+        if self.verbose:
+            print(self.summary(), file=sys.stderr)
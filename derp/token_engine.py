@@ -0,0 +1,185 @@
+"""Find deprecations in the token stream of a module, without building its syntax tree.
+
+``ast.parse`` builds a tree of the whole module, which for large generated modules (protobuf
+stubs, migrations...) takes a lot of memory just to look at a handful of decorators. This
+engine streams the module's tokens instead, keeping only the state it needs: the nesting of
+classes and functions, to build qualified names, and the tokens of the decorator being read.
+
+A decorator is only looked at if its name is registered by some deprecation type (see
+derp.registry). Only then is the decorator expression, on its own, parsed and handed to the
+registry, so the deprecation types parse it exactly as they would with the ast engine.
+
+The token stream is also available when a module cannot be parsed, e.g., because it contains
+python 2 syntax, so this engine can be used as a fallback for the ast engine.
+
+The file is read as bytes, and decoded as specified by its PEP 263 coding cookie, if any.
+"""
+
+import ast
+import io
+import tokenize
+from typing import Iterable, List, Optional, Tuple
+
+from derp import DEPRECATION_TYPE_LIST
+from derp.deprecation import Deprecation, WrappedDeprecation
+from derp.registry import DetectorRegistry, get_registry
+
+"""Tokens that never affect the structure of the code."""
+_IGNORED_TOKENS = frozenset([tokenize.COMMENT, tokenize.NL, tokenize.ENCODING])
+
+
+def _parse_decorator(
+        tokens: List[tokenize.TokenInfo],
+        registry: DetectorRegistry
+) -> Optional[Tuple[Deprecation, int, int]]:
+    """Parse the tokens of a decorator expression, i.e., everything after the '@'.
+
+    Returns
+    -------
+    Optional[Tuple[Deprecation, int, int]]
+        the deprecation, with the line and column at which the expression starts, or None if
+        the decorator is not a deprecation
+
+    """
+    name = None
+    for token in tokens:
+        if token.type == tokenize.OP and token.string == "(":
+            break
+        if token.type == tokenize.NAME:
+            name = token.string
+    if not tokens or not registry.claims_name(name):
+        return None
+    source = tokenize.untokenize((token.type, token.string) for token in tokens)
+    try:
+        decorator = ast.parse(source.strip(), mode="eval").body
+    except SyntaxError:
+        return None
+    deprecation = registry.detect(decorator)
+    if deprecation is None:
+        return None
+    lineno, col = tokens[0].start
+    return deprecation, lineno, col
+
+
+def find_deprecations_in_tokens(
+        tokens: Iterable[tokenize.TokenInfo],
+        registry: Optional[DetectorRegistry] = None
+) -> List[WrappedDeprecation]:
+    """Find every deprecation in a stream of tokens, as produced by the tokenize module.
+
+    The deprecations are the same as those the ast engine finds, but in source order.
+
+    Parameters
+    ----------
+    tokens: Iterable[tokenize.TokenInfo]
+        the tokens of a module
+    registry: Optional[DetectorRegistry]
+        The registry of deprecation types, by default one of ``DEPRECATION_TYPE_LIST``
+
+    Returns
+    -------
+    List[WrappedDeprecation]
+        every deprecation, whether or not it is valid
+
+    """
+    if registry is None:
+        registry = get_registry(DEPRECATION_TYPE_LIST)
+    deprecations = []
+    # Pairs of the indentation depth of a class or function body and its qualified-name prefix
+    scopes: List[Tuple[int, str]] = [(0, "")]
+    depth = 0
+    at_statement_start = True
+    # Tokens of the decorator being read, if any
+    decorator: Optional[List[tokenize.TokenInfo]] = None
+    # The first deprecation among the decorators of the next definition
+    found: Optional[Tuple[Deprecation, int, int]] = None
+    # "def" or "class", if the next token is the name of a definition
+    keyword: Optional[str] = None
+    # Prefix of the scope opened by the last definition, until its body is known to start
+    body_scope: Optional[str] = None
+    header_done = False
+
+    for token in tokens:
+        kind = token.type
+        if kind in _IGNORED_TOKENS:
+            continue
+        if header_done:
+            header_done = False
+            if kind == tokenize.INDENT:
+                depth += 1
+                scopes.append((depth, body_scope))
+                body_scope = None
+                continue
+            # The body was on the same line as the header, e.g., "def f(): pass"
+            body_scope = None
+        if decorator is not None:
+            if kind == tokenize.NEWLINE:
+                if found is None:
+                    found = _parse_decorator(decorator, registry)
+                decorator = None
+                at_statement_start = True
+            else:
+                decorator.append(token)
+            continue
+        if kind == tokenize.NEWLINE:
+            at_statement_start = True
+            header_done = body_scope is not None
+            continue
+        if kind == tokenize.INDENT:
+            depth += 1
+            continue
+        if kind == tokenize.DEDENT:
+            depth -= 1
+            while scopes[-1][0] > depth:
+                scopes.pop()
+            continue
+        if keyword is not None:
+            name = token.string
+            qualname = scopes[-1][1] + name
+            if found is not None:
+                deprecation, lineno, col = found
+                deprecations.append(WrappedDeprecation(name, deprecation, qualname=qualname,
+                                                       lineno=lineno, col=col))
+                found = None
+            body_scope = f"{qualname}." if keyword == "class" else f"{qualname}.<locals>."
+            keyword = None
+            continue
+        if at_statement_start:
+            at_statement_start = False
+            if kind == tokenize.OP and token.string == "@":
+                decorator = []
+            elif token.string == "async":
+                # "async def": the next token still starts the statement
+                at_statement_start = True
+            elif kind == tokenize.NAME and token.string in ("def", "class"):
+                keyword = token.string
+            else:
+                found = None
+    return deprecations
+
+
+def collect_deprecations_from_tokens(
+        filepath: str,
+        source: Optional[bytes] = None
+) -> List[WrappedDeprecation]:
+    """Collect all deprecations in a given module by streaming its tokens.
+
+    Parameters
+    ----------
+    filepath: str
+        path to a python module
+    source: Optional[bytes]
+        the contents of the module, if they have already been read
+
+    Raises
+    ------
+    SyntaxError
+        If the module cannot be tokenized, e.g., because of inconsistent indentation
+    tokenize.TokenError
+        If the module ends in the middle of a statement
+
+    """
+    if source is not None:
+        return find_deprecations_in_tokens(tokenize.tokenize(io.BytesIO(source).readline))
+    with open(filepath, "rb") as fp:
+        return find_deprecations_in_tokens(tokenize.tokenize(fp.readline))
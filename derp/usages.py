@@ -0,0 +1,181 @@
+"""Find every place in a package that still uses a deprecated symbol.
+
+``derp usages`` parses every module once. The same syntax tree yields the deprecations
+defined in the module and the names the module uses (see derp.walker.collect_usages): what
+it imports, and
+the names and attribute chains that refer to something imported or defined at the top level
+of the module. Each use is resolved to a fully qualified name, e.g., in a module that does
+``from my_app import io as old_io``, ``old_io.OldClass()`` uses ``my_app.io.OldClass``.
+
+The uses are collected into an inverted index from qualified name to use sites. Once every
+module has been scanned, each deprecated symbol is looked up in the index along with its
+members, so that ``OldClass.method`` counts as a use of ``OldClass``. The work is linear in
+the size of the package.
+
+Uses are found statically, so uses through instances (``self.old_method()``), through names
+rebound at runtime, or through ``getattr`` are not found.
+"""
+
+import json
+import sys
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from derp.application import Application
+from derp.deprecation import WrappedDeprecation
+from derp.finding import Finding
+from derp.walker import Usage, module_name
+
+
+class DeprecatedSymbol(NamedTuple):
+    """A deprecation, with the qualified name under which it is imported and its uses."""
+
+    name: str
+    path: str
+    deprecation: WrappedDeprecation
+    uses: List[Usage]
+
+
+class UsageIndex:
+    """An inverted index from qualified name to the places that use it.
+
+    Modules are added in any order, then ``resolve`` finds the uses of every deprecation.
+    """
+
+    def __init__(self):
+        self.deprecations: List[Tuple[str, str, WrappedDeprecation]] = []
+        self._uses: Dict[str, List[Usage]] = dict()
+        self._order: Dict[str, int] = dict()
+
+    def add(self, path: str, deprecations: List[WrappedDeprecation], usages: List[Usage]):
+        """Add the deprecations and uses of a module."""
+        self._order.setdefault(path, len(self._order))
+        module = module_name(path)
+        for deprecation in deprecations:
+            self.deprecations.append((f"{module}.{deprecation.qualname}", path, deprecation))
+        for usage in usages:
+            self._uses.setdefault(usage.name, []).append(usage)
+
+    def uses_of(self, name: str) -> List[Usage]:
+        """Return the uses of a qualified name, not counting those of its members."""
+        return list(self._uses.get(name, ()))
+
+    def resolve(self) -> List[DeprecatedSymbol]:
+        """Return every deprecation with its uses, including those of its members.
+
+        Deprecations are in the order in which their modules were added, and uses are in
+        module order, then source order.
+        """
+        found: Dict[str, List[Usage]] = {name: [] for name, _, _ in self.deprecations}
+        # Each name is matched against the deprecations by its prefixes, so the cost is the
+        # number of distinct names times their depth
+        for name, uses in self._uses.items():
+            prefix = name
+            while True:
+                if prefix in found:
+                    found[prefix].extend(uses)
+                dot = prefix.rfind(".")
+                if dot < 0:
+                    break
+                prefix = prefix[:dot]
+        order = self._order
+        symbols = []
+        for name, path, deprecation in self.deprecations:
+            uses = sorted(found[name], key=lambda use: (order.get(use.path, len(order)),
+                                                        use.line, use.col))
+            symbols.append(DeprecatedSymbol(name, path, deprecation, uses))
+        return symbols
+
+
+def _describe(symbol: DeprecatedSymbol, finding: Optional[Finding]) -> str:
+    line = symbol.deprecation.lineno
+    uses = f"{len(symbol.uses)} use" + ("" if len(symbol.uses) == 1 else "s")
+    if finding is not None:
+        return f"{symbol.path}:{line}: {symbol.name}: {finding.message}; {uses}"
+    versions = symbol.deprecation.deprecation.to_dict()
+    removed_in = versions.get("removed_in")
+    removal = f"removed in {removed_in}" if removed_in is not None else "no removal version"
+    return f"{symbol.path}:{line}: {symbol.name} ({removal}); {uses}"
+
+
+def _record(symbol: DeprecatedSymbol, finding: Optional[Finding]) -> dict:
+    versions = symbol.deprecation.deprecation.to_dict()
+    record = dict(name=symbol.name, path=symbol.path, lineno=symbol.deprecation.lineno,
+                  deprecated_in=versions.get("deprecated_in"),
+                  removed_in=versions.get("removed_in"))
+    if finding is not None:
+        record.update(reason=finding.reason, message=finding.message)
+    record["uses"] = [dict(path=use.path, lineno=use.line, col=use.col, kind=use.kind,
+                           name=use.name) for use in symbol.uses]
+    return record
+
+
+class UsagesApplication(Application):
+    """Scan a package once and list its deprecated symbols with every place that uses them.
+
+    Every module is parsed, whether or not it defines deprecations, because any module may
+    use one, so the prefilter is not used. The deprecations and uses of each module come from
+    a single parse in the scan (see derp.walker.scan_file_with_uses), and are cached like any
+    scan result. A module that cannot be read or parsed is listed on stderr, and makes the
+    command exit with 1.
+
+    Parameters
+    ----------
+    target: str
+        path to the file or directory to scan
+    version: Optional[str]
+        if given, only list the deprecations that are invalid at this version, e.g., those
+        that have expired
+    output_format: str
+        "text", or "ndjson" for one json record per deprecated symbol
+    unused: bool
+        whether to also list the deprecated symbols that are not used
+    **kwargs
+        passed on to Application, e.g., ``jobs``, ``readers`` or ``cache_dir``
+
+    """
+
+    def __init__(self, target: str, version: Optional[str] = None, output_format: str = "text",
+                 unused: bool = True, **kwargs):
+        super().__init__(target, version=version, output_format=output_format, **kwargs)
+        # The tokenize engine cannot find uses, see derp.walker.scan_file_with_uses
+        if self.engine == "tokenize":
+            self.engine = "auto"
+        self.unused = unused
+        self.index: Optional[UsageIndex] = None
+        self.symbols: Optional[List[Tuple[DeprecatedSymbol, Optional[Finding]]]] = None
+        self.uses = dict()
+
+    def initialize(self):
+        """Parse the version, if any, and find the files to scan."""
+        if self.version is not None:
+            self._initialize_version_number()
+        self._initialize_absolute_paths()
+
+    def run_checks(self):
+        """Parse every module into the index, then find the uses of each deprecation."""
+        self.index = UsageIndex()
+        for file_path, deprecations in self._parseable(self._extract()):
+            self.index.add(file_path, deprecations, self.uses.pop(file_path, []))
+        self.symbols = []
+        for symbol in self.index.resolve():
+            finding = None
+            if self.current_version is not None:
+                finding = symbol.deprecation.check(self.current_version, symbol.path)
+                if finding is None:
+                    continue
+            if symbol.uses or self.unused:
+                self.symbols.append((symbol, finding))
+
+    def report(self):
+        """Print each deprecated symbol, followed by an indented line per use."""
+        for symbol, finding in self.symbols:
+            if self.output_format == "ndjson":
+                print(json.dumps(_record(symbol, finding)))
+                continue
+            lines = [_describe(symbol, finding)]
+            lines.extend(f"\t{use.path}:{use.line}:{use.col}: {use.kind} {use.name}"
+                         for use in symbol.uses)
+            print("\n".join(lines))
+        self.print_unparseable()
+        if self.verbose:
+            print(self.summary(), file=sys.stderr)
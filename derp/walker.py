@@ -1,12 +1,36 @@
 import ast
-from typing import Optional, Iterator, Any, Callable, List
+import os
+import time
+import tokenize
+from collections import deque
+from functools import lru_cache
+from typing import Optional, Iterator, Any, Callable, Dict, List, NamedTuple, Pattern, Tuple, \
+    Union
 
 from derp import RELEVANT_NODE_TYPES, DEPRECATION_TYPE_LIST
-from derp.deprecation import PythonDeprecation, WrappedDeprecation
+from derp.deprecation import Deprecation, UnparseableModule, WrappedDeprecation
+from derp.finding import Finding
+from derp.prefetch import read_bytes
+from derp.prefilter import may_contain_deprecation
+from derp.registry import DetectorRegistry, get_registry
+from derp.token_engine import collect_deprecations_from_tokens
 from derp.version_number import VersionNumber
 
 
-def _parse_deprecation(decorator: ast.AST) -> Optional[PythonDeprecation]:
+"""Ways to find the deprecations in a module, see collect_deprecations."""
+ENGINES = ("ast", "tokenize", "auto")
+
+"""Errors that make a module unparseable. ValueError includes UnicodeDecodeError, and null
+bytes on older pythons. RecursionError and MemoryError are raised by the parser on deeply
+nested or very large modules.
+"""
+PARSE_ERRORS = (SyntaxError, ValueError, RecursionError, MemoryError, tokenize.TokenError)
+
+
+def _parse_deprecation(
+        decorator: ast.AST,
+        registry: Optional[DetectorRegistry] = None
+) -> Optional[Deprecation]:
     """Parse a decorator node to see if it represents a deprecation of some sort.
 
     If the decorator can be parsed to multiple types of deprecations, only the first one
@@ -15,7 +39,9 @@ def _parse_deprecation(decorator: ast.AST) -> Optional[PythonDeprecation]:
     Parameters
     ----------
     decorator: ast.AST
-        A node of a syntax tree that is *expected* to be a decorator of type ast.Call
+        A node of a syntax tree that is *expected* to be a decorator
+    registry: Optional[DetectorRegistry]
+        The registry of deprecation types, by default one of ``DEPRECATION_TYPE_LIST``
 
     Returns
     -------
@@ -23,18 +49,14 @@ def _parse_deprecation(decorator: ast.AST) -> Optional[PythonDeprecation]:
         A deprecation representation of the decorator, if applicable
 
     """
-    deprecation = None
-    for deprecation_type in DEPRECATION_TYPE_LIST:
-        try:
-            deprecation = deprecation_type(decorator)
-        except ValueError:
-            pass
-        if deprecation is not None:
-            break
-    return deprecation
+    if registry is None:
+        registry = get_registry(DEPRECATION_TYPE_LIST)
+    return registry.detect(decorator)
 
 
-def _get_deprecation(node: ast.AST) -> Optional[WrappedDeprecation]:
+def _get_deprecation(node: ast.AST, scope: str = "",
+                     registry: Optional[DetectorRegistry] = None
+                     ) -> Optional[WrappedDeprecation]:
     """Get a deprecation decorator child of a given node, if one exists.
 
     If there are multiple deprecation decorators attached to the node, only the first one
@@ -44,6 +66,10 @@ def _get_deprecation(node: ast.AST) -> Optional[WrappedDeprecation]:
     ----------
     node: ast.AST
         A node of a syntax tree
+    scope: str
+        Qualified name of the scope that contains the node, as a prefix, e.g., "MyClass."
+    registry: Optional[DetectorRegistry]
+        The registry of deprecation types, by default one of ``DEPRECATION_TYPE_LIST``
 
     Returns
     -------
@@ -51,73 +77,127 @@ def _get_deprecation(node: ast.AST) -> Optional[WrappedDeprecation]:
         The deprecation, if it exists, wrapped with metadata
 
     """
-    try:
-        decorators = node.decorator_list
-        this_name = node.name
-        if isinstance(decorators, list):
-            for decorator in decorators:
-                deprecation = _parse_deprecation(decorator)
-                if deprecation is not None:
-                    return WrappedDeprecation(this_name, deprecation)
-    except AttributeError:
-        pass
+    decorators = getattr(node, "decorator_list", None)
+    if not decorators:
+        return None
+    if registry is None:
+        registry = get_registry(DEPRECATION_TYPE_LIST)
+    for decorator in decorators:
+        deprecation = registry.detect(decorator)
+        if deprecation is not None:
+            return WrappedDeprecation(node.name, deprecation, qualname=scope + node.name,
+                                      lineno=decorator.lineno, col=decorator.col_offset)
+    return None
 
 
-def _iter_relevant_children(node: ast.AST):
-    """Yield all relevant direct child nodes of *node*.
+def _statement_fields() -> Dict[type, Tuple[str, ...]]:
+    """Map every node type that holds a block of statements to the fields that hold them.
 
-    "Relevant" children are those that may contain deprecations.
+    This covers compound statements (e.g., ``if``, ``try``, ``with`` and ``match``) as well as
+    the nodes that hold a block without being statements themselves: the module, exception
+    handlers and match cases. It is computed from the ast module of the running interpreter,
+    so syntax added in newer versions of python is covered automatically.
+    """
+    block_fields = ("body", "orelse", "handlers", "finalbody", "cases")
+    containers = [ast.mod, ast.stmt, ast.excepthandler]
+    if hasattr(ast, "match_case"):
+        containers.append(ast.match_case)
+    fields = dict()
+    for container in containers:
+        for node_type in [container] + container.__subclasses__():
+            node_fields = tuple(field for field in getattr(node_type, "_fields", ())
+                                if field in block_fields)
+            if node_fields:
+                fields[node_type] = node_fields
+    return fields
 
-    Parameters
-    ----------
-    node: ast.AST
-        A node of a syntax tree
 
-    """
-    for name, field in ast.iter_fields(node):
-        if isinstance(field, RELEVANT_NODE_TYPES):
-            yield field
-        elif isinstance(field, list):
-            for item in field:
-                if isinstance(item, RELEVANT_NODE_TYPES):
-                    yield item
+_STATEMENT_FIELDS = _statement_fields()
+
+"""Marks the node types in ``_DISPATCH`` that are definitions, rather than blocks."""
+_DEFINITION = object()
+
+"""Map node types to what the walker does with them: definitions are recorded and their
+bodies become new scopes, blocks are descended into through the given fields, and anything
+else (i.e., simple statements) is skipped with a single dictionary lookup.
+"""
+_DISPATCH = dict(_STATEMENT_FIELDS)
+_DISPATCH.update((node_type, _DEFINITION) for node_type in RELEVANT_NODE_TYPES)
+
+
+def _child_scope(node: ast.AST, scope: str) -> str:
+    """Return the qualified-name prefix of the children of *node*, following __qualname__."""
+    if isinstance(node, ast.ClassDef):
+        return f"{scope}{node.name}."
+    elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        return f"{scope}{node.name}.<locals>."
+    return scope
+
 
+def _iter_definitions(
+        tree: ast.AST,
+        decorated_only: bool = False
+) -> List[Tuple[ast.AST, str]]:
+    """Find every class and function definition in a tree, wherever it is.
 
-def _yield_deprecation_message(node: ast.AST, current_version: VersionNumber) -> Optional[str]:
-    """Filter nodes that correspond to an invalid deprecation, and return an error message.
+    Scopes (the module, classes and functions) are visited breadth-first. Within a scope,
+    definitions are found in source order, including those nested in compound statements
+    such as ``if`` or ``try``. Expressions are never entered, because no definition that
+    can be decorated can appear in one.
 
     Parameters
     ----------
-    node: ast.AST
-        A node of a syntax tree
-    current_version: VersionNumber
-        Current version of the software, to compare the deprecation against
+    tree: ast.AST
+        The root of the tree, usually an ast.Module
+    decorated_only: bool
+        Whether to leave out definitions without decorators. Their bodies are still visited.
 
     Returns
     -------
-    str
-        An error message if the node corresponds to an invalid deprecation
+    List[Tuple[ast.AST, str]]
+        pairs of a definition and the qualified-name prefix of its scope
 
     """
-    maybe_deprecation = _get_deprecation(node)
-    if maybe_deprecation is not None:
-        return maybe_deprecation.check_error(current_version)
-    else:
-        return None
+    dispatch = _DISPATCH
+    definitions = []
+    todo = deque([(tree, "")])
+
+    def visit(statements: List[ast.AST], scope: str):
+        for child in statements:
+            action = dispatch.get(type(child))
+            if action is None:
+                continue
+            if action is _DEFINITION:
+                if child.decorator_list or not decorated_only:
+                    definitions.append((child, scope))
+                todo.append((child, _child_scope(child, scope)))
+            else:
+                for field in action:
+                    block = getattr(child, field)
+                    if block:
+                        visit(block, scope)
+
+    while todo:
+        node, scope = todo.popleft()
+        visit(node.body, scope)
+    return definitions
 
 
 def _walk_nodes_filter_transform(
         node: ast.AST,
-        filter_transform: Callable[[ast.AST], Optional[Any]] = lambda node: node
+        filter_transform: Callable[[ast.AST, str], Optional[Any]] = lambda node, scope: node
 ) -> Iterator[Any]:
-    """Walk all nodes of a syntax tree, applying an optional filter and transformation.
+    """Walk all definitions in a syntax tree, applying an optional filter and transformation.
+
+    See _iter_definitions for the order in which definitions are visited.
 
     Parameters
     ----------
     node: ast.AST
         The root of the tree
-    filter_transform: Callable[[ast.AST], Optional[Any]]
-        A method that accepts an ast node and returns either a function of that node or None
+    filter_transform: Callable[[ast.AST, str], Optional[Any]]
+        A method that accepts an ast node and the qualified-name prefix of its scope, and
+        returns either a function of that node or None
 
     Returns
     -------
@@ -125,16 +205,398 @@ def _walk_nodes_filter_transform(
         An iterator over the transformed version of the nodes that pass the filter
 
     """
-    from collections import deque
-    todo = deque([node])
-    while todo:
-        node = todo.popleft()
-        todo.extend(_iter_relevant_children(node))
-        maybe_result = filter_transform(node)
+    for definition, scope in _iter_definitions(node):
+        maybe_result = filter_transform(definition, scope)
         if maybe_result is not None:
             yield maybe_result
 
 
+def _extract_deprecations(tree: ast.AST) -> List[WrappedDeprecation]:
+    """Find every deprecation in a syntax tree.
+
+    Only decorated definitions are inspected, and decorators are dispatched on their name,
+    see derp.registry, so the cost is dominated by the traversal itself.
+    """
+    registry = get_registry(DEPRECATION_TYPE_LIST)
+    deprecations = []
+    for definition, scope in _iter_definitions(tree, decorated_only=True):
+        deprecation = _get_deprecation(definition, scope, registry)
+        if deprecation is not None:
+            deprecations.append(deprecation)
+    return deprecations
+
+
+"""Kinds of use, see Usage."""
+IMPORT = "import"
+ATTRIBUTE = "attribute"
+NAME = "name"
+
+
+class Usage(NamedTuple):
+    """A place where a module uses a qualified name.
+
+    ``kind`` is "import" for an import statement, "attribute" for an attribute chain such as
+    ``io.OldClass`` and "name" for a bare name such as ``OldClass``.
+    """
+
+    path: str
+    line: int
+    col: int
+    name: str
+    kind: str
+
+
+@lru_cache(maxsize=None)
+def _package_prefix(directory: str) -> str:
+    """Return the dotted name of the package in a directory, followed by a dot, or ""."""
+    if not os.path.isfile(os.path.join(directory, "__init__.py")):
+        return ""
+    parent = os.path.dirname(directory)
+    return f"{_package_prefix(parent) if parent != directory else ''}" \
+           f"{os.path.basename(directory)}."
+
+
+def module_name(path: str) -> str:
+    """Return the dotted name under which a module is imported.
+
+    The name starts at the outermost directory of nested packages, i.e., directories with an
+    ``__init__.py``, so that ``src/my_app/io.py`` is ``my_app.io`` and
+    ``src/my_app/__init__.py`` is ``my_app``.
+    """
+    directory, filename = os.path.split(os.path.abspath(path))
+    prefix = _package_prefix(directory)
+    stem = os.path.splitext(filename)[0]
+    if stem == "__init__" and prefix:
+        return prefix[:-1]
+    return prefix + stem
+
+
+def _resolve_relative(module: str, is_package: bool, level: int, target: Optional[str]) -> str:
+    """Resolve the module of a relative import, e.g., ``from ..io import OldClass``."""
+    parts = module.split(".")
+    if not is_package:
+        parts = parts[:-1]
+    if level > 1:
+        parts = parts[:-(level - 1)]
+    if target:
+        parts.append(target)
+    return ".".join(parts)
+
+
+def collect_usages(tree: ast.AST, path: str, module: Optional[str] = None) -> List[Usage]:
+    """Find every use of an imported or top-level name in a syntax tree.
+
+    Imports anywhere in the module bind names for the whole module, which is right for the
+    usual imports at the top of a module and for imports deferred to the body of a function.
+
+    Parameters
+    ----------
+    tree: ast.AST
+        the syntax tree of the module
+    path: str
+        path to the module, recorded in each use
+    module: Optional[str]
+        the dotted name of the module, by default derived from *path* with ``module_name``
+
+    Returns
+    -------
+    List[Usage]
+        every use, in the order in which the tree is walked
+
+    """
+    if module is None:
+        module = module_name(path)
+    is_package = os.path.basename(path) == "__init__.py"
+    # What each name in the module refers to
+    bindings: Dict[str, str] = dict()
+    for node in getattr(tree, "body", ()):
+        if isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            bindings[node.name] = f"{module}.{node.name}"
+    usages = []
+    references = []
+    # Nodes that are part of a longer attribute chain, which is reported instead
+    inner = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                usages.append(Usage(path, node.lineno, node.col_offset, alias.name, IMPORT))
+                if alias.asname is not None:
+                    bindings[alias.asname] = alias.name
+                else:
+                    top = alias.name.split(".")[0]
+                    bindings[top] = top
+        elif isinstance(node, ast.ImportFrom):
+            source = node.module or ""
+            if node.level:
+                source = _resolve_relative(module, is_package, node.level, node.module)
+            for alias in node.names:
+                if alias.name == "*":
+                    continue
+                name = f"{source}.{alias.name}" if source else alias.name
+                usages.append(Usage(path, node.lineno, node.col_offset, name, IMPORT))
+                bindings[alias.asname or alias.name] = name
+        elif isinstance(node, (ast.Attribute, ast.Name)):
+            if isinstance(node, ast.Attribute):
+                inner.add(id(node.value))
+            if id(node) not in inner and isinstance(node.ctx, ast.Load):
+                references.append(node)
+    for node in references:
+        attributes = []
+        base = node
+        while isinstance(base, ast.Attribute):
+            attributes.append(base.attr)
+            base = base.value
+        if not isinstance(base, ast.Name) or base.id not in bindings:
+            continue
+        name = ".".join([bindings[base.id]] + attributes[::-1])
+        kind = ATTRIBUTE if attributes else NAME
+        usages.append(Usage(path, node.lineno, node.col_offset, name, kind))
+    return usages
+
+
+def parse_module(filepath: str, source: Optional[bytes] = None) -> ast.Module:
+    """Parse a module into a syntax tree, reading it unless its contents are given.
+
+    The module is read as bytes, so that the parser decodes it as specified by its coding
+    cookie or byte order mark, if any (PEP 263), rather than with the locale's encoding.
+
+    Raises
+    ------
+    SyntaxError, ValueError, RecursionError, MemoryError
+        If the module cannot be parsed
+
+    """
+    if source is None:
+        source = read_bytes(filepath)
+    return ast.parse(source)
+
+
+def _timed(stages: Optional[Dict[str, float]], stage: str, func: Callable[..., Any],
+           *args) -> Any:
+    """Call ``func(*args)``, adding the seconds it took to ``stages[stage]`` if *stages* is
+    given, whether or not it raises.
+    """
+    if stages is None:
+        return func(*args)
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        stages[stage] = stages.get(stage, 0.0) + time.perf_counter() - start
+
+
+def collect_deprecations(
+        filepath: str,
+        engine: str = "ast",
+        source: Optional[bytes] = None,
+        stages: Optional[Dict[str, float]] = None,
+        uses: Optional[List[Usage]] = None
+) -> List[WrappedDeprecation]:
+    """Collect all deprecations in a given module, whether or not they are valid.
+
+    The result does not depend on the current version, which makes it suitable for caching.
+
+    Parameters
+    ----------
+    filepath: str
+        path to a python module
+    engine: str
+        one of ``ENGINES``: "ast" to parse the module, "tokenize" to stream its tokens (see
+        derp.token_engine), or "auto" to parse it and stream its tokens only if it cannot
+        be parsed
+    source: Optional[bytes]
+        the contents of the module, if they have already been read (see derp.prefetch).
+        They are decoded as specified by their coding cookie, if any.
+    stages: Optional[Dict[str, float]]
+        if given, the time spent in each step is added to it, see scan_file
+    uses: Optional[List[Usage]]
+        if given, the names that the module uses are added to it, from the same syntax tree,
+        see collect_usages. Nothing is added for a module that is not parsed.
+    """
+    if engine == "tokenize":
+        # Reading, tokenizing and finding deprecations are a single pass
+        return _timed(stages, "parse", collect_deprecations_from_tokens, filepath, source)
+    if source is None:
+        source = _timed(stages, "read", read_bytes, filepath)
+    try:
+        tree = _timed(stages, "parse", parse_module, filepath, source)
+    except PARSE_ERRORS:
+        if engine != "auto":
+            raise
+        return _timed(stages, "parse", collect_deprecations_from_tokens, filepath, source)
+    deprecations = _timed(stages, "traverse", _extract_deprecations, tree)
+    if uses is not None:
+        uses.extend(_timed(stages, "traverse", collect_usages, tree, filepath))
+    if stages is not None:
+        stages["nodes"] = sum(1 for _ in ast.walk(tree))
+    return deprecations
+
+
+def unparseable_module(error: Union[Exception, str]) -> WrappedDeprecation:
+    """Return the deprecation that stands in for a module that could not be checked.
+
+    Parameters
+    ----------
+    error: Union[Exception, str]
+        the exception raised when reading or parsing the module, or a description of why it
+        was not parsed. A syntax error is reported at its line.
+
+    """
+    if isinstance(error, str):
+        return WrappedDeprecation("<module>", UnparseableModule(error))
+    if isinstance(error, SyntaxError):
+        detail = f"{type(error).__name__}: {error.msg}"
+    elif isinstance(error, OSError):
+        detail = f"{type(error).__name__}: {error.strerror or error}"
+    else:
+        detail = f"{type(error).__name__}: {error}".rstrip(": ")
+    lineno = getattr(error, "lineno", None) if isinstance(error, SyntaxError) else None
+    col = getattr(error, "offset", None) if lineno is not None else None
+    return WrappedDeprecation("<module>", UnparseableModule(detail), lineno=lineno, col=col)
+
+
+def is_unparseable(deprecations: List[WrappedDeprecation]) -> bool:
+    """Whether a scan result stands for a module that could not be checked."""
+    return any(isinstance(deprecation.deprecation, UnparseableModule)
+               for deprecation in deprecations)
+
+
+def _size_guard(filepath: str, source: Optional[bytes], max_size: Optional[int]
+                ) -> Optional[WrappedDeprecation]:
+    """Return an unparseable marker if a module is larger than *max_size* bytes."""
+    if max_size is None:
+        return None
+    size = len(source) if source is not None else os.path.getsize(filepath)
+    if size <= max_size:
+        return None
+    return unparseable_module(f"it is {size} bytes, larger than the limit of {max_size}")
+
+
+def scan_file(
+        filepath: str,
+        pattern: Optional[Pattern[bytes]] = None,
+        engine: str = "ast",
+        source: Optional[bytes] = None,
+        max_size: Optional[int] = None,
+        stages: Optional[Dict[str, float]] = None,
+        uses: Optional[List[Usage]] = None
+) -> Optional[List[WrappedDeprecation]]:
+    """Collect all deprecations in a module, unless the prefilter rules it out.
+
+    This is the unit of work handed to worker processes. A module that cannot be read or
+    parsed does not abort the scan: its only deprecation is an ``UnparseableModule``, which
+    is reported as an "unparseable" finding, so that the rest of the scan goes on.
+
+    Parameters
+    ----------
+    filepath: str
+        path to a python module
+    pattern: Optional[Pattern[bytes]]
+        prefilter pattern, see derp.prefilter.compile_prefilter
+    engine: str
+        how to find the deprecations, see collect_deprecations
+    source: Optional[bytes]
+        the contents of the module, if they have already been read
+    max_size: Optional[int]
+        if given, a module larger than this many bytes that the prefilter cannot rule out is
+        not parsed, and is reported as unparseable
+    stages: Optional[Dict[str, float]]
+        if given, the seconds spent in each step ("prefilter", "read", "parse" and
+        "traverse") are added to it, along with the number of nodes in the syntax tree of
+        the module as "nodes", see derp.profiling. The tokenize engine reads, tokenizes and
+        finds deprecations in a single pass, which counts as parsing.
+    uses: Optional[List[Usage]]
+        if given, the names that the module uses are added to it, see collect_deprecations
+
+    Returns
+    -------
+    Optional[List[WrappedDeprecation]]
+        every deprecation in the module, or None if the module was skipped without parsing
+
+    """
+    try:
+        if not _timed(stages, "prefilter", may_contain_deprecation, filepath, pattern, source):
+            return None
+        too_large = _size_guard(filepath, source, max_size)
+        if too_large is not None:
+            return [too_large]
+        return collect_deprecations(filepath, engine, source, stages, uses)
+    except (OSError,) + PARSE_ERRORS as exc:
+        return [unparseable_module(exc)]
+
+
+def scan_file_with_uses(
+        filepath: str,
+        engine: str = "ast",
+        source: Optional[bytes] = None,
+        max_size: Optional[int] = None
+) -> Tuple[List[WrappedDeprecation], List[Usage]]:
+    """Parse a module once, and return both its deprecations and the names it uses.
+
+    This is the unit of work of ``derp usages``, see scan_file. Any module may use a
+    deprecation, so every module is parsed: there is no prefilter. The "tokenize" engine
+    cannot find uses, so it is treated like "auto", and a module whose deprecations come from
+    its tokens, or that could not be checked, has no uses.
+    """
+    uses: List[Usage] = []
+    engine = "auto" if engine == "tokenize" else engine
+    deprecations = scan_file(filepath, None, engine, source, max_size, uses=uses)
+    return deprecations, uses
+
+
+def find_invalid_deprecations(
+        deprecations: List[WrappedDeprecation],
+        current_version: VersionNumber,
+        path: str = ""
+) -> List[Finding]:
+    """Check a collection of deprecations against the current version.
+
+    Parameters
+    ----------
+    deprecations: List[WrappedDeprecation]
+        deprecations extracted from a module
+    current_version: VersionNumber
+        current version of the software against which to check deprecation removal
+    path: str
+        path to the module, recorded in each finding
+
+    Returns
+    -------
+    List[Finding]
+        a finding for every invalid deprecation
+
+    """
+    invalid = []
+    for deprecation in deprecations:
+        finding = deprecation.check(current_version, path)
+        if finding is not None:
+            invalid.append(finding)
+    return invalid
+
+
+def check_deprecations(
+        deprecations: List[WrappedDeprecation],
+        current_version: VersionNumber
+) -> List[str]:
+    """Check a collection of deprecations against the current version.
+
+    Parameters
+    ----------
+    deprecations: List[WrappedDeprecation]
+        deprecations extracted from a module
+    current_version: VersionNumber
+        current version of the software against which to check deprecation removal
+
+    Returns
+    -------
+    List[str]
+        an error message for every invalid deprecation
+
+    """
+    errors = (deprecation.check_error(current_version) for deprecation in deprecations)
+    return [error for error in errors if error is not None]
+
+
 def collect_deprecation_errors(
         filepath: str,
         current_version: VersionNumber
@@ -148,10 +610,4 @@ def collect_deprecation_errors(
     current_version: VersionNumber
         current version of the software against which to check deprecation removal
     """
-    with open(filepath) as source:
-        tree = ast.parse(source.read())
-        deprecation_generator = _walk_nodes_filter_transform(
-            tree,
-            lambda node: _yield_deprecation_message(node, current_version)
-        )
-        return list(deprecation_generator)
+    return check_deprecations(collect_deprecations(filepath), current_version)
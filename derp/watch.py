@@ -0,0 +1,181 @@
+"""Keep checking a package as it is edited, re-parsing only the modules that change.
+
+After one full scan, the deprecations of every module are kept in memory along with the
+module's size and modification time. The package is then polled: modules whose size or
+modification time changed, and new modules, are parsed again, and the difference in invalid
+deprecations is printed. If the version file changes, every module is re-checked against the
+new version from memory, without parsing anything.
+
+A poll that finds the package in a state that cannot be checked, e.g., a version file that
+an editor is halfway through saving, or no modules at all, is reported on stderr and
+changes nothing: the next poll tries again from the last good state.
+"""
+
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from derp.application import Application
+from derp.deprecation import WrappedDeprecation
+from derp.walker import find_invalid_deprecations
+
+"""An invalid deprecation, identified by its qualified name and the reason it is invalid."""
+FindingKey = Tuple[str, str]
+
+
+def _signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class WatchApplication(Application):
+    """Scan a package, then keep re-checking the modules that change until interrupted.
+
+    Parameters
+    ----------
+    target: str
+        path to the file or directory to scan for deprecations
+    version: str
+        version number, either as a string or a path to a file that contains the version number
+    interval: float
+        seconds to wait between polls
+    max_polls: Optional[int]
+        stop after this many polls. By default, polling continues until a keyboard interrupt.
+    **kwargs
+        passed on to Application, e.g., ``jobs`` or ``cache_dir``
+
+    """
+
+    def __init__(self, target: str, version: str, interval: float = 1.0,
+                 max_polls: Optional[int] = None, **kwargs):
+        super().__init__(target, version, **kwargs)
+        self.interval = interval
+        self.max_polls = max_polls
+        self.signatures: Dict[str, Optional[Tuple[int, int]]] = dict()
+        self.deprecations: Dict[str, List[WrappedDeprecation]] = dict()
+        self.findings: Dict[str, Set[FindingKey]] = dict()
+        self.version_signature: Optional[Tuple[int, int]] = None
+        self.changed_files = 0
+        # Why the last poll could not check the package, if it could not
+        self.poll_error: Optional[str] = None
+
+    def initialize(self):
+        """Parse the version number and find every file to watch."""
+        super().initialize()
+        self._initialize_absolute_paths()
+
+    def _findings(self, deprecations: List[WrappedDeprecation]) -> Set[FindingKey]:
+        invalid = find_invalid_deprecations(deprecations, self.current_version)
+        return {(finding.qualname, finding.message) for finding in invalid}
+
+    def _update(self, file_paths: List[str]):
+        """Parse the given files again and record their deprecations and findings."""
+        for file_path in file_paths:
+            self.signatures[file_path] = _signature(file_path)
+        for file_path, deprecations in self._extract(file_paths):
+            self.deprecations[file_path] = deprecations
+            self.findings[file_path] = self._findings(deprecations)
+
+    def run_checks(self):
+        """Run the initial, full scan and report every invalid deprecation."""
+        start = time.perf_counter()
+        self.version_signature = _signature(self.version)
+        self._update(self.file_paths)
+        elapsed = time.perf_counter() - start
+        for file_path in self.file_paths:
+            invalid = find_invalid_deprecations(self.deprecations[file_path],
+                                                self.current_version, file_path)
+            if invalid:
+                self.reporter.report_file(file_path, invalid)
+        self.failed_files = sum(1 for findings in self.findings.values() if findings)
+        print(f"Initial scan of {len(self.file_paths)} files took {elapsed * 1000:.1f} ms",
+              file=sys.stderr, flush=True)
+
+    def poll(self) -> Tuple[List[Tuple[str, FindingKey]], List[Tuple[str, FindingKey]]]:
+        """Check for changes once, and re-check whatever changed.
+
+        If the version or the modules cannot be found, nothing changes and there are no new
+        or resolved findings. The error is written to stderr, once until it changes, and kept
+        in ``poll_error``.
+
+        Returns
+        -------
+        Tuple[List[Tuple[str, FindingKey]], List[Tuple[str, FindingKey]]]
+            pairs of a path and a finding, for findings that are new and findings that
+            have been resolved since the previous poll
+
+        """
+        old_findings = {path: set(findings) for path, findings in self.findings.items()}
+        version_signature = _signature(self.version)
+        version_changed = version_signature != self.version_signature
+        current_version = self.current_version
+        try:
+            if version_changed:
+                self._initialize_version_number()
+            self._initialize_absolute_paths()
+        except ValueError as exc:
+            self.current_version = current_version
+            if str(exc) != self.poll_error:
+                print(f"Cannot check the package, keeping the previous results: {exc}",
+                      file=sys.stderr, flush=True)
+            self.poll_error = str(exc)
+            self.changed_files = 0
+            return [], []
+        self.poll_error = None
+        if version_changed:
+            self.version_signature = version_signature
+            for file_path, deprecations in self.deprecations.items():
+                self.findings[file_path] = self._findings(deprecations)
+
+        present = set(self.file_paths)
+        for file_path in list(self.signatures):
+            if file_path not in present:
+                del self.signatures[file_path]
+                del self.deprecations[file_path]
+                del self.findings[file_path]
+        changed = [file_path for file_path in self.file_paths
+                   if self.signatures.get(file_path) != _signature(file_path)]
+        self._update(changed)
+        self.changed_files = len(changed)
+
+        added = []
+        resolved = []
+        for file_path in sorted(set(old_findings) | set(self.findings)):
+            old = old_findings.get(file_path, set())
+            new = self.findings.get(file_path, set())
+            added.extend((file_path, finding) for finding in sorted(new - old))
+            resolved.extend((file_path, finding) for finding in sorted(old - new))
+        self.failed_files = sum(1 for findings in self.findings.values() if findings)
+        return added, resolved
+
+    def watch(self):
+        """Poll for changes until interrupted, printing new and resolved findings."""
+        polls = 0
+        try:
+            while self.max_polls is None or polls < self.max_polls:
+                time.sleep(self.interval)
+                polls += 1
+                start = time.perf_counter()
+                added, resolved = self.poll()
+                elapsed = time.perf_counter() - start
+                if not (added or resolved or self.changed_files):
+                    continue
+                for path, (qualname, reason) in added:
+                    print(f"+ {path}: {qualname}: {reason}")
+                for path, (qualname, reason) in resolved:
+                    print(f"- {path}: {qualname}: {reason}")
+                print(f"Re-checked {self.changed_files} of {len(self.file_paths)} files in "
+                      f"{elapsed * 1000:.1f} ms: {len(added)} new, {len(resolved)} resolved",
+                      file=sys.stderr, flush=True)
+        except KeyboardInterrupt:
+            pass
+
+    def _run(self):
+        self.initialize()
+        self.run_checks()
+        self.watch()
+        self.report()
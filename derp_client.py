@@ -0,0 +1,74 @@
+"""A thin client for ``derp serve``: send the command line to the server and print its response.
+
+This module is deliberately outside the derp package, and imports nothing from it unless it
+has to, so that starting it costs little more than starting the interpreter. If no server is
+listening, the command line is run in this process instead, exactly as ``derp`` would run it.
+
+The socket is found at $DERP_SOCKET, or at .derp_cache/server.sock in the working directory.
+"""
+
+import io
+import json
+import os
+import socket
+import sys
+from typing import List, Optional
+
+DEFAULT_SOCKET = os.path.join(".derp_cache", "server.sock")
+
+
+def request(message: dict, socket_path: str) -> dict:
+    """Send a request to the server and return its response.
+
+    Raises
+    ------
+    OSError
+        If no server is listening on the socket
+
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        raise OSError("Unix domain sockets are not available")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        client.sendall(json.dumps(message).encode() + b"\n")
+        with client.makefile("rb") as stream:
+            line = stream.readline()
+    if not line:
+        raise OSError("The server closed the connection without responding")
+    return json.loads(line)
+
+
+def reads_stdin(argv: List[str]) -> bool:
+    """Whether a command line reads from stdin, with --files-from - or --stdin-filename."""
+    for index, argument in enumerate(argv):
+        if argument.startswith("--stdin-filename") or argument == "--files-from=-":
+            return True
+        if argument == "--files-from" and argv[index + 1:index + 2] == ["-"]:
+            return True
+    return False
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    if argv is None:
+        argv = sys.argv[1:]
+    socket_path = os.environ.get("DERP_SOCKET", DEFAULT_SOCKET)
+    message = {"argv": argv, "cwd": os.getcwd()}
+    stdin = None
+    if reads_stdin(argv):
+        # Bytes survive the round trip through json as latin-1
+        stdin = sys.stdin.buffer.read()
+        message["stdin"] = stdin.decode("latin-1")
+    try:
+        response = request(message, socket_path)
+    except OSError:
+        from derp.main import main as run
+        if stdin is not None:
+            sys.stdin = io.TextIOWrapper(io.BytesIO(stdin))
+        return run(argv)
+    sys.stdout.write(response["stdout"])
+    sys.stderr.write(response["stderr"])
+    return response["exit"]
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -13,6 +13,7 @@ setup(
     url="https://github.com/bfolie/derp",
     license="MIT",
     packages=find_packages(exclude=['tests']),
+    py_modules=['derp_client'],
     description="command line tool to ensure that deprecated code is removed in a timely manner",
     long_description=long_description,
     long_description_content_type="text/markdown",
@@ -20,6 +21,7 @@ setup(
     entry_points={
         'console_scripts': [
             'derp = derp.main:main',
+            'derp-client = derp_client:main',
         ]
     },
     classifiers=[
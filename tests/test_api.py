@@ -0,0 +1,82 @@
+import ast
+import os
+import pathlib
+
+import pytest
+
+import derp
+from derp.deprecation import Deprecation, WrappedDeprecation
+from derp.finding import EXPIRED, MISSING_VERSIONS, UNPARSEABLE_VERSION, Finding
+from derp.version_number import VersionNumber
+from derp.walker import find_invalid_deprecations
+
+dirname = os.path.dirname(__file__)
+target = os.path.join(dirname, "resources/test_package")
+
+
+def test_scan():
+    """The findings of a scan are structured records, with a reason code."""
+    findings = list(derp.scan(target, "1.0.0"))
+    assert all(isinstance(finding, Finding) for finding in findings)
+    assert [(finding.qualname, finding.reason) for finding in findings] == [
+        ("OlderDeprecatedClass", EXPIRED),
+        ("LiveClass.cube", UNPARSEABLE_VERSION),
+        ("LiveClass.quartic", MISSING_VERSIONS),
+        ("LiveClass.display.<locals>._old_display", EXPIRED),
+    ]
+    first = findings[0]
+    assert first.path == os.path.join(target, "test_module.py")
+    assert (first.line, first.col) == (5, 1)
+    assert (first.deprecated_in, first.removed_in) == ("0.12.3", "1.0.0")
+    assert first.detector == "PythonDeprecation"
+    assert first.message == "Current version, 1.0.0, exceeds expected removal version, 1.0.0"
+    assert findings[3].name == "_old_display"
+
+    # Overlapping paths are scanned once, and paths may be path-like
+    module = pathlib.Path(target) / "test_module.py"
+    assert list(derp.scan([module, target], "1.0.0", jobs=2)) == findings
+    assert list(derp.scan(target, os.path.join(target, "__version__.py"))) != findings
+
+    with pytest.raises(ValueError):
+        list(derp.scan(target, "not a version"))
+    with pytest.raises(ValueError):
+        list(derp.scan(os.path.join(target, "missing"), "1.0.0"))
+
+
+def test_scan_options(tmp_path):
+    """Sharding and stopping early apply to the API as they do to the command line."""
+    for index in range(6):
+        (tmp_path / f"module_{index}.py").write_text(
+            "@deprecated(deprecated_in='0.1', removed_in='0.2')\ndef f():\n    pass\n")
+    paths = {finding.path for finding in derp.scan(str(tmp_path), "1.0")}
+    assert len(paths) == 6
+    shards = [{finding.path for finding in derp.scan(str(tmp_path), "1.0", shard=(index, 2))}
+              for index in (1, 2)]
+    assert shards[0] and shards[1] and shards[0] | shards[1] == paths
+    assert not shards[0] & shards[1]
+    assert len(list(derp.scan(str(tmp_path), "1.0", fail_fast=True))) == 1
+    with pytest.raises(TypeError):
+        list(derp.scan(str(tmp_path), "1.0", profile="text"))
+
+
+def test_legacy_deprecation_types():
+    """A type that only implements check_error reports its message as the reason."""
+    class Legacy(Deprecation):
+        def __init__(self, decorator):
+            pass
+
+        def check_error(self, current_version):
+            return "always wrong"
+
+        def to_dict(self):
+            return {}
+
+        @classmethod
+        def from_dict(cls, data):
+            return cls.__new__(cls)
+
+    wrapped = WrappedDeprecation("f", Legacy(ast.Name("old")), lineno=3, col=0)
+    finding, = find_invalid_deprecations([wrapped], VersionNumber("1.0"), "module.py")
+    assert finding == Finding("module.py", 3, 0, "f", None, None, "Legacy", "always wrong", "1.0")
+    assert finding.message == "always wrong"
+    assert wrapped.check_error(VersionNumber("1.0")) == "f: always wrong"
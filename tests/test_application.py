@@ -70,3 +70,19 @@ def test_file_gathering():
     # It should check 3 files: test_module.py, __version__.py,
     # and subdirectory/another_test_module.py
     assert len(app.file_paths) == 3
+
+
+def test_parallel_matches_serial():
+    """Scanning on a process pool should produce the same failures, in the same order."""
+    target = os.path.join(dirname, "resources/test_package")
+    serial = Application(target, "1.0.0")
+    serial.run()
+    parallel = Application(target, "1.0.0", jobs=2)
+    parallel.run()
+
+    assert not parallel.catastrophic_failure
+    assert list(parallel.failures.items()) == list(serial.failures.items())
+
+    bad_jobs = Application(target, "1.0.0", jobs="many")
+    bad_jobs.run()
+    assert bad_jobs.catastrophic_failure
@@ -0,0 +1,125 @@
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from derp.application import Application
+from derp.archive import archive_version, iter_archive_modules
+from derp.main import main
+
+dirname = os.path.dirname(__file__)
+target = os.path.join(dirname, "resources/test_package")
+MODULES = ["test_module.py", "subdirectory/another_test_module.py"]
+
+
+def _modules():
+    for name in MODULES:
+        with open(os.path.join(target, name), "rb") as fp:
+            yield f"test_package/{name}", fp.read()
+
+
+def make_wheel(directory, version="1.0.0", name=None):
+    path = os.path.join(str(directory), name or f"test_package-{version}-py3-none-any.whl")
+    with zipfile.ZipFile(path, "w") as archive:
+        for member, source in _modules():
+            archive.writestr(member, source)
+        if version is not None:
+            archive.writestr(f"test_package-{version}.dist-info/METADATA",
+                             f"Metadata-Version: 2.1\nName: test_package\nVersion: {version}\n")
+    return path
+
+
+def make_sdist(directory, version="0.5"):
+    path = os.path.join(str(directory), f"test_package-{version}.tar.gz")
+    members = [(f"test_package-{version}/{member}", source) for member, source in _modules()]
+    members.append((f"test_package-{version}/PKG-INFO",
+                    f"Metadata-Version: 2.1\nName: test_package\nVersion: {version}\n".encode()))
+    with tarfile.open(path, "w:gz") as archive:
+        for member, source in members:
+            info = tarfile.TarInfo(member)
+            info.size = len(source)
+            archive.addfile(info, io.BytesIO(source))
+    return path
+
+
+def test_iter_archive_modules(tmp_path):
+    for path in (make_wheel(tmp_path), make_sdist(tmp_path)):
+        names = [name.split("test_package/", 1)[1] for name, _ in iter_archive_modules(path)]
+        assert names == MODULES
+    broken = tmp_path / "broken.zip"
+    broken.write_text("not an archive")
+    with pytest.raises(ValueError):
+        list(iter_archive_modules(str(broken)))
+
+
+def test_archive_version(tmp_path):
+    assert archive_version(make_wheel(tmp_path, "1.2.3")) == "1.2.3"
+    assert archive_version(make_sdist(tmp_path, "0.5")) == "0.5"
+    # Without metadata, from the file name
+    assert archive_version(make_wheel(tmp_path, None, "my-app-2.0-py3-none-any.whl")) == "2.0"
+    with pytest.raises(ValueError):
+        archive_version(make_wheel(tmp_path, None, "vendored.zip"))
+
+
+def test_prerelease_version(tmp_path):
+    """Only the release segment of a PEP 440 version is kept."""
+    assert archive_version(make_wheel(tmp_path, "1.0rc1")) == "1.0"
+    assert archive_version(make_wheel(tmp_path, "1!2.1.post3")) == "2.1"
+    assert archive_version(make_sdist(tmp_path, "0.5.dev2")) == "0.5"
+    assert archive_version(make_wheel(tmp_path, None, "pkg-1.0rc1-py3-none-any.whl")) == "1.0"
+    assert archive_version(make_wheel(tmp_path, None, "pkg-3.1b2.zip")) == "3.1"
+    with pytest.raises(ValueError):
+        archive_version(make_wheel(tmp_path, "unknown", "pkg-unknown-py3-none-any.whl"))
+    app = Application(make_wheel(tmp_path, "1.0rc1"), None)
+    app.run()
+    assert app.current_version.version == "1.0"
+
+
+@pytest.mark.parametrize("jobs", [None, 2])
+def test_archive_matches_directory(tmp_path, jobs):
+    """An archive is scanned like the directory it was built from, without extracting it."""
+    wheel = make_wheel(tmp_path)
+    before = sorted(os.listdir(str(tmp_path)))
+    from_archive = Application(wheel, "1.0.0", jobs=jobs)
+    from_archive.run()
+    from_directory = Application(target, "1.0.0")
+    from_directory.run()
+    assert sorted(os.listdir(str(tmp_path))) == before
+    assert [os.path.relpath(path, wheel) for path in from_archive.file_paths] == \
+        [os.path.join("test_package", name) for name in MODULES]
+    assert [(finding.qualname, finding.reason) for findings in from_archive.failures.values()
+            for finding in findings] == \
+        [(finding.qualname, finding.reason) for findings in from_directory.failures.values()
+         for finding in findings]
+    assert from_archive.archive_sources == dict()
+
+
+def test_version_from_metadata(tmp_path, capsys):
+    wheel = make_wheel(tmp_path, "0.5")
+    assert main([wheel, "--no-cache"]) == 1
+    out = capsys.readouterr().out
+    assert out.startswith(os.path.join(wheel, "test_package", "test_module.py"))
+    assert "_old_display" not in out
+    # An explicit version wins
+    assert main([wheel, "0.1", "--no-cache"]) == 1
+    assert "cube" in capsys.readouterr().out
+
+
+def test_many_archives(tmp_path, capsys):
+    """Every archive is checked against its own version, and reported in its own group."""
+    wheel = make_wheel(tmp_path, "1.0.0")
+    sdist = make_sdist(tmp_path, "0.5")
+    assert main([wheel, sdist, "--no-cache"]) == 1
+    out = capsys.readouterr().out
+    assert f"== {os.path.basename(wheel)} ==" in out
+    assert f"== {os.path.basename(sdist)} ==" in out
+    with pytest.raises(SystemExit):
+        main([target, wheel])
+
+
+def test_archive_excludes(tmp_path):
+    app = Application(make_wheel(tmp_path), "1.0.0", exclude=["subdirectory"])
+    app.run()
+    assert len(app.file_paths) == 1
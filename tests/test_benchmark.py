@@ -0,0 +1,66 @@
+import json
+import os
+
+from derp import benchmark
+from derp.benchmark import STAGES, append_history, benchmark_package, find_baseline, \
+    find_regressions, generate_package, load_history
+from derp.main import main
+from derp.walker import collect_deprecations
+
+
+def test_generate_package(tmp_path):
+    """Generated packages have the requested shape, and the same seed gives the same package."""
+    paths = generate_package(str(tmp_path), modules=7, depth=3, density=0.5, lines=100)
+    assert len(paths) == 7
+    assert os.path.isfile(tmp_path / "synthetic" / "level1" / "level2" / "level3" / "__init__.py")
+    assert paths[3] == str(tmp_path / "synthetic" / "level1" / "level2" / "level3" / "module3.py")
+    with open(paths[0]) as fp:
+        n_lines = len(fp.read().splitlines())
+    # modules stop after the method that takes them past the requested size
+    assert 100 <= n_lines < 115
+    deprecations = [d for path in paths for d in collect_deprecations(path)]
+    n_functions = sum(open(path).read().count("    def ") for path in paths)
+    assert 0.3 < len(deprecations) / n_functions < 0.7
+
+    other = generate_package(str(tmp_path / "other"), modules=7, depth=3, density=0.5, lines=100)
+    assert open(paths[5]).read() == open(other[5]).read()
+
+
+def test_benchmark_and_regressions(tmp_path):
+    """Every stage is timed, and only stages that got slower count as regressions."""
+    record = benchmark_package(modules=3, depth=1, lines=50, repeat=1)
+    assert set(record["timings"]) == set(STAGES)
+    assert record["parameters"]["modules"] == 3
+
+    history_file = str(tmp_path / "history.json")
+    append_history(history_file, record)
+    other = dict(record, parameters=dict(record["parameters"], modules=4))
+    append_history(history_file, other)
+    history = load_history(history_file)
+    assert len(history) == 2
+    assert find_baseline(history, record) == record
+
+    slower = dict(record, timings=dict(record["timings"], parse=record["timings"]["parse"] + 1))
+    assert find_regressions(record, record) == []
+    regressions = find_regressions(slower, record)
+    assert len(regressions) == 1 and regressions[0].startswith("parse:")
+
+
+def test_benchmark_command(tmp_path, capsys, monkeypatch):
+    """A comparison run fails, without being recorded, if any stage regressed."""
+    # The synthetic package is small enough to be scanned in under the noise threshold
+    monkeypatch.setattr(benchmark, "MIN_REGRESSION_SECONDS", 0.0)
+    history_file = str(tmp_path / "history.json")
+    args = ["benchmark", "--modules", "3", "--lines", "50", "--repeat", "1",
+            "--history", history_file]
+    assert main(args) == 0
+    assert "parse" in capsys.readouterr().out
+
+    with open(history_file) as fp:
+        history = json.load(fp)
+    history[0]["timings"] = {stage: 0.0 for stage in STAGES}
+    with open(history_file, "w") as fp:
+        json.dump(history, fp)
+    assert main(args + ["--compare"]) == 1
+    assert "Regressions since the run of" in capsys.readouterr().out
+    assert len(load_history(history_file)) == 1
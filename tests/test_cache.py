@@ -0,0 +1,112 @@
+import os
+import shutil
+
+from derp.application import Application
+from derp.cache import DEFAULT_CACHE_DIR, ResultCache
+from derp.main import main
+
+dirname = os.path.dirname(__file__)
+test_package = os.path.join(dirname, "resources/test_package")
+
+
+def _copy_package(tmp_path) -> str:
+    target = str(tmp_path / "package")
+    shutil.copytree(test_package, target)
+    return target
+
+
+def test_cache_hits(tmp_path):
+    """A second run should answer every module from the cache, with identical results."""
+    target = _copy_package(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+    first = Application(target, "1.0.0", cache_dir=cache_dir)
+    first.run()
+    assert first.cache.hits == 0
+    assert first.cache.misses == 3
+
+    second = Application(target, "1.0.0", cache_dir=cache_dir)
+    second.run()
+    assert second.cache.hits == 3
+    assert second.failures == first.failures
+
+
+def test_cache_independent_of_version(tmp_path):
+    """Cached entries store raw deprecations, so they are valid for any current version."""
+    target = _copy_package(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+    Application(target, "1.0.0", cache_dir=cache_dir).run()
+
+    app = Application(target, "0.1", cache_dir=cache_dir)
+    app.run()
+    assert app.cache.hits == 3
+    uncached = Application(target, "0.1")
+    uncached.run()
+    assert app.failures == uncached.failures
+
+
+def test_cache_depends_on_engine(tmp_path):
+    """Entries are only used by scans with the engine that wrote them."""
+    target = _copy_package(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+    hits = []
+    for engine in ("tokenize", "tokenize", "ast", "ast", "tokenize"):
+        app = Application(target, "1.0.0", cache_dir=cache_dir, engine=engine)
+        app.run()
+        hits.append(app.cache.hits)
+    assert hits == [0, 3, 0, 3, 0]
+
+
+def test_cache_invalidation(tmp_path):
+    """A modified module is parsed again, but a touched module with the same content is not."""
+    target = _copy_package(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+    Application(target, "1.0.0", cache_dir=cache_dir).run()
+
+    module = os.path.join(target, "test_module.py")
+    stat = os.stat(module)
+    os.utime(module, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    touched = Application(target, "1.0.0", cache_dir=cache_dir)
+    touched.run()
+    assert touched.cache.hits == 3
+
+    with open(module, "a") as fp:
+        fp.write("\n\n@deprecated()\ndef new_function():\n    pass\n")
+    modified = Application(target, "1.0.0", cache_dir=cache_dir)
+    modified.run()
+    assert modified.cache.hits == 2
+    assert len(modified.failures[module]) == 5
+
+
+def test_cache_eviction(tmp_path):
+    """The least recently used entries are evicted when the cache is full."""
+    target = _copy_package(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+    Application(target, "1.0.0", cache_dir=cache_dir).run()
+
+    cache = ResultCache(cache_dir, max_entries=1)
+    assert len(cache.entries) == 3
+    module = os.path.join(target, "test_module.py")
+    cache._now += 1
+    assert cache.get(module) is not None
+    cache.save()
+    assert list(ResultCache(cache_dir).entries) == [module]
+
+
+def test_cache_is_opt_in(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    target = _copy_package(tmp_path)
+    assert main([target, "1.0.0"]) == 1
+    assert not os.path.exists(DEFAULT_CACHE_DIR)
+    assert main([target, "1.0.0", "--cache"]) == 1
+    assert os.path.isdir(DEFAULT_CACHE_DIR)
+
+
+def test_unwritable_cache(tmp_path, capsys):
+    """A cache that cannot be written doesn't fail the scan."""
+    not_a_directory = tmp_path / "notadir"
+    not_a_directory.write_text("")
+    target = _copy_package(tmp_path)
+    assert main([target, "1.0.0", "--cache-dir", str(not_a_directory / "cache")]) == 1
+    captured = capsys.readouterr()
+    assert "cube" in captured.out
+    assert "Could not write the cache" in captured.err
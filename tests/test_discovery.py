@@ -0,0 +1,69 @@
+import os
+
+from derp.application import Application
+from derp.discovery import iter_python_files
+
+
+def _touch(root, *relative_paths):
+    for relative_path in relative_paths:
+        path = os.path.join(str(root), relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as fp:
+            fp.write("")
+
+
+def _found(root, **kwargs):
+    root = str(root)
+    return [os.path.relpath(path, root).replace(os.sep, "/")
+            for path in iter_python_files(root, **kwargs)]
+
+
+def test_default_excludes(tmp_path):
+    """Version control, caches, build output and virtual environments are pruned."""
+    _touch(tmp_path, "a.py", "notes.txt", "pkg/b.py", ".git/hooks/c.py", "build/lib/d.py",
+           "__pycache__/e.py", "pkg.egg-info/f.py", "env/pyvenv.cfg", "env/lib/g.py")
+    assert _found(tmp_path) == ["a.py", "pkg/b.py"]
+    assert len(_found(tmp_path, default_excludes=False)) == 7
+
+
+def test_exclude_patterns(tmp_path):
+    """Patterns without a slash match names, patterns with a slash match relative paths."""
+    _touch(tmp_path, "a.py", "a_pb2.py", "pkg/b.py", "pkg/gen/c.py", "other/gen/d.py")
+    assert _found(tmp_path, exclude=["*_pb2.py"]) == \
+        ["a.py", "other/gen/d.py", "pkg/b.py", "pkg/gen/c.py"]
+    assert _found(tmp_path, exclude=["pkg/gen"]) == ["a.py", "a_pb2.py", "other/gen/d.py",
+                                                     "pkg/b.py"]
+    assert _found(tmp_path, exclude=["gen"]) == ["a.py", "a_pb2.py", "pkg/b.py"]
+
+
+def test_gitignore(tmp_path):
+    """.gitignore files in the target and its parents are honoured when requested."""
+    os.makedirs(str(tmp_path / ".git"))
+    (tmp_path / ".gitignore").write_text("# generated\n*_gen.py\n/target/scratch/\n")
+    target = tmp_path / "target"
+    _touch(target, "a.py", "a_gen.py", "scratch/b.py", "sub/scratch/c.py", "sub/d.py",
+           "sub/keep_gen.py")
+    (target / "sub" / ".gitignore").write_text("d.py\n!keep_gen.py\n")
+
+    assert len(_found(target)) == 6
+    assert _found(target, gitignore=True) == ["a.py", "sub/keep_gen.py", "sub/scratch/c.py"]
+
+
+def test_discovery_is_lazy(tmp_path):
+    """The first module is yielded before later directories are listed."""
+    _touch(tmp_path, "a/x.py", "b/y.py")
+    paths = iter_python_files(str(tmp_path))
+    assert next(paths).endswith("x.py")
+    os.remove(str(tmp_path / "b" / "y.py"))
+    assert list(paths) == []
+
+
+def test_application_exclude(tmp_path):
+    _touch(tmp_path, "a.py", "b.py")
+    app = Application(str(tmp_path), "1.0", exclude=["b.py"])
+    app.run()
+    assert [os.path.basename(path) for path in app.file_paths] == ["a.py"]
+
+    app = Application(str(tmp_path), "1.0", exclude=["*.py"])
+    app.run()
+    assert app.catastrophic_failure
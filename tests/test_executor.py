@@ -0,0 +1,39 @@
+import itertools
+
+import pytest
+
+from derp import executor
+from derp.executor import map_files, resolve_jobs
+
+
+def test_resolve_jobs():
+    assert resolve_jobs(None) == 1
+    assert resolve_jobs("3") == 3
+    assert resolve_jobs("auto") >= 1
+    with pytest.raises(ValueError):
+        resolve_jobs(0)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_map_files_in_order(jobs):
+    paths = [f"module_{index}.py" for index in range(50)]
+    assert list(map_files(len, paths, jobs)) == [len(path) for path in paths]
+    assert list(map_files(len, iter(paths), jobs)) == [len(path) for path in paths]
+
+
+def test_map_files_is_lazy():
+    """A lazy input is consumed a bounded number of chunks ahead of the results."""
+    consumed = []
+
+    def paths():
+        for index in itertools.count():
+            consumed.append(index)
+            yield str(index)
+
+    results = map_files(len, paths(), 2)
+    assert next(results) == 1
+    # The input is endless, so it must not have been read to the end
+    window = 2 * executor.CHUNKS_IN_FLIGHT_PER_WORKER * executor.DEFAULT_CHUNK_SIZE
+    assert len(consumed) <= window + executor.DEFAULT_CHUNK_SIZE
+    assert list(itertools.islice(results, 99)) == [len(str(index)) for index in range(1, 100)]
+    results.close()
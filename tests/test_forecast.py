@@ -0,0 +1,40 @@
+import os
+
+from derp.forecast import ForecastApplication
+from derp.main import main
+from derp.version_number import VersionNumber
+
+dirname = os.path.dirname(__file__)
+target = os.path.join(dirname, "resources/test_package")
+
+
+def test_forecast_index():
+    """Expired deprecations are found by removal version, for any number of versions."""
+    app = ForecastApplication(target, ["2.0", "0.5", "1.0.0"])
+    app.run()
+    assert not app.catastrophic_failure
+    assert [version.version for version in app.target_versions] == ["0.5", "1.0.0", "2.0"]
+    assert len(app.index) == 5
+
+    def expired(version: str):
+        return [entry.deprecation.name for entry in app.index.expired_at(VersionNumber(version))]
+
+    assert expired("0.5") == []
+    assert expired("0.99") == ["_old_display"]
+    assert expired("1.0.0") == ["_old_display", "OlderDeprecatedClass"]
+    assert expired("3") == ["_old_display", "OlderDeprecatedClass", "NewerDeprecatedClass"]
+    # missing and unparseable removal versions are never scheduled
+    assert sorted(entry.deprecation.name for entry in app.index.unscheduled) == \
+        ["cube", "quartic"]
+    assert app.exit() == 0
+
+
+def test_forecast_command(capsys):
+    """The forecast command prints a section per version."""
+    assert main(["forecast", target, "1.0.0", "2.0", "--no-cache"]) == 0
+    out = capsys.readouterr().out
+    assert "At version 1.0.0, 2 of 5 deprecations have expired:" in out
+    assert "At version 2.0, 3 of 5 deprecations have expired:" in out
+    assert "2 deprecations have no parseable removal version:" in out
+
+    assert main(["forecast", target, "2.x", "--no-cache"]) == 1
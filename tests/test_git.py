@@ -0,0 +1,74 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from derp.application import Application
+
+dirname = os.path.dirname(__file__)
+test_package = os.path.join(dirname, "resources/test_package")
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+
+def _git(repo: str, *args: str):
+    subprocess.run(["git", "-c", "user.name=derp", "-c", "user.email=derp@example.com"]
+                   + list(args), cwd=repo, check=True, stdout=subprocess.DEVNULL)
+
+
+@pytest.fixture
+def repo(tmp_path) -> str:
+    """A throwaway git repository containing a copy of the test package."""
+    repo = str(tmp_path / "repo")
+    shutil.copytree(test_package, os.path.join(repo, "package"))
+    _git(repo, "init", "-q")
+    _git(repo, "add", ".")
+    _git(repo, "commit", "-q", "-m", "initial")
+    return repo
+
+
+def test_since_unchanged(repo):
+    """Nothing is scanned if nothing changed, and that is not a failure."""
+    app = Application(os.path.join(repo, "package"), "1.0.0", since="HEAD")
+    app.run()
+    assert app.file_paths == []
+    assert app.exit() == 0
+
+
+def test_since_changed_and_untracked(repo):
+    """Modified and untracked modules are scanned, whether or not they are staged."""
+    package = os.path.join(repo, "package")
+    with open(os.path.join(package, "test_module.py"), "a") as fp:
+        fp.write("\n# a change\n")
+    with open(os.path.join(package, "subdirectory", "new_module.py"), "w") as fp:
+        fp.write("x = 1\n")
+    app = Application(package, "1.0.0", since="HEAD")
+    app.run()
+    assert sorted(os.path.basename(path) for path in app.file_paths) == \
+        ["new_module.py", "test_module.py"]
+    assert len(app.failures) == 1
+
+    _git(repo, "add", ".")
+    _git(repo, "commit", "-q", "-m", "second")
+    app = Application(package, "1.0.0", since="HEAD~1")
+    app.run()
+    assert len(app.file_paths) == 2
+
+
+def test_since_version_file_changed(repo):
+    """A change to the version file means every module is scanned."""
+    package = os.path.join(repo, "package")
+    version_file = os.path.join(package, "__version__.py")
+    with open(version_file, "w") as fp:
+        fp.write('__version__ = "1.3.0"\n')
+    app = Application(package, version_file, since="HEAD")
+    app.run()
+    assert len(app.file_paths) == 3
+
+
+def test_since_unknown_ref(repo):
+    """An unknown ref is a catastrophic failure, not an empty scan."""
+    app = Application(os.path.join(repo, "package"), "1.0.0", since="no-such-ref")
+    app.run()
+    assert app.catastrophic_failure
@@ -0,0 +1,90 @@
+import io
+import os
+
+import pytest
+
+from derp.application import Application
+from derp.main import main
+
+dirname = os.path.dirname(__file__)
+target = os.path.join(dirname, "resources/test_package")
+module = os.path.join(target, "test_module.py")
+clean_module = os.path.join(target, "subdirectory/another_test_module.py")
+
+EXPIRED_SOURCE = b"@deprecated(deprecated_in='0.1', removed_in='0.2')\ndef f():\n    pass\n"
+
+
+def _stdin(monkeypatch, data: bytes):
+    monkeypatch.setattr("sys.stdin", io.TextIOWrapper(io.BytesIO(data)))
+
+
+def test_many_targets():
+    """Every target is scanned in one run, and files found twice are scanned once."""
+    app = Application([clean_module, target, module], "1.0.0")
+    app.run()
+    assert not app.catastrophic_failure
+    assert len(app.file_paths) == 3
+    assert app.file_paths[0] == clean_module
+    assert list(app.failures) == [module]
+
+
+def test_positional_targets(capsys):
+    assert main([clean_module, module, "1.0.0", "--no-cache"]) == 1
+    assert capsys.readouterr().out.startswith(f"{module}:")
+    assert main([clean_module, "1.0.0", "--no-cache"]) == 0
+    with pytest.raises(SystemExit):
+        main([module])
+
+
+def test_target_named_like_a_command(tmp_path, monkeypatch, capsys):
+    """A path is scanned even if it has the name of a command."""
+    (tmp_path / "stats").mkdir()
+    (tmp_path / "stats" / "old.py").write_bytes(EXPIRED_SOURCE)
+    monkeypatch.chdir(tmp_path)
+    assert main(["stats", "1.0", "--no-cache"]) == 1
+    assert "old.py" in capsys.readouterr().out
+    monkeypatch.chdir(target)
+    assert main(["stats", ".", "1.0", "--no-cache"]) == 0
+    assert capsys.readouterr().out.startswith("Deprecation debt at version 1.0")
+
+
+@pytest.mark.parametrize("separator", [b"\n", b"\0"])
+def test_files_from_stdin(separator, monkeypatch, capsys):
+    """Paths can be piped in, one per line or separated by NUL characters."""
+    _stdin(monkeypatch, separator.join([clean_module.encode(), module.encode(), b""]))
+    assert main(["1.0.0", "--files-from", "-", "--no-cache", "-v"]) == 1
+    out = capsys.readouterr()
+    assert out.out.startswith(f"{module}:")
+    assert "Scanned 2 files" in out.err
+
+    # No staged files, nothing to check
+    _stdin(monkeypatch, b"")
+    assert main(["1.0.0", "--files-from", "-", "--no-cache"]) == 0
+
+
+def test_files_from_file(tmp_path, capsys):
+    file_list = tmp_path / "files.txt"
+    file_list.write_text(f"{clean_module}\n")
+    assert main([module, "1.0.0", "--files-from", str(file_list), "--no-cache", "-v"]) == 1
+    assert "Scanned 2 files" in capsys.readouterr().err
+    assert main(["1.0.0", "--files-from", str(tmp_path / "missing.txt")]) == 1
+
+
+def test_stdin_filename(tmp_path, monkeypatch, capsys):
+    """Source piped on stdin is checked in place of the file, which need not exist."""
+    unsaved = str(tmp_path / "unsaved.py")
+    _stdin(monkeypatch, EXPIRED_SOURCE)
+    assert main(["1.0", "--stdin-filename", unsaved, "--no-cache"]) == 1
+    assert capsys.readouterr().out.splitlines() == [
+        f"{unsaved}:", "\tf: Current version, 1.0, exceeds expected removal version, 0.2"
+    ]
+
+    # The piped source replaces the file on disk
+    _stdin(monkeypatch, b"def cube():\n    pass\n")
+    assert main([target, "1.0.0", "--stdin-filename", module, "--cache-dir",
+                 str(tmp_path / "cache")]) == 0
+
+    with pytest.raises(SystemExit):
+        main(["1.0", "--stdin-filename", unsaved, "--files-from", "-"])
+    with pytest.raises(SystemExit):
+        main(["--stdin-filename", unsaved])
@@ -0,0 +1,92 @@
+import os
+import shutil
+
+import pytest
+
+from derp.inventory import IndexApplication, Inventory, version_key
+from derp.main import main
+
+dirname = os.path.dirname(__file__)
+test_package = os.path.join(dirname, "resources/test_package")
+
+
+@pytest.fixture
+def package(tmp_path) -> str:
+    target = str(tmp_path / "package")
+    shutil.copytree(test_package, target)
+    return target
+
+
+def test_version_key():
+    """Version keys sort like version numbers and ignore trailing zeros."""
+    assert version_key("1.2") == version_key("1.2.0")
+    assert version_key("1.9") < version_key("1.10") < version_key("1.10.1") < version_key("2")
+    assert version_key("1.x") is None
+    assert version_key(None) is None
+
+
+def test_incremental_index(package, tmp_path):
+    """Only changed modules are parsed again, and deleted modules are forgotten."""
+    database = str(tmp_path / "inventory.sqlite3")
+    app = IndexApplication(package, database)
+    app.run()
+    assert app.updated_files == 3
+    assert app.total_deprecations == 5
+
+    app = IndexApplication(package, database)
+    app.run()
+    assert app.updated_files == 0
+    assert app.total_deprecations == 5
+
+    with open(os.path.join(package, "test_module.py"), "a") as fp:
+        fp.write("\n\n@deprecated(deprecated_in='1.1', removed_in='3.0')\ndef new():\n    pass\n")
+    os.remove(os.path.join(package, "subdirectory", "another_test_module.py"))
+    app = IndexApplication(package, database)
+    app.run()
+    assert app.updated_files == 1
+    assert app.removed_files == 1
+    assert app.total_deprecations == 6
+
+
+def test_broken_symlink(package, tmp_path, capsys):
+    """A module that cannot be read is reported, and the rest of the package is indexed."""
+    database = str(tmp_path / "inventory.sqlite3")
+    os.symlink(os.path.join(package, "missing.py"), os.path.join(package, "dangling.py"))
+    assert main(["index", package, "--db", database]) == 1
+    captured = capsys.readouterr()
+    assert "(3 updated, 0 removed)" in captured.out
+    assert "dangling.py: The module could not be checked: FileNotFoundError" in captured.err
+    inventory = Inventory(database)
+    dangling = os.path.join(package, "dangling.py")
+    assert inventory.stale_files([dangling]) == [dangling]
+    inventory.close()
+
+
+def test_queries(package, tmp_path):
+    """Queries filter on versions, paths and detectors."""
+    database = str(tmp_path / "inventory.sqlite3")
+    IndexApplication(package, database).run()
+    inventory = Inventory(database)
+
+    def names(**filters):
+        return [row["qualname"] for row in inventory.query(**filters)]
+
+    assert names(removed_by="1.0") == ["OlderDeprecatedClass",
+                                       "LiveClass.display.<locals>._old_display"]
+    assert names(deprecated_before="1.0") == ["OlderDeprecatedClass", "LiveClass.cube",
+                                              "LiveClass.display.<locals>._old_display"]
+    assert names(missing_removed_in=True) == ["LiveClass.quartic"]
+    assert len(names(path=package, detector="PythonDeprecation")) == 5
+    assert names(path=os.path.join(package, "subdirectory")) == []
+    with pytest.raises(ValueError):
+        inventory.query(removed_by="1.x")
+    inventory.close()
+
+
+def test_query_command(package, tmp_path, capsys):
+    database = str(tmp_path / "inventory.sqlite3")
+    assert main(["index", package, "--db", database, "--no-cache"]) == 0
+    capsys.readouterr()
+    assert main(["query", "--db", database, "--removed-by", "2.0", "--count"]) == 0
+    assert capsys.readouterr().out == "3\n"
+    assert main(["query", "--db", database, "--removed-by", "two"]) == 1
@@ -0,0 +1,112 @@
+import json
+import os
+
+import pytest
+
+from derp.application import Application
+from derp.cache import ResultCache
+from derp.finding import UNPARSEABLE
+from derp.main import main
+from derp.walker import parse_module, scan_file
+
+EXPIRED = "@deprecated(deprecated_in='0.1', removed_in='0.2')\ndef f():\n    pass\n"
+PYTHON2 = "from deprecation import deprecated\n\n" \
+          "@deprecated(deprecated_in='0.1', removed_in='0.2')\ndef f():\n    print 'hello'\n"
+
+
+@pytest.fixture
+def package(tmp_path):
+    package = tmp_path / "package"
+    package.mkdir()
+    (package / "a_expired.py").write_text(EXPIRED)
+    (package / "b_legacy.py").write_text(PYTHON2)
+    (package / "c_expired.py").write_text(EXPIRED)
+    return package
+
+
+def test_coding_cookie(tmp_path):
+    """Modules are decoded as declared, whatever the locale."""
+    path = tmp_path / "latin.py"
+    path.write_bytes(b"# -*- coding: latin-1 -*-\n"
+                     b"@deprecated(deprecated_in='0.1', removed_in='0.2')\n"
+                     b"def caf\xe9():\n    pass\n")
+    assert parse_module(str(path)).body[0].name == "café"
+    assert [deprecation.qualname for deprecation in scan_file(str(path))] == ["café"]
+
+
+@pytest.mark.parametrize("jobs", [None, 2])
+def test_unparseable_module(package, jobs):
+    """A module that cannot be parsed is a finding of its own, and the scan goes on."""
+    app = Application(str(package), "1.0", jobs=jobs)
+    app.run()
+    assert not app.catastrophic_failure
+    assert app.failed_files == 3
+    legacy = str(package / "b_legacy.py")
+    finding, = app.failures[legacy]
+    assert finding.reason == UNPARSEABLE
+    assert finding.qualname == "<module>"
+    assert finding.line == 5
+    assert finding.detail.startswith("SyntaxError: ")
+    assert finding.message.startswith("The module could not be checked: SyntaxError")
+    assert app.exit() == 1
+
+
+def test_engine_fallback(package):
+    """With the auto engine, a module that cannot be parsed is checked from its tokens."""
+    app = Application(str(package), "1.0", engine="auto")
+    app.run()
+    finding, = app.failures[str(package / "b_legacy.py")]
+    assert finding.reason != UNPARSEABLE
+    assert finding.qualname == "f"
+
+
+def test_undecodable_module(package):
+    source = b"@deprecated(deprecated_in='0.1', removed_in='0.2')\ndef f():\n    '\xff'\n"
+    app = Application(str(package), "1.0", sources={str(package / "d.py"): source})
+    app.run()
+    finding, = app.failures[str(package / "d.py")]
+    assert finding.reason == UNPARSEABLE
+
+
+@pytest.mark.parametrize("jobs", [None, 2])
+def test_unreadable_module(package, jobs, capsys):
+    """Modules that cannot be read are isolated, also when they are read ahead."""
+    os.symlink(str(package / "missing.py"), str(package / "dangling.py"))
+    app = Application(str(package), "1.0", jobs=jobs, readers=2)
+    app.run()
+    finding, = app.failures[str(package / "dangling.py")]
+    assert finding.reason == UNPARSEABLE
+    assert finding.detail.startswith("FileNotFoundError")
+    assert app.failed_files == 4
+    capsys.readouterr()
+    assert main(["usages", str(package), "--readers", "2", "--no-cache"]) == 1
+    assert "dangling.py: The module could not be checked: FileNotFoundError" in \
+        capsys.readouterr().err
+
+
+def test_max_file_size(package, tmp_path, capsys):
+    """Modules over the size limit are reported rather than parsed, and never cached."""
+    cache_dir = str(tmp_path / "cache")
+    argv = [str(package), "1.0", "--format", "ndjson", "--cache-dir", cache_dir]
+    assert main(argv + ["--max-file-size", "60"]) == 1
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert {record["reason"] for record in records} == {UNPARSEABLE}
+    assert len(records) == 3
+    assert "larger than the limit of 60" in records[0]["detail"]
+    assert ResultCache(cache_dir).entries == dict()
+
+    assert main(argv) == 1
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [os.path.basename(record["path"]) for record in records if
+            record["reason"] == UNPARSEABLE] == ["b_legacy.py"]
+    assert len(ResultCache(cache_dir).entries) == 2
+    with pytest.raises(SystemExit):
+        main(argv + ["--max-file-size", "0"])
+
+
+def test_forecast_and_usages(package, capsys):
+    """Commands that use the deprecations themselves skip the module, and say so."""
+    assert main(["forecast", str(package), "1.0", "--no-cache"]) == 1
+    captured = capsys.readouterr()
+    assert "At version 1.0, 2 of 2 deprecations have expired" in captured.out
+    assert "b_legacy.py: The module could not be checked" in captured.err
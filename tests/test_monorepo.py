@@ -0,0 +1,117 @@
+import json
+import textwrap
+
+import pytest
+
+from derp.config import PackageConfig, find_config, read_config
+from derp.main import main
+from derp.monorepo import MonorepoApplication
+
+MODULE = textwrap.dedent('''
+    from deprecation import deprecated
+
+    @deprecated(deprecated_in="0.5", removed_in="1.0")
+    def expires_at_one():
+        pass
+
+    @deprecated(deprecated_in="0.5", removed_in="2.0")
+    def expires_at_two():
+        pass
+''')
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """A repository with two packages, at versions 1.0 and 2.0."""
+    for name, version in [("alpha", "1.0"), ("beta", "2.0")]:
+        package = tmp_path / "packages" / name
+        package.mkdir(parents=True)
+        (package / "__version__.py").write_text(f'__version__ = "{version}"\n')
+        (package / "module.py").write_text(MODULE)
+    return tmp_path
+
+
+PYPROJECT = textwrap.dedent('''
+    [tool.black]
+    line-length = 99
+
+    [[tool.derp.packages]]
+    target = "packages/alpha"
+    version = "packages/alpha/__version__.py"
+
+    [[tool.derp.packages]]
+    name = "beta"
+    target = "packages/beta"
+    version = "packages/beta/__version__.py"
+''')
+
+
+def test_read_config(repo):
+    (repo / "setup.cfg").write_text(textwrap.dedent('''
+        [derp]
+        packages =
+            packages/alpha packages/alpha/__version__.py
+            packages/beta 3.1
+    '''))
+    assert find_config(str(repo)) == str(repo / "setup.cfg")
+    assert read_config(str(repo / "setup.cfg")) == [
+        PackageConfig("packages/alpha", str(repo / "packages/alpha"),
+                      str(repo / "packages/alpha/__version__.py")),
+        PackageConfig("packages/beta", str(repo / "packages/beta"), "3.1"),
+    ]
+
+    # pyproject.toml takes precedence
+    (repo / "pyproject.toml").write_text(PYPROJECT)
+    assert find_config(str(repo)) == str(repo / "pyproject.toml")
+    assert [package.name for package in read_config(str(repo / "pyproject.toml"))] == \
+        ["packages/alpha", "beta"]
+
+    (repo / "pyproject.toml").write_text("[tool.derp]\npackages = [{target = 'x'}]\n")
+    with pytest.raises(ValueError):
+        read_config(str(repo / "pyproject.toml"))
+
+
+def test_packages_are_checked_against_their_own_versions(repo, capsys, monkeypatch):
+    (repo / "pyproject.toml").write_text(PYPROJECT)
+    monkeypatch.chdir(repo)
+    assert main(["--no-cache"]) == 1
+    out = capsys.readouterr().out.splitlines()
+    assert out[0] == "== packages/alpha =="
+    assert out[1].endswith("alpha/module.py:")
+    assert out[2].startswith("\texpires_at_one:")
+    assert out[3] == "== beta =="
+    assert out[4].endswith("beta/module.py:")
+    assert len(out) == 7
+
+    assert main(["--no-cache", "--format", "ndjson"]) == 1
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(record["package"], record["name"]) for record in records] == [
+        ("packages/alpha", "expires_at_one"),
+        ("beta", "expires_at_one"), ("beta", "expires_at_two"),
+    ]
+
+
+def test_overlapping_packages_and_broken_packages(repo, capsys):
+    packages = [
+        PackageConfig("everything", str(repo / "packages"), "0.1"),
+        PackageConfig("broken", str(repo / "packages/beta"), "not a version"),
+        PackageConfig("alpha", str(repo / "packages/alpha"), "1.0"),
+    ]
+    app = MonorepoApplication(packages, verbose=True)
+    app.run()
+    assert not app.catastrophic_failure
+    # Every file is scanned once, even though alpha's files belong to two packages
+    assert len(app.file_paths) == 4
+    assert app.parsed_files == 2
+    assert app.package_failed_files == {"everything": 0, "broken": 0, "alpha": 1}
+    assert list(app.broken_packages) == ["broken"]
+    assert app.exit() == 1
+    out = capsys.readouterr()
+    assert "== alpha ==" in out.out
+    assert "alpha: 2 files, 1 with invalid deprecations" in out.err
+
+
+def test_missing_config(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(SystemExit):
+        main([])
@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+
+import pytest
+
+from derp.application import Application
+from derp.prefetch import Prefetcher
+
+dirname = os.path.dirname(__file__)
+
+
+@pytest.fixture
+def files(tmp_path):
+    paths = []
+    for index in range(50):
+        path = tmp_path / f"module_{index}.py"
+        path.write_text(f"x = {index}\n")
+        paths.append(str(path))
+    return paths
+
+
+def test_prefetch_keeps_order(files):
+    """Files are yielded in order with their contents, whatever order the readers finish in."""
+    prefetcher = Prefetcher(readers=8, depth=4)
+    prefetched = list(prefetcher.prefetch(iter(files)))
+    assert [path for path, _ in prefetched] == files
+    expected = [f"x = {index}\n".encode() for index in range(50)]
+    assert [source for _, source in prefetched] == expected
+    assert prefetcher.bytes_read == sum(len(source) for _, source in prefetched)
+
+
+def test_prefetch_backpressure(files):
+    """A slow consumer makes the readers wait, rather than letting the queue grow."""
+    depth = 2
+    produced = []
+
+    def paths():
+        for path in files[:10]:
+            produced.append(path)
+            yield path
+
+    prefetcher = Prefetcher(readers=2, depth=depth)
+    for index, _ in enumerate(prefetcher.prefetch(paths())):
+        time.sleep(0.01)
+        # At most the queue, plus the path being put on it, can be ahead of the consumer
+        assert len(produced) <= index + 1 + depth + 1
+    assert prefetcher.reader_stall > 0
+
+
+def test_prefetch_errors(files, tmp_path):
+    """Errors surface in the consumer, after every earlier file."""
+    def paths():
+        yield files[0]
+        raise ValueError("discovery failed")
+
+    prefetched = Prefetcher().prefetch(paths())
+    assert next(prefetched)[0] == files[0]
+    with pytest.raises(ValueError, match="discovery failed"):
+        next(prefetched)
+
+    # A file that cannot be read is left for the consumer to read, and fail on
+    missing = str(tmp_path / "missing.py")
+    prefetched = Prefetcher().prefetch([files[0], missing])
+    next(prefetched)
+    assert list(prefetched) == [(missing, None)]
+
+    with pytest.raises(ValueError):
+        Prefetcher(readers=0)
+
+
+def test_prefetch_stops_early(files):
+    """Abandoning the iterator stops the reader threads."""
+    n_threads = threading.active_count()
+    prefetched = Prefetcher(readers=4, depth=1).prefetch(iter(files))
+    next(prefetched)
+    prefetched.close()
+    assert threading.active_count() == n_threads
+
+
+@pytest.mark.parametrize("jobs", [None, 2])
+def test_application_with_readers(jobs):
+    """Reading ahead doesn't change the results."""
+    target = os.path.join(dirname, "resources/test_package")
+    app = Application(target, "1.0.0")
+    app.run()
+    prefetched = Application(target, "1.0.0", jobs=jobs, readers=2, prefetch_depth=1,
+                             verbose=True)
+    prefetched.run()
+    assert not prefetched.catastrophic_failure
+    assert list(prefetched.failures.items()) == list(app.failures.items())
+    assert prefetched.parsed_files == app.parsed_files
+    assert "the parser waited" in prefetched.summary()
@@ -0,0 +1,42 @@
+import os
+
+from derp import DEPRECATION_TYPE_LIST
+from derp.application import Application
+from derp.prefilter import compile_prefilter, may_contain_deprecation
+
+dirname = os.path.dirname(__file__)
+
+
+def test_may_contain_deprecation(tmp_path):
+    """Only modules that mention a registered decorator name are candidates for parsing."""
+    pattern = compile_prefilter(DEPRECATION_TYPE_LIST)
+    candidate = tmp_path / "candidate.py"
+    candidate.write_text("@deprecated()\ndef f():\n    pass\n")
+    plain = tmp_path / "plain.py"
+    plain.write_text("def f():\n    pass\n")
+    empty = tmp_path / "empty.py"
+    empty.write_text("")
+
+    assert may_contain_deprecation(str(candidate), pattern)
+    assert not may_contain_deprecation(str(plain), pattern)
+    assert not may_contain_deprecation(str(empty), pattern)
+    # Without a pattern nothing can be ruled out
+    assert may_contain_deprecation(str(plain), None)
+
+
+def test_unnamed_deprecation_type_disables_prefilter():
+    """A deprecation type that doesn't list its names means no module can be skipped."""
+    class UnnamedDeprecation:
+        decorator_names = ()
+
+    assert compile_prefilter(DEPRECATION_TYPE_LIST + [UnnamedDeprecation]) is None
+
+
+def test_application_skips_files():
+    """Modules without deprecations are skipped, and the results are unchanged."""
+    target = os.path.join(dirname, "resources/test_package")
+    app = Application(target, "1.0.0")
+    app.run()
+    assert app.prefilter_skipped == 2
+    assert len(app.failures) == 1
+    assert "2 skipped by prefilter" in app.summary()
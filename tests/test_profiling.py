@@ -0,0 +1,70 @@
+import json
+import os
+
+from derp.application import Application
+from derp.main import main
+from derp.profiling import STAGES, FileProfile, Profile
+
+dirname = os.path.dirname(__file__)
+target = os.path.join(dirname, "resources/test_package")
+
+
+def test_profile_json(tmp_path, capsys):
+    """Every stage is timed, and the slowest files are listed with their sizes."""
+    app = Application(target, "1.0.0", cache_dir=str(tmp_path), profile="json", profile_top=2)
+    app.run()
+    assert not app.catastrophic_failure
+    profile = json.loads(capsys.readouterr().err)
+    assert set(profile["stages"]) == set(STAGES)
+    assert profile["total"] > 0
+    assert profile["rates"] == {"cache_hit_rate": 0.0, "prefilter_skip_rate": 2 / 3}
+    slowest = profile["slowest_files"]
+    assert len(slowest) == 2
+    assert slowest[0]["seconds"] >= slowest[1]["seconds"]
+    parsed = [f for f in slowest if f["path"].endswith("test_module.py")]
+    assert parsed and parsed[0]["nodes"] > 0
+    assert parsed[0]["size"] == os.path.getsize(os.path.join(target, "test_module.py"))
+
+    # A second run is answered from the cache, so no file is profiled
+    app = Application(target, "1.0.0", cache_dir=str(tmp_path), profile="json")
+    app.run()
+    profile = json.loads(capsys.readouterr().err)
+    assert profile["rates"]["cache_hit_rate"] == 1.0
+    assert profile["slowest_files"] == []
+
+
+def test_no_profile_by_default(capsys):
+    app = Application(target, "1.0.0")
+    app.run()
+    assert app.profile is None
+    assert capsys.readouterr().err == ""
+
+
+def test_slowest_files():
+    profile = Profile(top=2)
+    for i, seconds in enumerate([0.3, 0.1, 0.5, 0.2]):
+        profile.add_file(FileProfile(f"file{i}.py", 100, 10, 0.0, 0.0, seconds, 0.0))
+    assert [p.path for p in profile.slowest_files()] == ["file2.py", "file0.py"]
+    assert profile.stages["parse"] == 0.3 + 0.1 + 0.5 + 0.2
+    assert profile.profiled_files == 4
+
+
+def test_profile_command(capsys):
+    assert main([target, "1.0.0", "--no-cache", "--profile", "--profile-top", "1"]) == 1
+    err = capsys.readouterr().err
+    assert "Profile of a" in err
+    assert err.count(" nodes  ") == 1
+    assert "prefilter skip rate: 66.7%" in err
+
+
+def test_profile_matches_scan(tmp_path):
+    """Profiling times the ordinary scan, so it finds the same things, errors included."""
+    (tmp_path / "legacy.py").write_text("@deprecated()\ndef f():\n    print 'hello'\n")
+    (tmp_path / "module.py").write_bytes(open(os.path.join(target, "test_module.py"), "rb").read())
+    for engine in ("ast", "tokenize", "auto"):
+        plain = Application(str(tmp_path), "1.0.0", engine=engine)
+        plain.run()
+        profiled = Application(str(tmp_path), "1.0.0", engine=engine, profile="json")
+        profiled.run()
+        assert profiled.failures == plain.failures
+        assert profiled.profile.profiled_files == 2
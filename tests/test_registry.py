@@ -0,0 +1,125 @@
+import ast
+import textwrap
+
+from derp import DEPRECATION_TYPE_LIST
+from derp.deprecation import Deprecation, DeprecatedLibraryDeprecation, Pep702Deprecation, \
+    PythonDeprecation
+from derp.registry import DetectorRegistry, decorator_name, get_registry
+from derp.version_number import VersionNumber
+from derp.walker import _extract_deprecations
+
+
+def _decorator(source: str) -> ast.AST:
+    return ast.parse(f"@{source}\ndef f(): pass").body[0].decorator_list[0]
+
+
+def _detect(source: str):
+    return get_registry(DEPRECATION_TYPE_LIST).detect(_decorator(source))
+
+
+def test_decorator_name():
+    assert decorator_name(_decorator("deprecated()")) == ("deprecated", None)
+    assert decorator_name(_decorator("deprecated.sphinx.deprecated")) == \
+        ("deprecated", "deprecated.sphinx")
+    assert decorator_name(_decorator("handlers[0]")) == (None, None)
+
+
+def test_deprecation_library():
+    deprecation = _detect("deprecation.deprecated(deprecated_in='1.0', removed_in='2.0')")
+    assert isinstance(deprecation, PythonDeprecation)
+    assert deprecation.to_dict() == {"deprecated_in": "1.0", "removed_in": "2.0"}
+    # Positional arguments, through a module alias
+    deprecation = _detect("dep.deprecated('1.0', '2.0', details='use g')")
+    assert isinstance(deprecation, PythonDeprecation)
+    assert deprecation.removed_in == "2.0"
+    assert isinstance(_detect("deprecated()"), PythonDeprecation)
+
+
+def test_pep702():
+    deprecation = _detect("warnings.deprecated('Deprecated since 1.2; removed in 3.0')")
+    assert isinstance(deprecation, Pep702Deprecation)
+    assert deprecation.to_dict() == {"deprecated_in": "1.2", "removed_in": "3.0"}
+    assert deprecation.check_error(VersionNumber("2.9")) is None
+    assert "exceeds" in deprecation.check_error(VersionNumber("3.0"))
+
+    deprecation = _detect("deprecated('Use g instead', category=FutureWarning)")
+    assert isinstance(deprecation, Pep702Deprecation)
+    assert "must name a removal version" in deprecation.check_error(VersionNumber("1.0"))
+
+
+def test_deprecated_library():
+    deprecation = _detect("deprecated(version='1.4', reason='Will be removed in version 2.1')")
+    assert isinstance(deprecation, DeprecatedLibraryDeprecation)
+    assert deprecation.to_dict() == {"deprecated_in": "1.4", "removed_in": "2.1"}
+    assert isinstance(_detect("deprecated"), DeprecatedLibraryDeprecation)
+    assert isinstance(_detect("deprecated.sphinx.deprecated(version='1.4')"),
+                      DeprecatedLibraryDeprecation)
+    # A module that belongs to another library rules the others out
+    assert _detect("typing_extensions.deprecated(reason='x')") is None
+
+
+def test_other_decorators_are_not_parsed():
+    """Decorators with an unregistered name are rejected without consulting any type."""
+    calls = []
+
+    class Counting(PythonDeprecation):
+        @classmethod
+        def from_decorator(cls, decorator):
+            calls.append(decorator)
+            return super().from_decorator(decorator)
+
+    registry = DetectorRegistry([Counting])
+    for source in ["property", "staticmethod", "pytest.fixture(scope='module')", "cache"]:
+        assert registry.detect(_decorator(source)) is None
+    assert calls == []
+    assert registry.detect(_decorator("deprecated()")) is not None
+    assert len(calls) == 1
+
+
+def test_types_without_from_decorator():
+    """Types that only signal a mismatch by raising ValueError from __init__ still work."""
+    class Legacy(Deprecation):
+        def __init__(self, decorator):
+            if not isinstance(decorator, ast.Name) or decorator.id != "old":
+                raise ValueError("not mine")
+
+        def check_error(self, current_version):
+            return None
+
+        def to_dict(self):
+            return {}
+
+        @classmethod
+        def from_dict(cls, data):
+            return cls.__new__(cls)
+
+    registry = DetectorRegistry([Legacy])
+    assert isinstance(registry.detect(_decorator("old")), Legacy)
+    assert registry.detect(_decorator("property")) is None
+
+
+def test_walker_finds_every_kind():
+    source = textwrap.dedent('''
+        import deprecation
+        import warnings
+
+        class Client:
+            @deprecation.deprecated(deprecated_in="1.0", removed_in="2.0")
+            def old(self):
+                pass
+
+            @warnings.deprecated("Removed in 3.0")
+            def older(self):
+                pass
+
+            @property
+            @deprecated
+            def oldest(self):
+                pass
+    ''')
+    found = {d.qualname: type(d.deprecation) for d in _extract_deprecations(ast.parse(source))}
+    assert found == {
+        "Client.old": PythonDeprecation,
+        "Client.older": Pep702Deprecation,
+        "Client.oldest": DeprecatedLibraryDeprecation,
+    }
@@ -0,0 +1,45 @@
+import json
+import os
+
+from derp.application import Application
+from derp.main import main
+
+dirname = os.path.dirname(__file__)
+target = os.path.join(dirname, "resources/test_package")
+
+
+def test_text_output(capsys):
+    """Text output lists each failed file, followed by its indented errors."""
+    assert main([target, "1.0.0", "--no-cache"]) == 1
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 5
+    assert lines[0].endswith("test_package/test_module.py:")
+    assert lines[1].startswith("\tOlderDeprecatedClass: ")
+
+
+def test_ndjson_output(capsys):
+    """NDJSON output has one structured record per invalid deprecation."""
+    assert main([target, "1.0.0", "--no-cache", "--format", "ndjson"]) == 1
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [record["name"] for record in records] == \
+        ["OlderDeprecatedClass", "cube", "quartic", "_old_display"]
+    assert records[0]["path"].endswith("test_package/test_module.py")
+    assert records[0]["deprecated_in"] == "0.12.3"
+    assert records[0]["removed_in"] == "1.0.0"
+    assert records[2]["removed_in"] is None
+    assert [record["reason"] for record in records] == \
+        ["expired", "unparseable-version", "missing-versions", "expired"]
+
+
+def test_streaming_without_recording(capsys):
+    """Failures are reported even when they are not kept in memory."""
+    app = Application(target, "1.0.0", record_failures=False)
+    app.run()
+    assert app.failures == {}
+    assert app.failed_files == 1
+    assert app.exit() == 1
+    assert "test_module.py:" in capsys.readouterr().out
+
+    app = Application(target, "1.0.0", output_format="xml")
+    app.run()
+    assert app.catastrophic_failure
@@ -0,0 +1,117 @@
+import os
+import zipfile
+
+import pytest
+
+from derp import DEPRECATION_TYPE_LIST
+from derp.application import Application
+from derp.cache import ResultCache
+from derp.main import main
+from derp.prefilter import compile_prefilter
+from derp.schedule import EXIT_INCOMPLETE, KNOWN_FINDINGS, LIKELY, UNLIKELY, file_tier, schedule
+from derp.version_number import VersionNumber
+
+EXPIRED = "@deprecated(deprecated_in='0.1', removed_in='0.2')\ndef f():\n    pass\n"
+VALID = "@deprecated(deprecated_in='0.1', removed_in='9.0')\ndef f():\n    pass\n"
+PLAIN = "def f():\n    pass\n"
+
+
+def _write(path, source, mtime):
+    path.write_text(source)
+    os.utime(str(path), (mtime, mtime))
+    return str(path)
+
+
+@pytest.fixture
+def package(tmp_path):
+    package = tmp_path / "package"
+    package.mkdir()
+    return package
+
+
+def test_schedule(package, tmp_path):
+    """Known findings come first, then likely files, most recently modified first."""
+    version = VersionNumber("1.0")
+    cache = ResultCache(str(tmp_path / "cache"))
+    cached_expired = _write(package / "a.py", EXPIRED, 1000)
+    cached_valid = _write(package / "b.py", VALID, 5000)
+    plain = _write(package / "c.py", PLAIN, 9000)
+    old_change = _write(package / "d.py", VALID, 2000)
+    new_change = _write(package / "e.py", EXPIRED, 3000)
+    for path in (cached_expired, cached_valid):
+        app = Application(path, "1.0", cache_dir=cache.cache_dir)
+        app.run()
+    cache = ResultCache(cache.cache_dir)
+
+    assert file_tier(cached_expired, version, cache) == KNOWN_FINDINGS
+    assert file_tier(cached_valid, version, cache) == UNLIKELY
+    assert file_tier(new_change, version, cache) == LIKELY
+    paths = [cached_valid, plain, old_change, new_change, cached_expired]
+    pattern = compile_prefilter(DEPRECATION_TYPE_LIST)
+    assert schedule(paths, version, cache, pattern) == \
+        [cached_expired, new_change, old_change, plain, cached_valid]
+    # Peeking doesn't count as a lookup
+    assert cache.hits == cache.misses == 0
+
+
+@pytest.mark.parametrize("jobs", [None, 2])
+def test_fail_fast(package, jobs, capsys):
+    """The scan stops at the first file with findings, which is scheduled first."""
+    for index in range(40):
+        _write(package / f"module_{index:02}.py", PLAIN, 1000)
+    last = _write(package / "zz_expired.py", EXPIRED, 1000)
+    _write(package / "zz_also_expired.py", EXPIRED, 500)
+    app = Application(str(package), "1.0", fail_fast=True, jobs=jobs)
+    app.run()
+    assert app.failed_files == 1
+    assert list(app.failures) == [last]
+    assert app.stopped_early == "fail-fast"
+    assert app.file_paths == [last]
+    assert len(app.unscanned) == 41
+    assert app.exit() == 1
+    assert "Stopped early (fail-fast): scanned 1 of 42 files" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("jobs", [None, 2])
+def test_fail_fast_archive(tmp_path, jobs):
+    """Modules in an archive are scheduled from their contents, like those on disk."""
+    wheel = str(tmp_path / "my_app-1.0-py3-none-any.whl")
+    with zipfile.ZipFile(wheel, "w") as archive:
+        for index in range(20):
+            archive.writestr(f"my_app/module_{index:02}.py", PLAIN)
+        archive.writestr("my_app/zz_expired.py", EXPIRED)
+    app = Application(wheel, "1.0", fail_fast=True, jobs=jobs)
+    app.run()
+    expired = os.path.join(wheel, "my_app", "zz_expired.py")
+    assert list(app.failures) == [expired]
+    assert app.file_paths == [expired]
+    assert len(app.unscanned) == 20
+
+
+def test_time_budget(package, tmp_path, capsys):
+    """A scan that runs out of time reports what it missed, and exits with its own code."""
+    for index in range(5):
+        _write(package / f"module_{index}.py", VALID, 1000 + index)
+    cache_dir = str(tmp_path / "cache")
+    argv = [str(package), "1.0", "--cache-dir", cache_dir, "-v"]
+    assert main(argv + ["--time-budget", "1e-9"]) == EXIT_INCOMPLETE
+    err = capsys.readouterr().err
+    assert "Stopped early (time budget): scanned 1 of 5 files, 4 not scanned" in err
+    assert f"\t{package / 'module_0.py'}" in err
+    # What was scanned was cached
+    assert len(ResultCache(cache_dir).entries) == 1
+
+    assert main(argv + ["--time-budget", "60"]) == 0
+    assert "Stopped early" not in capsys.readouterr().err
+
+    _write(package / "module_9.py", EXPIRED, 900)
+    assert main(argv + ["--time-budget", "1e-9"]) == 1
+    assert "module_9.py:" in capsys.readouterr().out
+
+
+def test_budget_arguments(package):
+    _write(package / "module.py", PLAIN, 1000)
+    with pytest.raises(SystemExit):
+        main([str(package), "1.0", "--time-budget", "0"])
+    with pytest.raises(SystemExit):
+        main([str(package), "1.0", "--fail-fast", "--watch"])
@@ -0,0 +1,113 @@
+import io
+import os
+import socket
+import threading
+
+import pytest
+
+import derp_client
+from derp import cache
+from derp.main import main
+from derp.server import DerpServer
+
+dirname = os.path.dirname(__file__)
+target = os.path.join(dirname, "resources/test_package")
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"),
+                                reason="requires Unix domain sockets")
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """A server running on a thread, reachable by the client."""
+    monkeypatch.setattr(cache, "_shared_caches", None)
+    socket_path = str(tmp_path / "derp.sock")
+    monkeypatch.setenv("DERP_SOCKET", socket_path)
+    server = DerpServer(socket_path)
+    server.start()
+    thread = threading.Thread(target=server.serve)
+    thread.start()
+    yield server
+    derp_client.request({"stop": True}, socket_path)
+    thread.join()
+    assert not os.path.exists(socket_path)
+
+
+def test_client_matches_main(server, tmp_path, capsys):
+    """The client prints what derp would print, and returns the same exit code."""
+    cache_dir = str(tmp_path / "cache")
+    argv = [target, "1.0.0", "--cache-dir", cache_dir]
+    assert main(argv) == 1
+    expected = capsys.readouterr().out
+
+    assert derp_client.main(argv) == 1
+    assert capsys.readouterr().out == expected
+    assert derp_client.main(["--format", "xml"]) == 2
+    assert "invalid choice" in capsys.readouterr().err
+    assert derp_client.main(["serve"]) == 2
+    assert server.requests == 3
+
+
+def test_caches_stay_warm(server, tmp_path, capsys):
+    """Only the modules that changed since the previous request are parsed again."""
+    package = tmp_path / "package"
+    package.mkdir()
+    for index in range(3):
+        (package / f"module_{index}.py").write_text("@deprecated()\ndef f():\n    pass\n")
+    argv = [str(package), "1.0", "-v", "--cache-dir", str(tmp_path / "cache")]
+
+    assert derp_client.main(argv) == 1
+    assert "3 parsed, 0 from cache" in capsys.readouterr().err
+    (package / "module_0.py").write_text("def f():\n    pass\n")
+    assert derp_client.main(argv) == 1
+    assert "0 parsed, 2 from cache, 1 skipped" in capsys.readouterr().err
+    # Nothing is written to disk until the server stops
+    assert not (tmp_path / "cache").exists()
+
+
+def test_caches_stay_warm_without_cache_dir(server, tmp_path, monkeypatch, capsys):
+    """Without a cache directory, the server still keeps the results in memory."""
+    package = tmp_path / "package"
+    package.mkdir()
+    for index in range(3):
+        (package / f"module_{index}.py").write_text("@deprecated()\ndef f():\n    pass\n")
+    monkeypatch.chdir(tmp_path)
+    argv = [str(package), "1.0", "-v"]
+
+    assert derp_client.main(argv) == 1
+    assert "3 parsed, 0 from cache" in capsys.readouterr().err
+    assert derp_client.main(argv) == 1
+    assert "0 parsed, 3 from cache" in capsys.readouterr().err
+    assert derp_client.main(argv + ["--no-cache"]) == 1
+    assert "3 parsed, 0 from cache" in capsys.readouterr().err
+    assert not (tmp_path / ".derp_cache").exists() or \
+        os.listdir(str(tmp_path / ".derp_cache")) == []
+
+
+def test_stale_socket(tmp_path):
+    """A socket left behind by a server that died is replaced, a live one is not."""
+    socket_path = str(tmp_path / "derp.sock")
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(socket_path)
+    stale.close()
+    server = DerpServer(socket_path)
+    server.start()
+    with pytest.raises(ValueError):
+        DerpServer(socket_path).start()
+    server.serve(max_requests=0)
+
+
+def test_client_without_server(tmp_path, monkeypatch, capsys):
+    """Without a server, the client runs the command line itself."""
+    monkeypatch.setenv("DERP_SOCKET", str(tmp_path / "missing.sock"))
+    assert derp_client.main([target, "1.0.0", "--no-cache"]) == 1
+    assert "test_module.py:" in capsys.readouterr().out
+
+
+def test_client_forwards_stdin(server, tmp_path, monkeypatch, capsys):
+    """Command lines that read stdin get the client's stdin, not the server's."""
+    monkeypatch.setattr("sys.stdin", io.TextIOWrapper(io.BytesIO(
+        b"@deprecated(deprecated_in='0.1', removed_in='0.2')\ndef f():\n    pass\n"
+    )))
+    assert derp_client.main(["1.0", "--stdin-filename", "unsaved.py", "--no-cache"]) == 1
+    assert "exceeds expected removal version, 0.2" in capsys.readouterr().out
@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+from derp.main import main
+from derp.shard import parse_shard, shard_of
+
+EXPIRED = "@deprecated(deprecated_in='0.1', removed_in='0.2')\ndef f():\n    pass\n"
+VALID = "@deprecated(deprecated_in='0.1', removed_in='9.0')\ndef f():\n    pass\n"
+
+
+@pytest.fixture
+def package(tmp_path, monkeypatch):
+    """A package of modules, about half of which have expired, scanned from its parent."""
+    monkeypatch.chdir(tmp_path)
+    package = tmp_path / "package"
+    for index in range(20):
+        directory = package / f"sub_{index % 3}"
+        directory.mkdir(parents=True, exist_ok=True)
+        source = EXPIRED if index % 2 else VALID
+        (directory / f"module_{index}.py").write_text(source)
+    return "package"
+
+
+def _run_shards(count, package, capsys, extra=()):
+    partials = []
+    for index in range(1, count + 1):
+        partial = f"shard_{index}.json"
+        main([package, "1.0", "--no-cache", "--shard", f"{index}/{count}",
+              "--partial", partial, *extra])
+        partials.append(partial)
+    capsys.readouterr()
+    return partials
+
+
+@pytest.mark.parametrize("output_format", ["text", "ndjson"])
+@pytest.mark.parametrize("count", [1, 3, 7])
+def test_merge_matches_single_run(count, output_format, package, capsys):
+    """Merging every shard reproduces the report, summary and exit code of a single run."""
+    argv = ["--format", output_format, "-v"]
+    assert main([package, "1.0", "--no-cache", *argv]) == 1
+    expected = capsys.readouterr()
+
+    partials = _run_shards(count, package, capsys)
+    assert main(["merge", *reversed(partials), *argv]) == 1
+    merged = capsys.readouterr()
+    assert merged.out == expected.out
+    assert merged.err == expected.err
+
+
+def test_shards_partition_files(package, capsys):
+    """Every file is scanned by exactly one shard."""
+    partials = _run_shards(4, package, capsys)
+    files = [json.load(open(partial))["files"] for partial in partials]
+    assert sum(files) == 20
+    assert shard_of("package/sub_0/module_0.py", 4) == shard_of(
+        "package/sub_0/../sub_0/module_0.py", 4)
+
+
+def test_merge_passes(package, capsys):
+    partials = _run_shards(2, package, capsys)
+    assert main(["merge", *partials]) == 1
+    capsys.readouterr()
+    for index, partial in enumerate(partials, 1):
+        assert main([package, "0.1", "--no-cache", "--shard", f"{index}/2",
+                     "--partial", partial]) == 0
+    assert main(["merge", *partials]) == 0
+    assert capsys.readouterr().out == ""
+
+
+def test_incomplete_merge(package, capsys):
+    """Merging fails unless every shard appears exactly once."""
+    partials = _run_shards(3, package, capsys)
+    assert main(["merge", partials[0], partials[2]]) == 1
+    assert "missing shards 2/3" in capsys.readouterr().out
+    assert main(["merge", *partials, partials[1]]) == 1
+    assert "repeated shards 2/3" in capsys.readouterr().out
+    others = _run_shards(2, package, capsys)
+    assert main(["merge", *partials, others[0]]) == 1
+    assert "different scans" in capsys.readouterr().out
+    with open("not_partial.json", "w") as fp:
+        fp.write("[]")
+    assert main(["merge", "not_partial.json"]) == 1
+    assert "not a partial result" in capsys.readouterr().out
+
+
+def test_failed_shard(package, capsys):
+    """A shard that could not run fails the merge."""
+    partials = _run_shards(2, package, capsys)
+    main([package, "not a version", "--no-cache", "--shard", "2/2", "--partial", partials[1]])
+    assert main(["merge", *partials]) == 1
+    assert "not a version" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("text", ["2", "0/3", "4/3", "a/b", "1/0", "1/2/3"])
+def test_parse_shard_errors(text):
+    with pytest.raises(ValueError):
+        parse_shard(text)
+
+
+def test_shard_arguments(package, capsys):
+    assert parse_shard("2/3") == (2, 3)
+    with pytest.raises(SystemExit):
+        main([package, "1.0", "--shard", "4/3"])
+    assert "1 <= K <= N" in capsys.readouterr().err
+    with pytest.raises(SystemExit):
+        main([package, "1.0", "--shard", "1/2", "--watch"])
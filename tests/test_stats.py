@@ -0,0 +1,99 @@
+import json
+import os
+
+import pytest
+
+from derp.main import main
+from derp.stats import CURRENT, FUTURE, UNKNOWN, DebtStats, StatsApplication, combine, \
+    deprecation_age
+from derp.version_number import VersionNumber
+
+dirname = os.path.dirname(__file__)
+target = os.path.join(dirname, "resources/test_package")
+
+
+def _stats(**kwargs) -> DebtStats:
+    app = StatsApplication(target, "1.0", **kwargs)
+    app.run()
+    assert app.exit() == 0
+    return app.stats
+
+
+def test_deprecation_age():
+    version = VersionNumber("2.3")
+    assert deprecation_age("1.9", version) == "1 major"
+    assert deprecation_age("2.0.5", version) == "3 minor"
+    assert deprecation_age("2.3.0", version) == CURRENT
+    assert deprecation_age("2.4", version) == FUTURE
+    assert deprecation_age(None, version) == UNKNOWN
+    assert deprecation_age("2.x", version) == UNKNOWN
+    assert deprecation_age("2.2.9.1", VersionNumber("2.2.10")) == "1 patch"
+
+
+def test_stats():
+    stats = _stats()
+    assert stats.files == 3
+    assert stats.files_with_deprecations == 1
+    assert stats.deprecations == 5
+    assert stats.missing_removal == 1
+    assert stats.by_removed_in == {"0.99": 1, "1.0.0": 1, "1.0.x": 1, "2.0.0": 1}
+    assert stats.by_reason == {"expired": 2, "missing-versions": 1, "unparseable-version": 1}
+    assert sum(stats.by_age.values()) == 5
+    assert stats.by_package == {"test_module": 5}
+    assert stats.expired() == 2
+
+
+@pytest.mark.parametrize("kwargs", [dict(jobs=2), dict(readers=2)])
+def test_stats_from_any_scan(kwargs, tmp_path):
+    """Every way of scanning yields the same statistics, including from the cache."""
+    expected = _stats().to_dict()
+    assert _stats(**kwargs).to_dict() == expected
+    cache_dir = str(tmp_path / "cache")
+    assert _stats(cache_dir=cache_dir).to_dict() == expected
+    assert _stats(cache_dir=cache_dir).to_dict() == expected
+
+
+def test_merge():
+    """Statistics combine associatively, and only at the same version."""
+    whole = _stats()
+    parts = [_stats(shard=(index, 3)) for index in (1, 2, 3)]
+    assert sum(part.files for part in parts) == whole.files
+    assert combine(parts).to_dict() == whole.to_dict()
+    assert combine(reversed(parts)).to_dict() == whole.to_dict()
+    assert combine([DebtStats.from_dict(part.to_dict()) for part in parts]).to_dict() == \
+        whole.to_dict()
+    with pytest.raises(ValueError):
+        DebtStats("2.0").merge(whole)
+    padded = DebtStats("1.0.0").merge(whole)
+    assert padded.version == "1.0.0"
+    assert padded.deprecations == whole.deprecations
+    with pytest.raises(ValueError):
+        DebtStats.from_dict({"format": 0})
+
+
+def test_stats_command(tmp_path, capsys):
+    assert main(["stats", target, "1.0", "--no-cache"]) == 0
+    table = capsys.readouterr().out
+    assert table.startswith("Deprecation debt at version 1.0: 5 deprecations in 1 of 3 "
+                            "modules, 2 expired")
+    assert "  0.99" in table and "expired" in table
+    assert "(missing)" in table
+
+    paths = []
+    for index in (1, 2):
+        assert main(["stats", target, "1.0", "--no-cache", "--shard", f"{index}/2",
+                     "--format", "json"]) == 0
+        path = tmp_path / f"stats-{index}.json"
+        path.write_text(capsys.readouterr().out)
+        paths.append(str(path))
+    assert main(["stats", "--merge"] + paths) == 0
+    assert capsys.readouterr().out == table
+    assert main(["stats", "--merge"] + paths + ["--format", "json"]) == 0
+    assert json.loads(capsys.readouterr().out)["deprecations"] == 5
+
+    (tmp_path / "broken.json").write_text("{}")
+    assert main(["stats", "--merge", str(tmp_path / "broken.json")]) == 1
+    with pytest.raises(SystemExit):
+        main(["stats", target, "--merge"] + paths)
+    with pytest.raises(SystemExit):
+        main(["stats"])
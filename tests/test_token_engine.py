@@ -0,0 +1,100 @@
+import os
+import textwrap
+import tracemalloc
+
+import pytest
+
+from derp.application import Application
+from derp.benchmark import generate_module
+from derp.discovery import iter_python_files
+from derp.walker import collect_deprecations
+from tests.test_walker import COMPLETE_SOURCE
+
+dirname = os.path.dirname(__file__)
+
+TRICKY_SOURCE = textwrap.dedent('''
+    # -*- coding: latin-1 -*-
+    import deprecation
+
+    def one_liner(): pass
+    class Empty: pass
+
+    @deprecation.deprecated(  # a comment inside the decorator
+        deprecated_in="1.0",
+        removed_in="2.0",
+    )
+    @property
+    def multi_line():
+        """@deprecated(deprecated_in="1.0", removed_in="2.0") in a docstring"""
+        class Local:
+            @deprecated("Removed in 3.0")
+            def method(self): return 1
+
+    @staticmethod
+    @deprecated
+    def second_decorator(): pass
+''')
+
+
+def _records(deprecations):
+    return sorted((d.qualname, d.lineno, d.col, sorted(d.to_dict().items()))
+                  for d in deprecations)
+
+
+def _assert_same_results(path):
+    assert _records(collect_deprecations(path, engine="tokenize")) == \
+        _records(collect_deprecations(path, engine="ast"))
+
+
+def test_same_results_on_test_package():
+    for path in iter_python_files(os.path.join(dirname, "resources/test_package")):
+        _assert_same_results(path)
+
+
+@pytest.mark.parametrize("source", [COMPLETE_SOURCE, generate_module(300, density=0.3)])
+def test_same_results(tmp_path, source):
+    path = tmp_path / "module.py"
+    path.write_text(source)
+    _assert_same_results(str(path))
+
+
+def test_same_results_on_tricky_source(tmp_path):
+    path = tmp_path / "module.py"
+    path.write_bytes(TRICKY_SOURCE.encode("latin-1"))
+    _assert_same_results(str(path))
+    qualnames = [d.qualname for d in collect_deprecations(str(path), engine="tokenize")]
+    assert qualnames == ["multi_line", "multi_line.<locals>.Local.method", "second_decorator"]
+
+
+def test_fallback(tmp_path):
+    """The tokenize engine finds deprecations in modules that cannot be parsed."""
+    path = tmp_path / "module.py"
+    path.write_text(textwrap.dedent('''
+        print "python 2"
+
+        @deprecated(deprecated_in="1.0", removed_in="2.0")
+        def old():
+            pass
+    '''))
+    with pytest.raises(SyntaxError):
+        collect_deprecations(str(path))
+    assert [d.name for d in collect_deprecations(str(path), engine="auto")] == ["old"]
+    app = Application(str(tmp_path), "2.0", engine="auto")
+    app.run()
+    assert not app.catastrophic_failure
+    assert app.failed_files == 1
+
+
+def test_lower_peak_memory(tmp_path):
+    path = tmp_path / "module.py"
+    path.write_text(generate_module(3000, density=0.01))
+
+    def peak(engine):
+        tracemalloc.start()
+        try:
+            collect_deprecations(str(path), engine=engine)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    assert peak("tokenize") * 10 < peak("ast")
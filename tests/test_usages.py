@@ -0,0 +1,153 @@
+import ast
+import json
+import os
+
+import pytest
+
+from derp.application import Application
+from derp.main import main
+from derp.usages import UsagesApplication
+from derp.walker import collect_usages, module_name
+
+IO_MODULE = """\
+from deprecation import deprecated
+
+
+@deprecated(deprecated_in="0.1", removed_in="1.0")
+class OldClass:
+    def method(self):
+        pass
+
+
+@deprecated(deprecated_in="0.1", removed_in="9.0")
+def old_function():
+    return OldClass()
+
+
+def current():
+    pass
+"""
+
+CLI_MODULE = """\
+from my_app import io as old_io
+from my_app.io import OldClass
+
+
+def run():
+    old_io.OldClass.method(None)
+    return OldClass
+"""
+
+SUB_MODULE = """\
+from .. import io
+import my_app.io
+
+
+def run():
+    io.old_function()
+    my_app.io.current()
+"""
+
+
+@pytest.fixture
+def package(tmp_path):
+    root = tmp_path / "src" / "my_app"
+    (root / "sub").mkdir(parents=True)
+    (root / "__init__.py").write_text("")
+    (root / "sub" / "__init__.py").write_text("")
+    (root / "io.py").write_text(IO_MODULE)
+    (root / "cli.py").write_text(CLI_MODULE)
+    (root / "sub" / "tasks.py").write_text(SUB_MODULE)
+    return str(root)
+
+
+def _uses(symbol):
+    return [(os.path.basename(use.path), use.line, use.kind, use.name) for use in symbol.uses]
+
+
+def test_module_name(package):
+    assert module_name(os.path.join(package, "io.py")) == "my_app.io"
+    assert module_name(os.path.join(package, "sub", "__init__.py")) == "my_app.sub"
+    assert module_name(os.path.join(package, "..", "setup.py")) == "setup"
+
+
+def test_collect_usages():
+    """Names are resolved through imports, relative imports and top-level definitions."""
+    tree = ast.parse(SUB_MODULE)
+    usages = collect_usages(tree, "tasks.py", module="my_app.sub.tasks")
+    assert sorted((use.kind, use.name) for use in usages) == [
+        ("attribute", "my_app.io.current"),
+        ("attribute", "my_app.io.old_function"),
+        ("import", "my_app.io"),
+        ("import", "my_app.io"),
+    ]
+    usages = collect_usages(ast.parse(IO_MODULE), "io.py", module="my_app.io")
+    assert ("name", "my_app.io.OldClass") in [(use.kind, use.name) for use in usages]
+
+
+def test_usages_index(package):
+    """Every deprecated symbol is listed with its uses, including those of its members."""
+    app = UsagesApplication(package)
+    app.run()
+    assert not app.catastrophic_failure
+    symbols = {symbol.name: symbol for symbol, _ in app.symbols}
+    assert sorted(symbols) == ["my_app.io.OldClass", "my_app.io.old_function"]
+    assert sorted(_uses(symbols["my_app.io.OldClass"])) == [
+        ("cli.py", 2, "import", "my_app.io.OldClass"),
+        ("cli.py", 6, "attribute", "my_app.io.OldClass.method"),
+        ("cli.py", 7, "name", "my_app.io.OldClass"),
+        ("io.py", 12, "name", "my_app.io.OldClass"),
+    ]
+    assert _uses(symbols["my_app.io.old_function"]) == [
+        ("tasks.py", 6, "attribute", "my_app.io.old_function"),
+    ]
+    # Each module is parsed exactly once
+    assert app.parsed_files == len(app.file_paths) == 5
+
+
+def test_usages_from_cache(package, tmp_path):
+    """Uses are cached along with the deprecations, and the same in every way of scanning."""
+    def run(**kwargs):
+        app = UsagesApplication(package, **kwargs)
+        app.run()
+        return app, [(symbol.name, _uses(symbol)) for symbol, _ in app.symbols]
+
+    _, expected = run()
+    assert run(jobs=2)[1] == expected
+    cache_dir = str(tmp_path / "cache")
+    # Entries written by a scan without the uses are not enough
+    Application(package, "1.0", cache_dir=cache_dir).run()
+    app, symbols = run(cache_dir=cache_dir)
+    assert symbols == expected
+    assert app.cache.misses == 5
+    app, symbols = run(cache_dir=cache_dir)
+    assert symbols == expected
+    assert app.cache.hits == 5 and app.parsed_files == 0
+
+
+def test_usages_command(package, capsys):
+    """With a version, only invalid deprecations are listed."""
+    assert main(["usages", package, "1.0"]) == 0
+    out = capsys.readouterr().out
+    assert "my_app.io.OldClass: " in out
+    assert "old_function" not in out
+    assert "; 4 uses" in out
+    assert "\tcli.py" not in out and f"\t{os.path.join(package, 'cli.py')}:6:4: " in out
+
+    assert main(["usages", package, "--format", "ndjson", "--used-only"]) == 0
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [record["name"] for record in records] == ["my_app.io.OldClass",
+                                                      "my_app.io.old_function"]
+    assert records[1]["removed_in"] == "9.0"
+    assert records[1]["uses"][0]["kind"] == "attribute"
+
+
+def test_unparseable_module(package, capsys):
+    with open(os.path.join(package, "legacy.py"), "w") as fp:
+        fp.write("print 'hello'\n")
+    assert main(["usages", package]) == 1
+    captured = capsys.readouterr()
+    assert "my_app.io.OldClass" in captured.out
+    assert "legacy.py: The module could not be checked: SyntaxError" in captured.err
+    assert main(["usages", package, "--engine", "auto"]) == 0
+    assert "my_app.io.OldClass" in capsys.readouterr().out
@@ -0,0 +1,180 @@
+import ast
+import statistics
+import textwrap
+import time
+from collections import deque
+
+import pytest
+
+from derp.deprecation import PythonDeprecation
+from derp.walker import _extract_deprecations, _get_deprecation, _walk_nodes_filter_transform
+
+COMPLETE_SOURCE = textwrap.dedent('''
+    import sys
+
+    @deprecated(deprecated_in="1.0", removed_in="2.0")
+    async def fetch():
+        pass
+
+    if sys.version_info < (3, 8):
+        @deprecated(deprecated_in="1.0", removed_in="2.0")
+        def shim():
+            pass
+    else:
+        try:
+            import thing
+        except ImportError:
+            @deprecated(deprecated_in="1.0", removed_in="2.0")
+            class Fallback:
+                pass
+        finally:
+            pass
+
+    class Outer:
+        with open("file") as fp:
+            for line in fp:
+                while True:
+                    @deprecated(deprecated_in="1.0", removed_in="2.0")
+                    def method(self):
+                        pass
+
+        def function(self):
+            if True:
+                class Inner:
+                    @deprecated(deprecated_in="1.0", removed_in="2.0")
+                    async def inner(self):
+                        pass
+''')
+
+
+def _qualnames(source: str):
+    tree = ast.parse(source)
+    return [deprecation.qualname for deprecation in
+            _walk_nodes_filter_transform(tree, _get_deprecation)]
+
+
+def test_finds_deprecations_in_every_statement_position():
+    """Async functions and definitions inside compound statements are not missed."""
+    assert _qualnames(COMPLETE_SOURCE) == [
+        "fetch", "shim", "Fallback", "Outer.method",
+        "Outer.function.<locals>.Inner.inner",
+    ]
+
+
+def test_match_statement():
+    source = textwrap.dedent('''
+        match command:
+            case "old":
+                @deprecated(deprecated_in="1.0", removed_in="2.0")
+                def handler():
+                    pass
+    ''')
+    try:
+        ast.parse(source)
+    except SyntaxError:
+        return  # match statements need python 3.10
+    assert _qualnames(source) == ["handler"]
+
+
+def _baseline_walk(node, filter_transform):
+    """The walker that derp shipped before it visited every statement position.
+
+    It only descended through modules, classes and functions, and is kept here as a reference
+    for the results and the speed of the complete walker.
+    """
+    relevant_node_types = (ast.Module, ast.ClassDef, ast.FunctionDef)
+
+    def iter_relevant_children(node):
+        for name, field in ast.iter_fields(node):
+            if isinstance(field, relevant_node_types):
+                yield field
+            elif isinstance(field, list):
+                for item in field:
+                    if isinstance(item, relevant_node_types):
+                        yield item
+
+    todo = deque([node])
+    while todo:
+        node = todo.popleft()
+        todo.extend(iter_relevant_children(node))
+        maybe_result = filter_transform(node)
+        if maybe_result is not None:
+            yield maybe_result
+
+
+def _baseline_get_deprecation(node):
+    """The decorator detection that derp shipped alongside the baseline walker, which
+    tried to parse every decorator of every node.
+    """
+    try:
+        for decorator in node.decorator_list:
+            try:
+                return node.name, PythonDeprecation(decorator)
+            except ValueError:
+                pass
+    except AttributeError:
+        pass
+
+
+def _synthetic_module(n_classes: int = 60, n_methods: int = 15) -> str:
+    lines = ["import os", ""]
+    for i in range(n_classes):
+        lines.append(f"class Class{i}:")
+        lines.append(f"    attribute = {i}")
+        for j in range(n_methods):
+            if j == 0:
+                lines.append(f"    @deprecated(deprecated_in='1.{j}', removed_in='2.{j}')")
+            elif j % 4 == 0:
+                lines.append("    @property")
+            lines.append(f"    def method{j}(self, x):")
+            lines.append("        total = 0")
+            lines.append("        for k in range(x):")
+            lines.append("            if k % 2:")
+            lines.append("                total += k * self.attribute")
+            lines.append("            else:")
+            lines.append("                total -= os.sep.count('/') + k")
+            lines.append("        return total")
+        lines.append("")
+    return "\n".join(lines)
+
+
+"""How much slower than the baseline the complete walker may be before it fails, as a ratio.
+The two are close to even, so this only absorbs noise.
+"""
+WALKER_TOLERANCE = 1.25
+
+
+def _best_time(func, rounds: int = 15) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.process_time()
+        func()
+        best = min(best, time.process_time() - start)
+    return best
+
+
+def test_walker_matches_baseline():
+    """The complete walker finds what the baseline found, in the same order."""
+    tree = ast.parse(_synthetic_module())
+    baseline = list(_baseline_walk(tree, _baseline_get_deprecation))
+    assert [name for name, _ in baseline] == [d.name for d in _extract_deprecations(tree)]
+
+
+@pytest.mark.perf
+def test_walker_is_no_slower_than_baseline():
+    """Benchmark: the complete walker is no slower than the baseline, within a tolerance.
+
+    Each repeat takes the best cpu time of each walker over several rounds, and the median of
+    the ratios of the repeats is compared, so that a burst of load on the machine during one
+    repeat doesn't decide the outcome.
+    """
+    tree = ast.parse(_synthetic_module())
+
+    def baseline():
+        return list(_baseline_walk(tree, _baseline_get_deprecation))
+
+    def complete():
+        return _extract_deprecations(tree)
+
+    ratios = [_best_time(complete) / _best_time(baseline) for _ in range(5)]
+    assert statistics.median(ratios) <= WALKER_TOLERANCE
@@ -0,0 +1,70 @@
+import os
+import shutil
+
+from derp.watch import WatchApplication
+
+dirname = os.path.dirname(__file__)
+test_package = os.path.join(dirname, "resources/test_package")
+
+
+def test_watch_diffs(tmp_path, capsys):
+    """Polling re-parses only changed modules and reports new and resolved findings."""
+    target = str(tmp_path / "package")
+    shutil.copytree(test_package, target)
+    version_file = os.path.join(target, "__version__.py")
+    app = WatchApplication(target, version_file, max_polls=0)
+    app.run()
+    assert not app.catastrophic_failure
+    assert app.failed_files == 1
+    assert "Initial scan of 3 files" in capsys.readouterr().err
+
+    assert app.poll() == ([], [])
+    assert app.changed_files == 0
+
+    new_module = os.path.join(target, "new_module.py")
+    with open(new_module, "w") as fp:
+        fp.write("@deprecated(deprecated_in='1.0', removed_in='1.1')\ndef f():\n    pass\n")
+    added, resolved = app.poll()
+    assert app.changed_files == 1
+    assert added == [(new_module, ("f", "Current version, 1.2.3, exceeds expected removal "
+                                        "version, 1.1"))]
+    assert resolved == []
+
+    os.remove(new_module)
+    added, resolved = app.poll()
+    assert added == []
+    assert [finding[0] for _, finding in resolved] == ["f"]
+
+    # A new version re-checks every module from memory
+    with open(version_file, "w") as fp:
+        fp.write('__version__ = "2.0.0"\n')
+    added, resolved = app.poll()
+    newly_invalid = {finding[0] for _, finding in added} - {finding[0] for _, finding in resolved}
+    assert newly_invalid == {"NewerDeprecatedClass"}
+    assert app.exit() == 1
+
+
+def test_watch_survives_transient_errors(tmp_path, capsys):
+    """A poll that cannot check the package keeps the previous results, and polling goes on."""
+    target = str(tmp_path / "package")
+    shutil.copytree(test_package, target)
+    version_file = os.path.join(target, "__version__.py")
+    app = WatchApplication(target, version_file, max_polls=0)
+    app.run()
+    findings = dict(app.findings)
+    capsys.readouterr()
+
+    # An editor truncates the file before writing it
+    open(version_file, "w").close()
+    assert app.poll() == ([], [])
+    assert app.poll() == ([], [])
+    assert "did not contain snippets" in app.poll_error
+    assert capsys.readouterr().err.count("Cannot check the package") == 1
+    assert app.current_version.version == "1.2.3"
+    assert app.findings == findings
+
+    with open(version_file, "w") as fp:
+        fp.write('__version__ = "2.0.0"\n')
+    added, _ = app.poll()
+    assert app.poll_error is None
+    assert "NewerDeprecatedClass" in {finding[0] for _, finding in added}